@@ -10,17 +10,37 @@ MSG_INFO "Setting up directories involved in harmonisation process..."
 LOGDIR=${LOGBASEDIR}/${RUN_NAME}
 mkdir ${LOGDIR}
 CREATE_FOLDERS
+ARCHIVE_CSVLINES ${RUN_NAME} #runtime records of previous run for job planner
 mkdir empty_dir
 rsync empty_dir/ ${LOGDIR}/
 rm ${INCOMINGSPLITDATADIR}/*.hxyz 2>/dev/null
 rm ${INCOMINGSPLITDATADIR}/*.stats 2>/dev/null
+rm ${WORK_MANIFESTDIR}/${RUN_NAME}_*.manifest 2>/dev/null
 rm -r empty_dir
 MSG_INFO "Done."
 
 NUMBER_OF_FILES=$(GET_NUMBER_OF_FILES "${INCOMINGSPLITDATADIR}/*.insplit") #how many files are there in total to process?
 if [ ${NUMBER_OF_FILES} -gt "0" ]
 then
-	sbatch -J${RUN_NAME} --array=1-${NUMBER_OF_FILES} --partition=mini,fat,xfat --time=01:00:00 --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=${LOGDIR}/${RUN_NAME}_%a.incominglog --error=${LOGDIR}/${RUN_NAME}_%a.incomingerr ${SRUNDIR}/A2_harmonise_data.srun
+	if [[ "${JOB_PLANNER}" == 'true' ]]
+	then
+		MSG_INFO "Packing splits into manifests (target runtime ${PLAN_TASK_TIME} s per task)..."
+		printf '%s\n' $(GET_LIST_OF_FILES "${INCOMINGSPLITDATADIR}/*.insplit") > ${WORK_MANIFESTDIR}/${RUN_NAME}.files
+		module load ${CONDA} 2>/dev/null
+		source activate ${CONDA_ENV}
+		python ${PYGENERALDIR}/plan_jobs.py --file-list ${WORK_MANIFESTDIR}/${RUN_NAME}.files --manifest-dir ${WORK_MANIFESTDIR} --prefix ${RUN_NAME} --logdir ${PLAN_LOGDIR} --target-time ${PLAN_TASK_TIME} --max-tasks ${PLAN_MAX_TASKS}
+		conda deactivate
+		module purge
+		PLAN_MEM=$(awk 'NR>1 && $5>m {m=$5} END {print m}' ${WORK_MANIFESTDIR}/${RUN_NAME}.plan) #largest predicted memory (MB)
+		PLAN_TIME=$(awk 'NR>1 && $4>t {t=$4} END {print int(2*t/60)+10}' ${WORK_MANIFESTDIR}/${RUN_NAME}.plan) #twice the longest predicted runtime (min)
+		TASK_LIMITS="--time=${PLAN_TIME} --mem=${PLAN_MEM}M"
+	else
+		MSG_INFO "Writing manifests (${HARM_FILES_PER_TASK} files per task)..."
+		TASK_LIMITS="--time=01:00:00"
+		printf '%s\n' $(GET_LIST_OF_FILES "${INCOMINGSPLITDATADIR}/*.insplit") | split -l ${HARM_FILES_PER_TASK} -d -a 4 --additional-suffix=.manifest - ${WORK_MANIFESTDIR}/${RUN_NAME}_
+	fi
+	NUMBER_OF_TASKS=$(GET_NUMBER_OF_FILES "${WORK_MANIFESTDIR}/${RUN_NAME}_*.manifest") #one array task per manifest
+	sbatch -J${RUN_NAME} --array=1-${NUMBER_OF_TASKS} --cpus-per-task=${HARM_CPUS_PER_TASK} --partition=mini,fat,xfat ${TASK_LIMITS} --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=${LOGDIR}/${RUN_NAME}_%a.incominglog --error=${LOGDIR}/${RUN_NAME}_%a.incomingerr ${SRUNDIR}/A2_harmonise_data.srun
 	MSG_BATCH ${RUN_NAME}
 	
 	CHAIN_SCRIPTS $CHAIN "${SCRIPTDIR}/A3_merge_incoming_splits.sh" $RUN_NAME # call next script in processing queue (if evoked in as part of processing chain)
@@ -4,6 +4,7 @@ SHOW_LOGO
 RUN_NAME="A4"
 scancel -n${RUN_NAME}_small
 scancel -n${RUN_NAME}_large
+scancel -n${RUN_NAME}_plan
 
 CHAIN=$1
 
@@ -11,32 +12,57 @@ MSG_INFO "Setting up directories involved in harmonisation process."
 LOGDIR=${LOGBASEDIR}/${RUN_NAME}
 mkdir ${LOGDIR}
 CREATE_FOLDERS
+ARCHIVE_CSVLINES ${RUN_NAME} #runtime records of previous run for job planner
 mkdir empty_dir
 rsync empty_dir/ ${LOGDIR}/
 rsync empty_dir/ ${INCOMINGSPLITDATADIR}/
 rm -r empty_dir
+rm ${WORK_MANIFESTDIR}/${RUN_NAME}_*.manifest 2>/dev/null
 MSG_INFO "Done."
 
-NUMBER_OF_LARGE_FILES=$(find $INCOMINGDIR/*.mxyz -maxdepth 1 -size +${HARM_LARGE_SIZE_LIMIT} | wc -l) #larger or equal than
-NUMBER_OF_SMALL_FILES=$(find $INCOMINGDIR/*.mxyz -maxdepth 1 -not -size +${HARM_LARGE_SIZE_LIMIT} | wc -l) #smaller than
-
-if [ ${NUMBER_OF_LARGE_FILES} -gt 0 ]
+if [[ "${JOB_PLANNER}" == 'true' ]]
 then
-	MSG_INFO "Found ${NUMBER_OF_LARGE_FILES} harmonised data sets >= ${HARM_LARGE_SIZE_LIMIT}."
-	NEW_NAME=${RUN_NAME}_large
-	sbatch -J${NEW_NAME} --time=02:00:00 --partition=fat,xfat --mem=20G --array=1-${NUMBER_OF_LARGE_FILES} --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=$LOGDIR/${NEW_NAME}_%a.incominglog --error=$LOGDIR/${NEW_NAME}_%a.incomingerr ${SRUNDIR}/A4_remove_duplicates.srun large
-	MSG_BATCH $NEW_NAME
-fi
+	# balanced manifests (one per array task) instead of small/large size buckets
+	MSG_INFO "Packing harmonised data sets into manifests (target runtime ${PLAN_TASK_TIME} s per task)..."
+	find ${INCOMINGDIR} -maxdepth 1 -name "*.mxyz" -type f > ${WORK_MANIFESTDIR}/${RUN_NAME}.files
+	module load ${CONDA} 2>/dev/null
+	source activate ${CONDA_ENV}
+	python ${PYGENERALDIR}/plan_jobs.py --file-list ${WORK_MANIFESTDIR}/${RUN_NAME}.files --manifest-dir ${WORK_MANIFESTDIR} --prefix ${RUN_NAME} --logdir ${PLAN_LOGDIR} --target-time ${PLAN_TASK_TIME} --max-tasks ${PLAN_MAX_TASKS}
+	conda deactivate
+	module purge
+	NUMBER_OF_TASKS=$(GET_NUMBER_OF_FILES "${WORK_MANIFESTDIR}/${RUN_NAME}_*.manifest") #one array task per manifest
+	if [ ${NUMBER_OF_TASKS} -gt 0 ]
+	then
+		PLAN_MEM=$(awk 'NR>1 && $5>m {m=$5} END {print m}' ${WORK_MANIFESTDIR}/${RUN_NAME}.plan) #largest predicted memory (MB)
+		PLAN_TIME=$(awk 'NR>1 && $4>t {t=$4} END {print int(2*t/60)+10}' ${WORK_MANIFESTDIR}/${RUN_NAME}.plan) #twice the longest predicted runtime (min)
+		MSG_INFO "Found ${NUMBER_OF_TASKS} manifests of harmonised data sets."
+		NEW_NAME=${RUN_NAME}_plan
+		sbatch -J${NEW_NAME} --time=${PLAN_TIME} --partition=mini,fat,xfat --mem=${PLAN_MEM}M --array=1-${NUMBER_OF_TASKS} --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=$LOGDIR/${NEW_NAME}_%a.incominglog --error=$LOGDIR/${NEW_NAME}_%a.incomingerr ${SRUNDIR}/A4_remove_duplicates.srun manifest
+		MSG_BATCH $NEW_NAME
+	fi
+	SUM=${NUMBER_OF_TASKS}
+else
+	NUMBER_OF_LARGE_FILES=$(find $INCOMINGDIR/*.mxyz -maxdepth 1 -size +${HARM_LARGE_SIZE_LIMIT} | wc -l) #larger or equal than
+	NUMBER_OF_SMALL_FILES=$(find $INCOMINGDIR/*.mxyz -maxdepth 1 -not -size +${HARM_LARGE_SIZE_LIMIT} | wc -l) #smaller than
 
-if [ ${NUMBER_OF_SMALL_FILES} -gt 0 ]
-then
-	MSG_INFO "Found ${NUMBER_OF_SMALL_FILES} harmonised data sets < ${HARM_LARGE_SIZE_LIMIT}."
-	NEW_NAME=${RUN_NAME}_small
-	sbatch -J${NEW_NAME} --time=01:00:00 --partition=mini,fat,xfat --array=1-${NUMBER_OF_SMALL_FILES} --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=$LOGDIR/${NEW_NAME}_%a.incominglog --error=$LOGDIR/${NEW_NAME}_%a.incomingerr ${SRUNDIR}/A4_remove_duplicates.srun small
-	MSG_BATCH $NEW_NAME
-fi
+	if [ ${NUMBER_OF_LARGE_FILES} -gt 0 ]
+	then
+		MSG_INFO "Found ${NUMBER_OF_LARGE_FILES} harmonised data sets >= ${HARM_LARGE_SIZE_LIMIT}."
+		NEW_NAME=${RUN_NAME}_large
+		sbatch -J${NEW_NAME} --time=02:00:00 --partition=fat,xfat --mem=20G --array=1-${NUMBER_OF_LARGE_FILES} --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=$LOGDIR/${NEW_NAME}_%a.incominglog --error=$LOGDIR/${NEW_NAME}_%a.incomingerr ${SRUNDIR}/A4_remove_duplicates.srun large
+		MSG_BATCH $NEW_NAME
+	fi
+
+	if [ ${NUMBER_OF_SMALL_FILES} -gt 0 ]
+	then
+		MSG_INFO "Found ${NUMBER_OF_SMALL_FILES} harmonised data sets < ${HARM_LARGE_SIZE_LIMIT}."
+		NEW_NAME=${RUN_NAME}_small
+		sbatch -J${NEW_NAME} --time=01:00:00 --partition=mini,fat,xfat --array=1-${NUMBER_OF_SMALL_FILES} --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=$LOGDIR/${NEW_NAME}_%a.incominglog --error=$LOGDIR/${NEW_NAME}_%a.incomingerr ${SRUNDIR}/A4_remove_duplicates.srun small
+		MSG_BATCH $NEW_NAME
+	fi
 
-SUM=$(($NUMBER_OF_SMALL_FILES+$NUMBER_OF_LARGE_FILES))
+	SUM=$(($NUMBER_OF_SMALL_FILES+$NUMBER_OF_LARGE_FILES))
+fi
 
 if [ $SUM -gt 0 ]
 then
@@ -32,13 +32,16 @@ LOGDIR=${LOGBASEDIR}/${RUN_NAME}
 mkdir ${LOGDIR} #directory for log output files
 CREATE_FOLDERS
 mkdir empty_dir
-rsync empty_dir/ ${TILEDIR}/
-rsync empty_dir/ ${WORK_TILEDIR}/
+if [[ "${INCREMENTAL_BUILD}" != 'true' ]] #incremental build: tiles and blockmedian files of previous build are updated
+then
+	rsync empty_dir/ ${TILEDIR}/
+	rsync empty_dir/ ${WORK_TILEDIR}/
+	rsync empty_dir/ ${BLOCKDIR}/
+	rsync empty_dir/ ${AUGDIR}/
+fi
 rsync empty_dir/ ${WORK_SPLITXYZDIR}/
 rsync empty_dir/ ${WORK_MINMAX}/
 rsync empty_dir/ ${WORK_EXTENT}/
-rsync empty_dir/ ${BLOCKDIR}/
-rsync empty_dir/ ${AUGDIR}/
 rsync empty_dir/ ${LOGDIR}/
 rm -r empty_dir
 
@@ -53,7 +56,23 @@ then
 	MSG_IMPORTANT "This is a GEBCO run for data up to <${CURRENT_YEAR}>."
 fi
 
-NUMBER_OF_FILES=$(GET_NUMBER_OF_FILES "${XYZDIR}/*.xyz") #how many files are there in total to process?
+if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+then
+	MSG_INFO "Incremental build: comparing XYZ files with build manifest > ${BUILD_MANIFEST} <..."
+	module load ${CONDA} 2>/dev/null
+	source activate ${CONDA_ENV}
+	python ${PYGENERALDIR}/build_manifest.py plan --manifest ${BUILD_MANIFEST} --build-dir ${WORK_BUILDDIR} --xyz-dir ${XYZDIR} --metadata ${METADATA_TABLE_WORKING}
+	conda deactivate
+	module purge
+	NUMBER_OF_FILES=$(cat ${WORK_BUILDDIR}/changed_files.txt | wc -l) #only datasets changed since the last build
+	NUMBER_OF_DIRTY_TILES=$(cat ${WORK_BUILDDIR}/dirty_tiles.txt | wc -l)
+	if [ ${NUMBER_OF_FILES} -eq 0 ] && [ ${NUMBER_OF_DIRTY_TILES} -gt 0 ]
+	then
+		MSG_WARNING "No changed XYZ files, but < ${NUMBER_OF_DIRTY_TILES} > tiles featuring removed datasets. Please continue with B3."
+	fi
+else
+	NUMBER_OF_FILES=$(GET_NUMBER_OF_FILES "${XYZDIR}/*.xyz") #how many files are there in total to process?
+fi
 if [ ${NUMBER_OF_FILES} -gt 0 ]
 then
 	MSG_INFO "Splitting < ${NUMBER_OF_FILES} > XYZ files into ${CHUNK_XYZ_SIZE} splits..."
@@ -11,24 +11,43 @@ LOGDIR=${LOGBASEDIR}/${RUN_NAME}
 mkdir ${LOGDIR}
 CREATE_FOLDERS
 mkdir empty_dir
-rsync empty_dir/ ${TILEDIR}/
-rsync empty_dir/ ${WORK_TILEDIR}/
+if [[ "${INCREMENTAL_BUILD}" != 'true' ]] #incremental build: tiles of previous build are updated
+then
+	rsync empty_dir/ ${TILEDIR}/
+	rsync empty_dir/ ${WORK_TILEDIR}/
+fi
 rsync empty_dir/ ${WORK_MINMAX}/
 rsync empty_dir/ ${WORK_EXTENT}/
 rsync empty_dir/ ${WORK_LISTUNIQUETILES}/
 rsync empty_dir/ ${LOGDIR}/
 rsync empty_dir/ ${QA_TILE_INVALID_DIR}/
+rm ${WORK_MANIFESTDIR}/${RUN_NAME}_*.manifest 2>/dev/null
+if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+then
+	find ${WORK_LISTUNIQUETILES} -maxdepth 1 -type f \( -name "*.uniquetiles" -o -name "*.tilecounts" \) -delete 2>/dev/null #tile counts of previous builds are kept in build manifest
+fi
 rm -r empty_dir
 find ${LOGBASEDIR} -name "B*.slurmerr" -empty -type f -delete 2>/dev/null
 MSG_SUCCESS "HOUSEKEEPING DONE."
 
-NUMBER_OF_SPLITS=$(GET_NUMBER_OF_FILES "${WORK_SPLITXYZDIR}/*.xyzsplit") #get number of splits from work
+SPLIT_LIST=${WORK_MANIFESTDIR}/${RUN_NAME}.files
+if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+then
+	# only splits of datasets changed since the last build (RID is first part of split name)
+	printf '%s\n' $(GET_LIST_OF_FILES "${WORK_SPLITXYZDIR}/*.xyzsplit") | awk -F'/' 'NR==FNR {rids[$1]; next} {split($NF, a, "_"); if (a[1] in rids) print}' ${WORK_BUILDDIR}/drop_rids.txt - > ${SPLIT_LIST}
+else
+	printf '%s\n' $(GET_LIST_OF_FILES "${WORK_SPLITXYZDIR}/*.xyzsplit") > ${SPLIT_LIST}
+fi
+NUMBER_OF_SPLITS=$(cat ${SPLIT_LIST} | wc -l) #get number of splits from work
 NUMBER_OF_XYZ=$(GET_NUMBER_OF_FILES "${XYZDIR}/*.xyz") #get total number of cruises in DATA/XYZ
 
 if [ ${NUMBER_OF_SPLITS} -gt "0" ]
 then
 	MSG_INFO "Total of < ${NUMBER_OF_SPLITS} > split files based on < ${NUMBER_OF_XYZ} > original tiles."
-	sbatch -J${RUN_NAME} --array=1-${NUMBER_OF_SPLITS}%100 --partition=smp,fat,xfat --time=02:00:00 --chdir=${WORKDIR} --mem-per-cpu=16G --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT} --output=${LOGDIR}/${RUN_NAME}_%a.slurmlog --error=${LOGDIR}/${RUN_NAME}_%a.slurmerr ${SRUNDIR}/B2_data_to_tiles.srun
+	MSG_INFO "Writing manifests (${TILE_SPLITS_PER_TASK} splits per task)..."
+	split -l ${TILE_SPLITS_PER_TASK} -d -a 4 --additional-suffix=.manifest ${SPLIT_LIST} ${WORK_MANIFESTDIR}/${RUN_NAME}_
+	NUMBER_OF_TASKS=$(GET_NUMBER_OF_FILES "${WORK_MANIFESTDIR}/${RUN_NAME}_*.manifest") #one array task per manifest
+	sbatch -J${RUN_NAME} --array=1-${NUMBER_OF_TASKS}%100 --cpus-per-task=${TILE_CPUS_PER_TASK} --partition=smp,fat,xfat --time=02:00:00 --chdir=${WORKDIR} --mem-per-cpu=16G --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT} --output=${LOGDIR}/${RUN_NAME}_%a.slurmlog --error=${LOGDIR}/${RUN_NAME}_%a.slurmerr ${SRUNDIR}/B2_data_to_tiles.srun
 	MSG_BATCH ${RUN_NAME}
 	
 	sleep 10 # wait for some seconds until SLURM scheduler processed submitted jobs...
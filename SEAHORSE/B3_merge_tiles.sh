@@ -11,7 +11,10 @@ LOGDIR=${LOGBASEDIR}/${RUN_NAME}
 mkdir ${LOGDIR}
 CREATE_FOLDERS
 mkdir empty_dir
-find ${WORK_TILEDIR} -name "*.tile" -type f -delete 2>/dev/null
+if [[ "${INCREMENTAL_BUILD}" != 'true' ]]
+then
+	find ${WORK_TILEDIR} \( -name "*.tile" -o -name "*.highbytes" \) -type f -delete 2>/dev/null #incremental build: tiles of previous build are updated
+fi
 rsync empty_dir/ ${LOGDIR}/
 rm -r empty_dir
 MSG_SUCCESS "HOUSEKEEPING DONE."
@@ -20,6 +23,10 @@ MSG_INFO "Retrieving number of unique tiles... (this takes long)"
 TILE_LIST=${WORK_LISTUNIQUETILES}/tile_list.txt
 TILE_LIST_UNIQ_SORT=${WORK_LISTUNIQUETILES}/tile_list_unique_sorted.txt
 find ${WORK_LISTUNIQUETILES} -maxdepth 1 -type f -iname "*.uniquetiles" -exec cat {} + > ${TILE_LIST} # merge all "*.uniquetiles" created during B2
+if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+then
+	cat ${WORK_BUILDDIR}/dirty_tiles.txt >> ${TILE_LIST} # tiles featuring changed or removed datasets
+fi
 sort -u ${TILE_LIST} > ${TILE_LIST_UNIQ_SORT} # sort and remove duplicates
 tr $'\n' ' ' < ${TILE_LIST_UNIQ_SORT} > ${TILE_TABLE} && echo "" >> ${TILE_TABLE} # transpose column-style list to row-style list
 { read -a LIST_OF_TILES; } < ${TILE_TABLE} # read the list of tiles from text file
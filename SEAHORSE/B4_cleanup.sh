@@ -9,11 +9,12 @@ mkdir ${LOGDIR}
 CREATE_FOLDERS
 mkdir empty_dir
 rsync empty_dir/ ${LOGDIR}/
-rsync empty_dir/ ${TILEDIR}/
+if [[ "${INCREMENTAL_BUILD}" != 'true' ]]
+then
+	rsync empty_dir/ ${TILEDIR}/ #incremental build: only rebuilt tiles are copied
+fi
 rsync empty_dir/ ${WORK_SPLITXYZDIR}/
-rsync empty_dir/ ${WORK_LISTUNIQUETILES}/
 rsync empty_dir/ ${QA_TILE_INVALID_DIR}/
-rm -r empty_dir
 LOGFILE=${LOGDIR}/${RUN_NAME}_from_bash.slurmlog
 N_THREADS=12
 
@@ -21,24 +22,48 @@ MSG_INFO "Updating 'metadata' table with min/max values for X, Y and Z..." |& te
 MSG_INFO "Updating 'info_tiles' table with featured cruise RID, tile sizes (MB) and creation date..." |& tee -a ${LOGFILE}
 module load ${CONDA} 2>/dev/null
 source activate ${CONDA_ENV}
-python ${PYDIR}/B4_update_metadata.py --minmax ${WORK_MINMAX} --tiledir ${WORK_TILEDIR} |& tee -a ${LOGFILE}
+if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+then
+	# update build manifest with tile counts of changed datasets (featured cruises and tile counts of all tiles from manifest)
+	python ${PYGENERALDIR}/build_manifest.py commit --manifest ${BUILD_MANIFEST} --build-dir ${WORK_BUILDDIR} --tilecounts ${WORK_LISTUNIQUETILES} --tiledir ${WORK_TILEDIR} --tilecounts-out ${WORK_TILE_COUNTS} |& tee -a ${LOGFILE}
+	python ${PYDIR}/B4_update_metadata.py --minmax ${WORK_MINMAX} --tiledir ${WORK_TILEDIR} --build-manifest ${BUILD_MANIFEST} |& tee -a ${LOGFILE}
+	TILE_COPY_LIST="cat ${WORK_BUILDDIR}/rebuilt_tiles.txt" #only tiles rebuilt by incremental build
+else
+	python ${PYDIR}/B4_update_metadata.py --minmax ${WORK_MINMAX} --tiledir ${WORK_TILEDIR} --tilecounts ${WORK_LISTUNIQUETILES} --tilecounts-out ${WORK_TILE_COUNTS} |& tee -a ${LOGFILE}
+	TILE_COPY_LIST="find ${WORK_TILEDIR} -iname '*.tile' -type f"
+fi
 conda deactivate
 module purge 2>/dev/null
 MSG_SUCCESS "Done." |& tee -a ${LOGFILE}
 
 MSG_INFO "HOUSEKEEPING FOR STAGE B4..." |& tee -a ${LOGFILE}
 rm ${WORK_MINMAX}/*.minmax 2>/dev/null
+rsync empty_dir/ ${WORK_LISTUNIQUETILES}/ #lists of unique tiles and tile counts are required by B4_update_metadata.py
+rm -r empty_dir
 find ${WORK_TILEDIR} -maxdepth 1 -type f -name "tile_*.til" -delete 2>/dev/null #otherwise the argument list would be too long
 find ${LOGBASEDIR} -name "B*.slurmerr" -empty -type f -delete 2>/dev/null # remove empty STDERR logfiles (*.slurmerr)
 CREATE_STAGE_REPORT "B"    # create report CSV file from all logs of stage
 MSG_SUCCESS "HOUSEKEEPING DONE." |& tee -a ${LOGFILE}
 
 MSG_INFO "Submit copy job of tiles ('*.tile') from > ${WORK_TILEDIR} < to > ${TILEDIR} <..." |& tee -a ${LOGFILE}
+if [[ "${TILE_STORE}" == 'true' ]]
+then
+	if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+	then
+		TILE_STORE_FILES="--file-list ${WORK_BUILDDIR}/rebuilt_tiles.txt" #only tiles rebuilt by incremental build
+	else
+		TILE_STORE_FILES=""
+	fi
+	TILE_STORE_CMD="module load ${CONDA} 2>/dev/null\nsource activate ${CONDA_ENV}\npython ${PYGENERALDIR}/tile_store.py build --store ${TILESTOREDIR} --tiledir ${WORK_TILEDIR} ${TILE_STORE_FILES} --format ${TILE_FORMAT}\n"
+else
+	TILE_STORE_CMD=""
+fi
 echo -e "#!/usr/bin/bash\n
 #Xsrun  I know what I am doing\n
-find ${WORK_TILEDIR} -iname '*.tile' -type f | xargs -n1 -P${N_THREADS} -I{} rsync -ptg {} ${TILEDIR}\n
+${TILE_COPY_LIST} | xargs -n1 -P${N_THREADS} -I{} rsync -ptg {} ${TILEDIR}\n
 cd ${TILEDIR}\n
-TILE_CURATION\n" | sbatch --job-name=${RUN_NAME}_COPY_TILES --partition=mini,fat,xfat --ntasks=1 --cpus-per-task=${N_THREADS} --time=02:00:00 --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=${LOGDIR}/${RUN_NAME}_COPY_TILES.slurmlog --error=${LOGDIR}/${RUN_NAME}_COPY_TILES.slurmerr
+TILE_CURATION\n
+${TILE_STORE_CMD}" | sbatch --job-name=${RUN_NAME}_COPY_TILES --partition=mini,fat,xfat --ntasks=1 --cpus-per-task=${N_THREADS} --time=02:00:00 --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=${LOGDIR}/${RUN_NAME}_COPY_TILES.slurmlog --error=${LOGDIR}/${RUN_NAME}_COPY_TILES.slurmerr
 
 MSG_INFO "Moving '*.removed' files from > ${WORK_REMOVED} < to > ${QA_TILE_INVALID_DIR} <..." |& tee -a ${LOGFILE}
 find ${WORK_REMOVED} -iname '*.removed' -type f | xargs -n1 -P${N_THREADS} -I{} mv {} ${QA_TILE_INVALID_DIR} 2>/dev/null
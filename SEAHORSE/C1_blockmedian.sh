@@ -5,6 +5,7 @@ RUN_NAME="C1"
 scancel -n${RUN_NAME}_large
 scancel -n${RUN_NAME}_small
 scancel -n${RUN_NAME}_tiny
+scancel -n${RUN_NAME}_plan
 
 CHAIN=$1
 
@@ -15,60 +16,95 @@ CREATE_FOLDERS
 # mkdir ${BLOCKDIR}
 # mkdir ${LARGEBLOCKDIR}
 # mkdir ${AUGDIR}
+ARCHIVE_CSVLINES ${RUN_NAME} #runtime records of previous run for job planner
 mkdir empty_dir
 rsync empty_dir/ ${LOGDIR}/
-rsync empty_dir/ ${WORK_BLOCKDIR}/
-rsync empty_dir/ ${WORK_LARGEBLOCKDIR}/
-rsync empty_dir/ ${AUGDIR}/
+if [[ "${INCREMENTAL_BUILD}" != 'true' ]] #incremental build: blockmedian files of unaffected tiles are kept
+then
+	rsync empty_dir/ ${WORK_BLOCKDIR}/
+	rsync empty_dir/ ${WORK_LARGEBLOCKDIR}/
+	rsync empty_dir/ ${AUGDIR}/
+fi
 rm -r empty_dir
+rm ${WORK_MANIFESTDIR}/${RUN_NAME}_*.manifest 2>/dev/null
 MSG_SUCCESS "HOUSEKEEPING: Directories created."
 
-MSG_INFO "Using tile size limit for tiny tiles of <= ${BM_TINY_SIZE}."
-MSG_INFO "Using tile size limit for tiny tiles of ${BM_TINY_SIZE} < tilesize <= ${BM_SMALL_SIZE}."
-MSG_INFO "Using tile size limit for large tiles of > ${BM_SMALL_SIZE}.\n"
-
-# TINY FILES
-NUMBER_OF_TINY_FILES=$(find ${WORK_TILEDIR}/*.tile -type f -not -size +${BM_TINY_SIZE} | wc -l)
-if [ ${NUMBER_OF_TINY_FILES} -gt "0" ]
+if [[ "${JOB_PLANNER}" == 'true' ]] || [[ "${INCREMENTAL_BUILD}" == 'true' ]]
 then
-	MSG_INFO "Running low & high resolution blockmedian job on < ${NUMBER_OF_TINY_FILES} > tiny files."
-	NEW_NAME=${RUN_NAME}_tiny
-	# --cpus-per-task=12 --mem=12G
-	sbatch -J${NEW_NAME} --partition=smp,fat,xfat,mini --cpus-per-task=12 --mem=12G --chdir=${WORKDIR} --time=02:00:00 --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT},ARRAY_TASKS --output=${LOGDIR}/${NEW_NAME}_%a.slurmlog --error=${LOGDIR}/${NEW_NAME}_%a.slurmerr ${SRUNDIR}/C1_blockmedian_tiny.srun
-	MSG_BATCH ${NEW_NAME}
+	# balanced manifests (one per array task) instead of tiny/small/large size buckets
+	MSG_INFO "Packing tiles into manifests (target runtime ${PLAN_TASK_TIME} s per task)..."
+	if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+	then
+		cp ${WORK_BUILDDIR}/rebuilt_tiles.txt ${WORK_MANIFESTDIR}/${RUN_NAME}.files #only tiles rebuilt by incremental build (GENERAL/build_manifest.py)
+	else
+		find ${WORK_TILEDIR} -maxdepth 1 -name "*.tile" -type f > ${WORK_MANIFESTDIR}/${RUN_NAME}.files
+	fi
+	module load ${CONDA} 2>/dev/null
+	source activate ${CONDA_ENV}
+	python ${PYGENERALDIR}/plan_jobs.py --file-list ${WORK_MANIFESTDIR}/${RUN_NAME}.files --manifest-dir ${WORK_MANIFESTDIR} --prefix ${RUN_NAME} --logdir ${PLAN_LOGDIR} --counts ${WORK_TILE_COUNTS} --target-time ${PLAN_TASK_TIME} --max-tasks ${PLAN_MAX_TASKS}
+	conda deactivate
+	module purge
+	NUMBER_OF_TASKS=$(GET_NUMBER_OF_FILES "${WORK_MANIFESTDIR}/${RUN_NAME}_*.manifest") #one array task per manifest
+	if [ ${NUMBER_OF_TASKS} -gt "0" ]
+	then
+		PLAN_MEM=$(awk 'NR>1 && $5>m {m=$5} END {print m}' ${WORK_MANIFESTDIR}/${RUN_NAME}.plan) #largest predicted memory (MB)
+		PLAN_TIME=$(awk 'NR>1 && $4>t {t=$4} END {print int(2*t/60)+10}' ${WORK_MANIFESTDIR}/${RUN_NAME}.plan) #twice the longest predicted runtime (min)
+		MSG_INFO "Running low & high resolution blockmedian job on < ${NUMBER_OF_TASKS} > manifests."
+		NEW_NAME=${RUN_NAME}_plan
+		sbatch -J${NEW_NAME} --array=1-${NUMBER_OF_TASKS}%50 --partition=smp,fat,xfat,mini --chdir=${WORKDIR} --mem=${PLAN_MEM}M --time=${PLAN_TIME} --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT},ARRAY_TASKS --output=${LOGDIR}/${NEW_NAME}_%a.slurmlog --error=${LOGDIR}/${NEW_NAME}_%a.slurmerr ${SRUNDIR}/C1_blockmedian.srun manifest
+		MSG_BATCH ${NEW_NAME}
+	else
+		MSG_WARNING "No tiles found."
+	fi
+	SUM=${NUMBER_OF_TASKS}
 else
-	MSG_WARNING "No files smaller than ${BM_TINY_SIZE}."
-fi
+	MSG_INFO "Using tile size limit for tiny tiles of <= ${BM_TINY_SIZE}."
+	MSG_INFO "Using tile size limit for tiny tiles of ${BM_TINY_SIZE} < tilesize <= ${BM_SMALL_SIZE}."
+	MSG_INFO "Using tile size limit for large tiles of > ${BM_SMALL_SIZE}.\n"
 
-# SMALL FILES
-NUMBER_OF_SMALL_FILES=$(find ${WORK_TILEDIR}/*.tile -type f -size +${BM_TINY_SIZE} -not -size +${BM_SMALL_SIZE} | wc -l)
-if [ ${NUMBER_OF_SMALL_FILES} -gt "0" ]
-then
-	MSG_INFO "Running low & high resolution blockmedian job on < ${NUMBER_OF_SMALL_FILES} > small files."
-	NEW_NAME=${RUN_NAME}_small
-	# --mem-per-cpu=5000M
-	sbatch -J${NEW_NAME} --array=1-${NUMBER_OF_SMALL_FILES}%50 --partition=fat,xfat,mini --chdir=${WORKDIR} --time=01:00:00 --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT},ARRAY_TASKS --output=${LOGDIR}/${NEW_NAME}_%a.slurmlog --error=${LOGDIR}/${NEW_NAME}_%a.slurmerr ${SRUNDIR}/C1_blockmedian.srun small 
-	MSG_BATCH ${NEW_NAME}
-else
-	MSG_WARNING "No files smaller than ${BM_SMALL_SIZE}."
-fi
+	# TINY FILES
+	NUMBER_OF_TINY_FILES=$(find ${WORK_TILEDIR}/*.tile -type f -not -size +${BM_TINY_SIZE} | wc -l)
+	if [ ${NUMBER_OF_TINY_FILES} -gt "0" ]
+	then
+		MSG_INFO "Running low & high resolution blockmedian job on < ${NUMBER_OF_TINY_FILES} > tiny files."
+		NEW_NAME=${RUN_NAME}_tiny
+		# --cpus-per-task=12 --mem=12G
+		sbatch -J${NEW_NAME} --partition=smp,fat,xfat,mini --cpus-per-task=12 --mem=12G --chdir=${WORKDIR} --time=02:00:00 --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT},ARRAY_TASKS --output=${LOGDIR}/${NEW_NAME}_%a.slurmlog --error=${LOGDIR}/${NEW_NAME}_%a.slurmerr ${SRUNDIR}/C1_blockmedian_tiny.srun
+		MSG_BATCH ${NEW_NAME}
+	else
+		MSG_WARNING "No files smaller than ${BM_TINY_SIZE}."
+	fi
 
-# LARGE FILES
-NUMBER_OF_LARGE_FILES=$(find ${WORK_TILEDIR}/*.tile -type f -size +${BM_SMALL_SIZE} | wc -l) # ${BM_SMALL_SIZE} < filesize
-if [ ${NUMBER_OF_LARGE_FILES} -gt 0 ]
-then
-	MSG_INFO "Pausing for < 10 > seconds before submitting next SLURM job array. Otherwise scheduler would be overloaded!"
-	sleep 10 # wait for some seconds until SLURM scheduler processed submitted jobs...
-	MSG_INFO "Running low & high resolution blockmedian job on < ${NUMBER_OF_LARGE_FILES} > large files."
-	NEW_NAME=${RUN_NAME}_large
-	# --cpus-per-task=4 --mem-per-cpu=5000M
-    sbatch -J${NEW_NAME} --array=1-${NUMBER_OF_LARGE_FILES}%50 --partition=xfat,fat --chdir=${WORKDIR} --mem=42G --time=02:00:00 --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT},ARRAY_TASKS --output=${LOGDIR}/${NEW_NAME}_%a.slurmlog --error=${LOGDIR}/${NEW_NAME}_%a.slurmerr ${SRUNDIR}/C1_blockmedian.srun large
-	MSG_BATCH ${NEW_NAME}
-else
-	MSG_WARNING "No files larger than ${BM_SMALL_SIZE}."
-fi
+	# SMALL FILES
+	NUMBER_OF_SMALL_FILES=$(find ${WORK_TILEDIR}/*.tile -type f -size +${BM_TINY_SIZE} -not -size +${BM_SMALL_SIZE} | wc -l)
+	if [ ${NUMBER_OF_SMALL_FILES} -gt "0" ]
+	then
+		MSG_INFO "Running low & high resolution blockmedian job on < ${NUMBER_OF_SMALL_FILES} > small files."
+		NEW_NAME=${RUN_NAME}_small
+		# --mem-per-cpu=5000M
+		sbatch -J${NEW_NAME} --array=1-${NUMBER_OF_SMALL_FILES}%50 --partition=fat,xfat,mini --chdir=${WORKDIR} --time=01:00:00 --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT},ARRAY_TASKS --output=${LOGDIR}/${NEW_NAME}_%a.slurmlog --error=${LOGDIR}/${NEW_NAME}_%a.slurmerr ${SRUNDIR}/C1_blockmedian.srun small 
+		MSG_BATCH ${NEW_NAME}
+	else
+		MSG_WARNING "No files smaller than ${BM_SMALL_SIZE}."
+	fi
+
+	# LARGE FILES
+	NUMBER_OF_LARGE_FILES=$(find ${WORK_TILEDIR}/*.tile -type f -size +${BM_SMALL_SIZE} | wc -l) # ${BM_SMALL_SIZE} < filesize
+	if [ ${NUMBER_OF_LARGE_FILES} -gt 0 ]
+	then
+		MSG_INFO "Pausing for < 10 > seconds before submitting next SLURM job array. Otherwise scheduler would be overloaded!"
+		sleep 10 # wait for some seconds until SLURM scheduler processed submitted jobs...
+		MSG_INFO "Running low & high resolution blockmedian job on < ${NUMBER_OF_LARGE_FILES} > large files."
+		NEW_NAME=${RUN_NAME}_large
+		# --cpus-per-task=4 --mem-per-cpu=5000M
+		sbatch -J${NEW_NAME} --array=1-${NUMBER_OF_LARGE_FILES}%50 --partition=xfat,fat --chdir=${WORKDIR} --mem=42G --time=02:00:00 --mail-user=${MAIL_EVOKER} --mail-type=${MAIL_ERROR_EXIT},ARRAY_TASKS --output=${LOGDIR}/${NEW_NAME}_%a.slurmlog --error=${LOGDIR}/${NEW_NAME}_%a.slurmerr ${SRUNDIR}/C1_blockmedian.srun large
+		MSG_BATCH ${NEW_NAME}
+	else
+		MSG_WARNING "No files larger than ${BM_SMALL_SIZE}."
+	fi
 
-SUM=$(($NUMBER_OF_TINY_FILES+$NUMBER_OF_SMALL_FILES+$NUMBER_OF_LARGE_FILES))
+	SUM=$(($NUMBER_OF_TINY_FILES+$NUMBER_OF_SMALL_FILES+$NUMBER_OF_LARGE_FILES))
+fi
 
 if [ $SUM -gt "0" ]
 then
@@ -12,9 +12,16 @@ mkdir ${LOGDIR}
 CREATE_FOLDERS
 mkdir empty_dir
 rsync empty_dir/ ${LOGDIR}/
-rsync empty_dir/ ${WORK_LARGEBLOCKDIR}/
+if [[ "${INCREMENTAL_BUILD}" != 'true' ]]
+then
+	rsync empty_dir/ ${WORK_LARGEBLOCKDIR}/ #incremental build: merged blockmedian files of unaffected basic tiles are kept
+fi
 rm -r empty_dir
 rm ${WORK_BLOCKDIR}/*.extent 2>/dev/null
+if [[ "${INCREMENTAL_BUILD}" != 'true' ]]
+then
+	rm ${WORK_BLOCKDIR}/*.bmstats 2>/dev/null #incremental build: statistics of unaffected basic tiles are kept
+fi
 find ${LOGBASEDIR} -name "C*.slurmerr" -empty -type f -delete 2>/dev/null
 MSG_SUCCESS "HOUSEKEEPING: Directories created."
 
@@ -22,7 +29,12 @@ MSG_INFO "Syncing dynamic data..."
 SYNC_DATA
 MSG_SUCCESS "Done."
 
-{ read -a LIST_OF_BM_TILES; } < ${BASIC_TILE_TABLE} #read the list of tiles from text file SCRIPTS/DATA/TILES.txt
+if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+then
+	{ read -a LIST_OF_BM_TILES; } < ${WORK_BUILDDIR}/basic_tiles.txt #only basic tiles affected by incremental build (GENERAL/build_manifest.py)
+else
+	{ read -a LIST_OF_BM_TILES; } < ${BASIC_TILE_TABLE} #read the list of tiles from text file SCRIPTS/DATA/TILES.txt
+fi
 NUMBER_OF_BM_TILES=${#LIST_OF_BM_TILES[@]}
 
 NUMBER_OF_FILES=$(GET_NUMBER_OF_FILES "${WORK_BLOCKDIR}/*.bm") #how many files are there in total to process?
@@ -13,7 +13,10 @@ CREATE_FOLDERS
 #mkdir ${AUGDIR}
 mkdir empty_dir
 rsync empty_dir/ ${LOGDIR}/
-rsync empty_dir/ ${AUGDIR}/
+if [[ "${INCREMENTAL_BUILD}" != 'true' ]]
+then
+	rsync empty_dir/ ${AUGDIR}/ #incremental build: augmented data of unaffected basic tiles is kept
+fi
 rm -r empty_dir
 find ${LOGBASEDIR} -name "C*.slurmerr" -empty -type f -delete 2>/dev/null
 MSG_SUCCESS "HOUSEKEEPING: Directories created."
@@ -21,7 +24,8 @@ MSG_SUCCESS "HOUSEKEEPING: Directories created."
 MSG_INFO "Syncing Blockmedian windows..."
 module load ${CONDA} 2>/dev/null
 source activate ${CONDA_ENV}
-python ${PYDIR}/C3_sync_bm_stats.py --infolder ${WORK_BLOCKDIR} --suffix 'extent'
+python ${PYDIR}/C2_bm_extents.py --merge "${WORK_BLOCKDIR}/*.bmstats" --output ${WORK_BM_STATS}
+python ${PYDIR}/C3_sync_bm_stats.py --table ${WORK_BM_STATS}
 conda deactivate
 module pruge ${CONDA}
 MSG_SUCCESS "Done"
@@ -30,10 +34,15 @@ MSG_IMPORTANT "Syncing dynamic data..."
 SYNC_DATA
 
 MSG_INFO "Updating tiles database with blockmedian windows"
-echo -e "#!/usr/bin/bash\n#Xsrun  I know what I am doing\nmodule purge\nmodule load ${CONDA} 2>/dev/null\nsource activate ${CONDA_ENV}\npython ${PYDIR}/C3_sync_bm_stats.py --infolder ${WORK_BLOCKDIR} --suffix extent\nconda deactivate\nmodule purge" | sbatch --job-name=${RUN_NAME}_PY --partition=smp,fat,xfat,mini --time=00:10:00 --qos='short' --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=${LOGDIR}/C3_sync_bm_stats.pylog #/dev/null
+echo -e "#!/usr/bin/bash\n#Xsrun  I know what I am doing\nmodule purge\nmodule load ${CONDA} 2>/dev/null\nsource activate ${CONDA_ENV}\npython ${PYDIR}/C3_sync_bm_stats.py --table ${WORK_BM_STATS}\nconda deactivate\nmodule purge" | sbatch --job-name=${RUN_NAME}_PY --partition=smp,fat,xfat,mini --time=00:10:00 --qos='short' --mail-user=${MAIL_PROJECT_DEV} --mail-type=${MAIL_ERROR_EXIT} --output=${LOGDIR}/C3_sync_bm_stats.pylog #/dev/null
 MSG_SUCCESS "Done."
 
-{ read -a LIST_OF_BM_TILES; } < ${BASIC_TILE_TABLE} #read the list of tiles from text file SCRIPTS/DATA/TILES.txt
+if [[ "${INCREMENTAL_BUILD}" == 'true' ]]
+then
+	{ read -a LIST_OF_BM_TILES; } < ${WORK_BUILDDIR}/basic_tiles.txt #only basic tiles affected by incremental build (GENERAL/build_manifest.py)
+else
+	{ read -a LIST_OF_BM_TILES; } < ${BASIC_TILE_TABLE} #read the list of tiles from text file SCRIPTS/DATA/TILES.txt
+fi
 
 NUMBER_OF_BM_TILES=${#LIST_OF_BM_TILES[@]}
 if [ ${NUMBER_OF_BM_TILES} -gt "0" ]
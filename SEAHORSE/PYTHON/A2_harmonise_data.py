@@ -10,8 +10,31 @@ import os
 import sys
 import re
 import csv
+import argparse
+import multiprocessing
 import pyproj
 
+import numpy as np
+
+from GENERAL.lib.metadata_index import MetadataIndex, is_metadata_index
+
+CHUNK_SIZE = 2**26 # number of characters read per block in chunked mode (~64 MB)
+
+# chunk-wise equivalents of brute_force_split() and clean_number()
+# (lines are only ever separated by '\n', hence all patterns exclude it)
+WHITESPACE = {c: ' ' for c in range(sys.maxunicode + 1) if chr(c).isspace() and chr(c) != '\n'}
+DELIMITERS = {ord(';'): ' ', ord(','): ' '}
+NUMBER = r'-?(?:[0-9]+\.?[0-9]*|\.[0-9]+)' # everything float() accepts after cleaning
+RE_LEADING = re.compile(r'\n +')
+RE_TRAILING = re.compile(r' +\n')
+RE_SEPARATORS = re.compile(r'  +')
+RE_SIGNS = re.compile(r'--+')
+RE_INVALID_CHARS = re.compile(r'[^-0123456789. \n]+')
+RE_MULTIPLE_DECIMALS = re.compile(r'(\.[^ \n.]*)\.[^ \n]*')
+RE_XYZ = re.compile(rf'^(?:({NUMBER}) ({NUMBER}) ({NUMBER})(?: .*)?|.*)$', re.MULTILINE)
+# fast path: lines that are already clean (no auto-fix required)
+RE_CLEAN_XYZ = re.compile(rf'^(?:[ \t]*({NUMBER})[ \t,;]+({NUMBER})[ \t,;]+({NUMBER})(?:[ \t,;].*)?|.*)$', re.MULTILINE)
+
 def getFromDictArray(dictArray,keyName,value):
     for pos, di in enumerate(dictArray):
         test = di.get(keyName,-1)
@@ -40,6 +63,34 @@ def get_metadata(filename):
             metadata.append(row)
     return metadata
 
+def get_dataset_name(filename):
+    """Get dataset name from split filename, e.g.: cruise#aa.insplit -> cruise.xyz"""
+    dataset_name = os.path.splitext(os.path.basename(filename))[0]
+    return f"{dataset_name.split('#')[0]}.xyz"
+
+def get_records(metafile, dataset_names):
+    """
+    Find metadata records of datasets, either in metadata index or in tab-separated SQL dump.
+    The metadata is opened (or parsed) only once for all datasets.
+    
+    Parameters
+    ----------
+    metafile : str
+        Metadata index (SQLite) or metadata file from SQL dump
+    dataset_names : list of str
+        Dataset names (case-insensitive)
+        
+    Returns
+    -------
+    records : list of dicts
+        Metadata of each dataset (None if not found)
+    """
+    if is_metadata_index(metafile):
+        with MetadataIndex(metafile) as index:
+            return [index.by_name(name) for name in dataset_names]
+    metadata = get_metadata(metafile)
+    return [getFromDictArray(metadata, 'dataset_name', name) for name in dataset_names]
+
 def brute_force_split(line, desired_sep=' '):
     """
     Replace all characters except ' ' (whitespace) to homogenise line separators. 
@@ -137,35 +188,196 @@ def harmonise(filename, records) -> list:#, outproj)->list:
             harmonised.write(f'{newLine}\n') #write the line, finish by adding a newline character
                         
             if ErrArea:
-                MSGERROR.append(f'{RID}\tERROR\t{os.path.basename(fileName)}\t{ErrLine}\t{cnt}\tline is malformed')
+                MSGERROR.append(f'{RID}\tERROR\t{os.path.basename(filename)}\t{ErrLine}\t{cnt}\tline is malformed')
                 ErrArea = False
                 ErrLine = None
         harmonised.close()  
     return MSGERROR, errorName, cnt
 
-if __name__ =='__main__':
+def normalise_chunk(text):
+    """
+    Apply brute_force_split() and clean_number() to all lines of a text chunk at once.
+    After normalisation every line consists of cleaned tokens separated by a single ' '.
     
-    if len(sys.argv) > 1: # check if there are any commandline arguments
-        filename = sys.argv[1].rstrip() #first argument of the script, input file name provided by sruns, remove trailing whitespace
-        metafile = sys.argv[2].rstrip()
-    else:
-        print('[ERROR]    No input argument(s) given!')
-        sys.exit(1)
+    Parameters
+    ----------
+    text : str
+        Chunk of lines (separated by '\\n')
+        
+    Returns
+    -------
+    text : str
+        Normalised chunk with identical number of lines
+    """
+    text = text.translate(WHITESPACE)
+    if text.startswith(' ') or '\n ' in text: # line.strip()
+        text = RE_LEADING.sub('\n', f'\n{text}')[1:]
+    if text.endswith(' ') or ' \n' in text:
+        text = RE_TRAILING.sub('\n', f'{text}\n')[:-1]
+    text = text.translate(DELIMITERS) # combine all delimiters (tab, space, colon, comma)
+    text = RE_SEPARATORS.sub(' ', text)
+    text = RE_SIGNS.sub('-', text) # replace multiple signs with single
+    text = RE_INVALID_CHARS.sub('', text) # remove dubious characters
+    text = RE_MULTIPLE_DECIMALS.sub(r'\1', text) # 1234.00.00 -> 1234.00
+    return text
+
+def parse_chunk(text):
+    """
+    Extract x, y, z from chunk of lines and apply depth checks to whole arrays.
+    Clean lines are parsed directly (fast path), only the remaining lines are
+    auto-fixed using normalise_chunk().
     
-    dataset_name = os.path.splitext(os.path.basename(filename))[0]
-    dataset_name = f"{dataset_name.split('#')[0]}.xyz"
+    Parameters
+    ----------
+    text : str
+        Chunk of lines (separated by '\\n')
+        
+    Returns
+    -------
+    valid : numpy.ndarray
+        Boolean mask of lines that were harmonised successfully
+    clean : numpy.ndarray
+        Boolean mask of lines that did not require any auto-fix
+    xyz : numpy.ndarray
+        Float array (n_valid, 3) of x, y, z (negative depths)
+    """
+    tokens = np.array(RE_CLEAN_XYZ.findall(text), dtype=object).reshape(-1, 3)
+    clean = tokens[:, 0] != '' # non-matching lines yield empty groups
+    if not clean.all():
+        lines = text.split('\n')
+        fix_ids = np.flatnonzero(~clean)
+        fixed_text = normalise_chunk('\n'.join([lines[i] for i in fix_ids]))
+        tokens[fix_ids] = np.array(RE_XYZ.findall(fixed_text), dtype=object).reshape(-1, 3)
+    valid = tokens[:, 0] != ''
+    xyz = tokens[valid].astype(np.float64)
+    
+    #check depth
+    xyz[:, 2] = np.where(xyz[:, 2] > 0, -xyz[:, 2], xyz[:, 2])
+    depth_ok = np.abs(xyz[:, 2]) <= 11000
+    valid[valid] = depth_ok
+    return valid, clean, xyz[depth_ok]
 
-    metadata = get_metadata(metafile)
-    records = getFromDictArray(metadata, 'dataset_name', dataset_name)
+def format_xyz(xyz):
+    """Discard decimals and build harmonised lines (identical to str(int(value)))."""
+    if (np.abs(xyz[:, :2]) >= 2**63).any(): # outside int64, use python integers instead
+        columns = [[int(v) for v in col] for col in xyz.T]
+    else:
+        columns = xyz.astype(np.int64).T.tolist()
+    return ''.join(map('{} {} {}\n'.format, *columns))
+
+def harmonise_chunked(filename, records, chunk_size=CHUNK_SIZE) -> list:
+
+    """Chunked harmonisation loop. Same rules (and output) as harmonise() but
+    reads large blocks of lines and cleans them using regular expressions on the 
+    whole block and numpy arrays instead of single lines.
+    Counts lines that were clean, auto-fixed or malformed."""
     
-    if records is None:
-        print(f'ERROR:\tNo metadata found for dataset {dataset_name}!')
-        sys.exit(1)
+    RID = records['dataset_rid'] #use regional identifier as new filename
+    weight = records['weight']
+    newFilename=f'{os.path.splitext(filename)[0]}#{RID}_w{weight}.hxyz' #hxyz harmonised xyz file
+    errorName=f'{os.path.splitext(filename)[0]}#{RID}_w{weight}.harmerrors' #hxyz harmonised xyz file
+    
+    if weight is None:
+        return "weight is missing", f'{os.path.splitext(filename)[0]}#{RID}_w-1.harmerrors' #hxyz harmonised xyz file, -1
     
-    MSG, errorName, linecount = harmonise(filename, records)
+    MSGERROR=[]
+    ErrLine = None # first line of current malformed area (None: no open area)
+    cnt = -1 # index of last line read
+    counts = {'clean': 0, 'auto-fixed': 0, 'malformed': 0}
+    print('WARNING:\tAuto-fixing xyz errors (decluttering log files)!')
+    
+    with open(filename,'r') as f, open(newFilename,'w') as harmonised:
+        remainder = ''
+        while True:
+            block = f.read(chunk_size)
+            if block:
+                block = remainder + block
+                cut = block.rfind('\n') + 1 # only process complete lines
+                text, remainder = block[:cut-1], block[cut:]
+                if cut == 0:
+                    continue
+            elif remainder: # last line without trailing newline
+                text, remainder = remainder, ''
+            else:
+                break
+            
+            valid, clean, xyz = parse_chunk(text)
+            harmonised.write(format_xyz(xyz))
+            counts['clean'] += np.count_nonzero(valid & clean)
+            counts['auto-fixed'] += np.count_nonzero(valid & ~clean)
+            counts['malformed'] += np.count_nonzero(~valid)
+            
+            # malformed areas are reported once the next valid line is reached
+            line_ids = np.arange(cnt + 1, cnt + 1 + valid.size)
+            previous_invalid = np.concatenate(([ErrLine is not None], ~valid[:-1]))
+            starts = line_ids[~valid & ~previous_invalid].tolist()
+            ends = line_ids[valid & previous_invalid].tolist()
+            if ErrLine is not None:
+                starts.insert(0, ErrLine)
+            for start, end in zip(starts, ends):
+                MSGERROR.append(f'{RID}\tERROR\t{os.path.basename(filename)}\t{start}\t{end}\tline is malformed')
+            ErrLine = starts[-1] if len(starts) > len(ends) else None
+            cnt += valid.size
+    print(f'INFO:\t{os.path.basename(filename)}\t' + '\t'.join(f'{v} {k}' for k, v in counts.items()))
+    return MSGERROR, errorName, cnt
+
+def harmonise_file(filename, records, mode='chunked', chunk_size=CHUNK_SIZE):
+    """Harmonise single file and write error file (if errors occurred)."""
+    if mode == 'chunked':
+        MSG, errorName, linecount = harmonise_chunked(filename, records, chunk_size)
+    else:
+        MSG, errorName, linecount = harmonise(filename, records)
     
     if len(MSG) > 0:
         MSG.append(f"{records['dataset_rid']}\tINFO\t{os.path.basename(filename)}\t{linecount}\t{linecount}\ttotal lines")
         with open(errorName  ,'w+') as f: #create and write
             for line in MSG:
                 f.write(f'{line}\n')
+    return filename
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Harmonise cruise data to SEABED2030 format (x y z, integer precision, negative depths).')
+    parser.add_argument('input_files', type=str, nargs='*', help='Input cruise split(s) (*.insplit)')
+    parser.add_argument('metadata_file', type=str, help='Metadata index or metadata table (SQL dump)')
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='Text file listing input cruise splits (one per line)')
+    parser.add_argument('--processes', '-p', type=int, default=1,
+                        help='Number of files harmonised in parallel (default=1)')
+    parser.add_argument('--mode', '-m', type=str, default='chunked', choices=['chunked', 'line'],
+                        help='Harmonise blocks of lines at once (default) or line by line')
+    parser.add_argument('--chunk-size', '-c', type=int, default=CHUNK_SIZE,
+                        help=f'Number of characters per block in chunked mode (default={CHUNK_SIZE})')
+    return parser
+
+if __name__ =='__main__':
+    # get input arguments
+    parser = define_input_args()
+    args = parser.parse_args()
+    
+    filenames = [f.rstrip() for f in args.input_files] #input file names provided by sruns, remove trailing whitespace
+    if args.manifest is not None:
+        with open(args.manifest, 'r') as f:
+            filenames += [line.strip() for line in f if line.strip() != '']
+    metafile = args.metadata_file.rstrip()
+    
+    if len(filenames) == 0:
+        print('[ERROR]    No input file(s) given!')
+        sys.exit(1)
+    
+    dataset_names = [get_dataset_name(f) for f in filenames]
+    jobs = []
+    for filename, dataset_name, records in zip(filenames, dataset_names, get_records(metafile, dataset_names)):
+        if records is None:
+            print(f'ERROR:\tNo metadata found for dataset {dataset_name}!')
+            continue
+        jobs.append((filename, records, args.mode, args.chunk_size))
+    
+    if args.processes > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(min(args.processes, len(jobs))) as pool:
+            pool.starmap(harmonise_file, jobs, chunksize=1)
+    else:
+        for job in jobs:
+            harmonise_file(*job)
+    
+    if len(jobs) < len(filenames):
+        sys.exit(1)
@@ -12,11 +12,19 @@ import glob
 import time
 import datetime
 import argparse
+import multiprocessing
+from queue import Empty
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
+from GENERAL.lib.tile_writer import TileWriter, BUFFER_SIZE, MAX_OPEN_FILES
+from GENERAL.lib.tile_format import to_records
+from GENERAL.lib.tile_merge import sort_tile_file
+
+HIGHRES_WEIGHTS = [15, 20, 25, 30] # weights (TIDs) of high resolution data (see C1)
+
 
 def log_message(ref_lvl:int, *msg_args)->None:
     """Print log messages depending on level of verbosity"""
@@ -25,11 +33,34 @@ def log_message(ref_lvl:int, *msg_args)->None:
 
 def define_input_args():
     parser = argparse.ArgumentParser(description='This script assigns each data point of the input file to a specific tile.')
-    parser.add_argument('input_file', type=str, help='Input cruise split (*.xyzsplit)')
+    parser.add_argument('input_files', type=str, nargs='*', help='Input cruise split(s) (*.xyzsplit)')
     parser.add_argument('tile_file', type=str, help='Input surface GeoTIFF (low resolution)')
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='Text file listing input cruise splits (one per line) to tile in batch mode')
+    parser.add_argument('--batch-name', '-b', type=str, default=None,
+                        help='Batch mode: name of tile fragments "tile_{ID}_{basicTile}_{batch_name}.til" (default: name of manifest)')
+    parser.add_argument('--output-dir', '-o', type=str, default=None,
+                        help='Output directory (default: directory of (first) input split)')
+    parser.add_argument('--processes', '-p', type=int, default=1,
+                        help='Batch mode: number of worker processes tiling splits in parallel (default=1)')
     parser.add_argument('--verbose', '-v', type=int, nargs='?', default=0, const=0, choices=[0, 1, 2],
                         help='Level of output verbosity (default=0)')
     parser.add_argument('--output-removed', '-or', action='store_true', help='Write removed lines to files.')
+    parser.add_argument('--reader', '-r', type=str, default='fast', choices=['fast', 'regex'],
+                        help='Parser for input file: "fast" for harmonised (whitespace-separated) splits using the C engine, ' +
+                        '"regex" for mixed delimiters [,;\\t ] using the (slow) python engine (default="fast")')
+    parser.add_argument('--format', '-f', type=str, default='ascii', choices=['ascii', 'binary'],
+                        help='Format of tile files: "ascii" (space-separated text) or "binary" (int32 records x,y,z,weight,rid) (default="ascii")')
+    parser.add_argument('--buffer-size', '-bs', type=int, default=BUFFER_SIZE // 2**20,
+                        help=f'Total size (MB) of in-memory tile buffers (default={BUFFER_SIZE // 2**20})')
+    parser.add_argument('--max-open-files', '-mf', type=int, default=MAX_OPEN_FILES,
+                        help=f'Maximum number of simultaneously open tile files (default={MAX_OPEN_FILES})')
+    parser.add_argument('--sorted', '-s', action='store_true',
+                        help='Sort records of each tile fragment by x, y, z, weight, rid (for k-way merge in B3)')
+    parser.add_argument('--split-highres', action='store_true',
+                        help='Write high resolution records to separate fragments ("*_high.til"), which B3 stores at the start of the tile')
+    parser.add_argument('--highres-weights', type=int, nargs='+', default=HIGHRES_WEIGHTS,
+                        help=f'Weights of high resolution data (default: {" ".join(str(w) for w in HIGHRES_WEIGHTS)})')
     return parser
 
 def timeit(func):
@@ -63,6 +94,38 @@ def clean_server(pattern:str)->None:
             except:
                 pass
 
+def read_split(input_file, reader:str='fast', chunksize:int=1_000_000):
+    """
+    Create iterator over chunks of input file (x, y, z columns as float32).
+    
+    Parameters
+    ----------
+    input_file : str
+        Input cruise split (*.xyzsplit)
+    reader : str
+        "fast": C engine for whitespace-separated values (harmonised output of stage A)
+        "regex": python engine with regex separator (",", ";", tab or space)
+    chunksize : int
+        Number of rows per chunk
+        
+    Returns
+    ----------
+    data_iterator : pandas.io.parsers.TextFileReader
+        Iterator over chunks of input data
+    
+    """
+    if reader == 'fast':
+        return pd.read_csv(input_file, delim_whitespace=True, dtype=np.float32, header=None, names=['x','y','z'],
+                           engine='c', error_bad_lines=False, warn_bad_lines=True,
+                           chunksize=chunksize, iterator=True)
+    elif reader == 'regex':
+        sep = r'[,;\t\s+]'
+        return pd.read_csv(input_file, sep=sep, dtype=np.float32, header=None, names=['x','y','z'],
+                           engine='python', error_bad_lines=False, warn_bad_lines=True,
+                           chunksize=chunksize, iterator=True)
+    else:
+        raise ValueError(f'Unknown reader "{reader}" (use "fast" or "regex")')
+
 @timeit
 def load_tile_extents(tile_file):
     """
@@ -88,59 +151,121 @@ def load_tile_extents(tile_file):
     
     return tile_def
 
+class TileGrid():
+    """
+    Regular grid of tile cells with lookup array mapping each grid cell to its tile definition.
+    Replaces the binning via "pd.cut" (categorical tile center labels) and the merge on tile center
+    coordinates with integer arithmetic and array indexing.
+    
+    Parameters
+    ----------
+    tile_def : pandas.DataFrame
+        Modified table of tile extents with computed tile center coordinates
+    
+    """
+    def __init__(self, tile_def):
+        # create bin range for both X and Y coordinates
+        xmin, xmax = int(tile_def['West'].min()),  int(tile_def['East'].max())
+        ymin, ymax = int(tile_def['South'].min()), int(tile_def['North'].max())
+        self.extent = (xmin, xmax, ymin, ymax)
+        log_message(2, f'[INFO]   tile range (X): {xmin} m, {xmax} m')
+        log_message(2, f'[INFO]   tile range (Y): {ymin} m, {ymax} m')
+        
+        tile_size_x = np.abs(xmax - int(tile_def['West'].max()))  # get tile size (m) in X-coordinate direction
+        tile_size_y = np.abs(ymax - int(tile_def['South'].max())) # get tile size (m) in Y-coordinate direction
+        log_message(2, f'[INFO]   tile size (X): {tile_size_x} m')
+        log_message(2, f'[INFO]   tile size (Y): {tile_size_y} m')
+        
+        self.edges_x = np.arange(xmin, xmax + tile_size_x, tile_size_x, dtype='int')
+        self.edges_y = np.arange(ymin, ymax + tile_size_y, tile_size_y, dtype='int')
+        self.nx, self.ny = len(self.edges_x) - 1, len(self.edges_y) - 1
+        
+        # tile center coordinates (labels of grid cells)
+        label_x = np.arange(xmin + tile_size_x/2, xmax + tile_size_x/2, tile_size_x, dtype='int')
+        label_y = np.arange(ymin + tile_size_y/2, ymax + tile_size_y/2, tile_size_y, dtype='int')
+        
+        # grid cell of each tile (matched via tile center coordinates)
+        col = self._match_label(tile_def['x_tiles'].values, label_x)
+        row = self._match_label(tile_def['y_tiles'].values, label_y)
+        valid = (col >= 0) & (row >= 0)
+        cells = row[valid] * self.nx + col[valid]
+        cells, first = np.unique(cells, return_index=True)
+        if len(cells) < np.count_nonzero(valid):
+            log_message(1, '[WARNING] Duplicate tile extents found. Using first tile definition per cell.')
+        
+        # lookup: grid cell -> row of tile definitions (-1 if no tile defined for cell)
+        self.lookup = np.full(self.nx * self.ny, -1, dtype=np.int64)
+        self.lookup[cells] = np.flatnonzero(valid)[first]
+        
+        # tile IDs (last element selected by lookup value -1 -> NaN)
+        self.ids = np.append(tile_def['ID'].values.astype(np.float32), np.float32(np.nan))
+        self.basic_tiles = np.append(tile_def['basicTile'].values.astype(np.float32), np.float32(np.nan))
+    
+    @staticmethod
+    def _match_label(values, labels):
+        """Index of each value in sorted labels (-1 if not found)."""
+        idx = np.searchsorted(labels, values).clip(0, len(labels) - 1)
+        return np.where(labels[idx] == values, idx, -1)
+    
+    @staticmethod
+    def _bin(values, edges):
+        """
+        Bin index of each value using right-closed intervals with the lowest edge included
+        (identical to "pd.cut(..., include_lowest=True)"). Values outside of edges (or NaN) return -1.
+        """
+        nbins = len(edges) - 1
+        v = np.asarray(values, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            idx = np.ceil((v - edges[0]) / (edges[1] - edges[0])) - 1
+        idx = np.nan_to_num(idx, nan=0, posinf=0, neginf=0).clip(0, nbins - 1).astype(np.int64)
+        
+        # correct floating point rounding for values close to bin edges
+        idx = np.minimum(idx + (v > edges[idx + 1]), nbins - 1)
+        idx -= (v <= edges[idx]) & (idx > 0)
+        
+        with np.errstate(invalid='ignore'):
+            inside = (v >= edges[0]) & (v <= edges[-1])
+        return np.where(inside, idx, -1)
+    
+    def cell_index(self, x, y):
+        """Flat grid cell index of each point (-1 if outside of grid)."""
+        col = self._bin(x, self.edges_x)
+        row = self._bin(y, self.edges_y)
+        return np.where((col >= 0) & (row >= 0), row * self.nx + col, -1)
+
 @timeit
-def bin_data(df, tile_extents):
+def bin_data(df, tile_grid):
     """
-    Assign center coordinates of corresponding tile for each data point (row) using binning via "pd.cut".
+    Assign grid cell of corresponding tile for each data point (row) using integer arithmetic.
     
     Parameters
     ----------
     df : pandas.DataFrame
         Chunk of input data to process
-    tile_extents : pandas.DataFrame
-        Bounding box coordinates of all tiles
+    tile_grid : TileGrid
+        Grid of tile cells (created from tile extents)
         
     Returns
     ----------
     df : pandas.DataFrame
-        Data chunck with assigned tile center coordinates
+        Data chunck with assigned grid cells ("cell", -1 if outside of tile extents)
     
     """
-    # create bin range for both X and Y coordinates --> used for groupby tile operation!
-    xmin, xmax = int(tile_extents['West'].min()),  int(tile_extents['East'].max())
-    ymin, ymax = int(tile_extents['South'].min()), int(tile_extents['North'].max())
-    log_message(2, f'[INFO]   tile range (X): {xmin} m, {xmax} m')
-    log_message(2, f'[INFO]   tile range (Y): {ymin} m, {ymax} m')
-    
-    tile_size_x = np.abs(xmax - int(tile_extents['West'].max()))  # get tile size (m) in X-coordinate direction
-    tile_size_y = np.abs(ymax - int(tile_extents['South'].max())) # get tile size (m) in Y-coordinate direction
-    log_message(2, f'[INFO]   tile size (X): {tile_size_x} m')
-    log_message(2, f'[INFO]   tile size (Y): {tile_size_y} m')
-    
-    tile_range_x = np.arange(xmin, xmax + tile_size_x, tile_size_x, dtype='int')
-    tile_range_y = np.arange(ymin, ymax + tile_size_y, tile_size_y, dtype='int')
-    
-    # create tile center coordinates for labeling
-    tile_range_x_label = np.arange(xmin + tile_size_x/2, xmax + tile_size_x/2, tile_size_x, dtype='int')
-    tile_range_y_label = np.arange(ymin + tile_size_y/2, ymax + tile_size_y/2, tile_size_y, dtype='int')
-    
-    # perform binning into tiles along X and Y axis
-    df['x_tiles'] = pd.cut(df['x'].values, bins=tile_range_x, labels=tile_range_x_label, include_lowest=True)
-    df['y_tiles'] = pd.cut(df['y'].values, bins=tile_range_y, labels=tile_range_y_label, include_lowest=True)
+    df['cell'] = tile_grid.cell_index(df['x'].values, df['y'].values)
     
     return df
 
 @timeit
-def assign_tile_ID(data, tile_def, weight, rid, depth_threshold=-9999):
+def assign_tile_ID(data, tile_grid, weight, rid, depth_threshold=-9999):
     """
-    Merge dataframes with data and tile extent information
+    Look up tile ID and basic tile ID of each data point from its grid cell.
     
     Parameters
     ----------
     data : pandas.DataFrame
         Chunk of input data to process
-    tile_def : pandas.DataFrame
-        Modified table of tile extents with computed tile center coordinates
+    tile_grid : TileGrid
+        Grid of tile cells (created from tile extents)
     weight : int
         Weight of cruise from filename (e.g. "10001_w20" -> "20")
     rid : int
@@ -151,7 +276,7 @@ def assign_tile_ID(data, tile_def, weight, rid, depth_threshold=-9999):
     Returns
     ----------
     data_merge : pandas.DataFrame
-        Merged dataframe with [x,y,z,x_tiles,y_tiles,ID,basicTile,weight,rid] columns and
+        Dataframe with [x,y,z,cell,tile_row,ID,basicTile,weight,rid] columns and
         without rows feature "NaN" and depths < depth_threshold (-9999).
     
     """
@@ -159,32 +284,32 @@ def assign_tile_ID(data, tile_def, weight, rid, depth_threshold=-9999):
     cnt_rows = len(data)
     log_message(1, f'[INFO]   Total values:\t\t\t\t{cnt_rows:>9}')
     
-    # Drop all rows with no tile ID (outside of IBCSO area)
-    mask_nan = data.isnull().any(axis=1)
+    # Drop all rows with no grid cell (outside of IBCSO area)
+    mask_nan = data[['x','y','z']].isnull().any(axis=1).values | (data['cell'].values < 0)
     data_nan = data[mask_nan].copy()
-    data.drop(data[mask_nan].index, inplace=True)
+    data = data[~mask_nan]
     cnt_nan = len(data)
     log_message(1, f'[INFO]   NaN values (e.g. outside):\t{cnt_rows - cnt_nan:>9}')
     
-    # Merge ID column of tile_def with input dataframe
-    data_merge = data.merge(tile_def[['ID','basicTile','x_tiles','y_tiles']], on=['x_tiles','y_tiles'], how='left')
-    log_message(2, f'[INFO]   Merge tile ID with data chunks')
+    # Look up tile ID of grid cells (NaN for cells without tile)
+    rows = tile_grid.lookup[data['cell'].values]
+    data_merge = data.assign(tile_row=rows, ID=tile_grid.ids[rows], basicTile=tile_grid.basic_tiles[rows])
+    log_message(2, f'[INFO]   Look up tile ID for data chunks')
     
     # Drop all rows with depth exceeding user limit
-    mask_invalid_depth = (data_merge['z'] <= depth_threshold)
+    mask_invalid_depth = (data_merge['z'] <= depth_threshold).values
     data_invalid_depth = data_merge[mask_invalid_depth].copy()
-    data_merge.drop(data_merge[mask_invalid_depth].index, inplace=True)
+    data_merge = data_merge[~mask_invalid_depth]
     cnt_invalid_depths = len (data_merge)
     log_message(1, f'[INFO]   Invalid depth values:\t\t{cnt_nan - cnt_invalid_depths:>9}')
     
     # set weight and RID of input file
-    data_merge['weight'] = weight
-    data_merge['rid'] = rid
+    data_merge = data_merge.assign(weight=weight, rid=rid)
     
     return data_merge, data_nan, data_invalid_depth
 
 @timeit
-def write_discarted_lines(df, out_type, prefix, output_dir)->None:
+def write_discarted_lines(df, out_type, prefix, output_dir, rid)->None:
     """Wrapper function to write removed lines to files for later QC."""
     
     # Check for column names to use
@@ -213,6 +338,54 @@ def compare_min_max(min_ref, max_ref, min_new, max_new):
         max_out = max_ref
     return min_out, max_out
 
+class TileStatsAccumulator():
+    """
+    Streaming statistics of a cruise split: extents of X, Y and Z and number of points per tile
+    (counted over rows of the tile definitions).
+    
+    Parameters
+    ----------
+    tile_grid : TileGrid
+        Grid of tile cells (created from tile extents)
+    
+    """
+    def __init__(self, tile_grid):
+        # initialize min and max values (reversed for comparison!)
+        ext_xmin, ext_xmax, ext_ymin, ext_ymax = tile_grid.extent
+        self.xmin, self.xmax = ext_xmax, ext_xmin
+        self.ymin, self.ymax = ext_ymax, ext_ymin
+        self.zmax, self.zmin = 0, -9999
+        
+        self.tile_ids = tile_grid.ids[:-1]
+        self.counts = np.zeros(len(self.tile_ids), dtype=np.int64)
+    
+    def update(self, data)->None:
+        """Add chunk of data (with assigned "tile_row" column) to statistics."""
+        if len(data) == 0:
+            return
+        xyz = data[['x','y','z']].to_numpy()
+        vmin, vmax = xyz.min(axis=0), xyz.max(axis=0)
+        self.xmin, self.xmax = compare_min_max(self.xmin, self.xmax, vmin[0], vmax[0])
+        self.ymin, self.ymax = compare_min_max(self.ymin, self.ymax, vmin[1], vmax[1])
+        self.zmax, self.zmin = compare_min_max(self.zmax, self.zmin, vmax[2], vmin[2])
+        
+        rows = data['tile_row'].values
+        self.counts += np.bincount(rows[rows >= 0], minlength=len(self.counts))
+    
+    @property
+    def bitmap(self):
+        """Boolean array of tiles (rows of tile definitions) featuring data points."""
+        return self.counts > 0
+    
+    def unique_tiles(self):
+        """Sorted unique IDs of tiles featuring data points."""
+        return np.unique(self.tile_ids[self.bitmap])
+    
+    def tile_counts(self):
+        """Sorted unique IDs of tiles featuring data points and their number of points."""
+        tile_ids, idx = np.unique(self.tile_ids[self.bitmap], return_inverse=True)
+        return tile_ids, np.bincount(idx, weights=self.counts[self.bitmap], minlength=len(tile_ids)).astype(np.int64)
+
 @timeit
 def write_min_max_values(xmin, xmax, ymin, ymax, zmin, zmax, rid, prefix, output_dir)->None:
     """Wrapper function to write min and max values to file."""
@@ -224,6 +397,14 @@ def write_min_max_values(xmin, xmax, ymin, ymax, zmin, zmax, rid, prefix, output
     with open(out_name, 'w', newline='\n') as fout:
         fout.write(' '.join([str(int(v)) for v in [xmin, xmax, ymin, ymax, zmin, zmax, rid, time_tiling]]) + '\n')
 
+@timeit
+def write_tile_counts(tile_ids, counts, prefix, output_dir)->None:
+    """Wrapper function to write number of points per tile ID to file."""
+    
+    out_name = os.path.join(output_dir, f'{prefix}.tilecounts')
+    with open(out_name, 'w', newline='\n') as fout:
+        fout.write(''.join(f'{int(tile)} {cnt}\n' for tile, cnt in zip(tile_ids, counts)))
+
 @timeit
 def write_sorted_unique_tiles(tile_list:list, prefix, output_dir)->None:
     """Wrapper function to write sorted and unique tile IDs to file."""
@@ -234,92 +415,368 @@ def write_sorted_unique_tiles(tile_list:list, prefix, output_dir)->None:
     with open(out_name, 'w', newline='\n') as fout:
         fout.write('\n'.join(str(int(tile)) for tile in tiles_uniq_sorted) + '\n')
 
-@timeit
-def split_to_tiles(input_file, rid, weight, tile_file, output_dir, raw_name, write_removed_lines):
+def format_integers(values):
     """
-    Main function wrapping all actual work.
+    Format values like "%.0f" (round half to even, "-0" for negative values rounded to zero).
+    Returns list of integers (or strings) or None for non-finite values.
     """
-    # create search patterns to delete
-    pattern_tiles = os.path.join(output_dir, f'*{raw_name}*.til')
-    pattern_removed_lines = os.path.join(output_dir, '*.removed')
-    pattern_unique_tile_list = os.path.join(output_dir, '*.uniquetiles')
-    # clean the server in case there are remainders!
-    for pattern in [pattern_tiles, pattern_removed_lines, pattern_unique_tile_list]:
-        clean_server(pattern)
+    rounded = np.rint(np.asarray(values, dtype=np.float64))
+    if not np.isfinite(rounded).all():
+        return None
+    out = rounded.astype(np.int64).tolist()
+    for i in np.flatnonzero((rounded == 0) & np.signbit(rounded)):
+        out[i] = '-0'
+    return out
+
+def format_tile_lines(data)->list:
+    """
+    Format data points as lines of tile files ("x y z weight rid").
+    Identical to "to_csv(sep=' ', float_format='%.0f')" but without per-value formatting by pandas.
+    """
+    columns = [format_integers(data[c].values) for c in ['x','y','z']]
+    if any(c is None for c in columns):
+        return data.to_csv(None, sep=' ', columns=['x','y','z','weight','rid'], float_format='%.0f',
+                           index=False, header=False, line_terminator='\n').split('\n')[:-1]
+    columns += [data['weight'].tolist(), data['rid'].tolist()]
+    return list(map('{} {} {} {} {}'.format, *columns))
+
+def parse_split_name(input_file):
+    """
+    Extract name, RID and weight from filename of cruise split.
     
-    # load tile definitions from csv into numpy array
-    log_message(2, '[INFO]   Load tile extents from file')
-    tile_extents = load_tile_extents(tile_file)
+    Parameters
+    ----------
+    input_file : str
+        Input cruise split (e.g. "/path/to/741_w20#aa.xyzsplit")
+        
+    Returns
+    ----------
+    raw_name : str
+        Filename without path and extension (e.g. "741_w20#aa")
+    rid : str
+        RID of cruise (e.g. "741")
+    weight : str
+        Weight of cruise (e.g. "20")
     
-    # read data into pandas DataFrame
-    log_message(2, '[INFO]   Read data into pandas DataFrame')
-    sep = r'[,;\t\s+]'
-    data_iterator = pd.read_csv(input_file, sep=sep, dtype=np.float32, header=None, names=['x','y','z'],
-                                engine='python', error_bad_lines=False, warn_bad_lines=True,
-                                chunksize=1_000_000, iterator=True)
+    """
+    # get the input_file without the path; e.g. 741_w20#aa.xyzsplit
+    basename = os.path.basename(input_file)
+    # pure filename; e.g.: 741_w20#aa
+    raw_name = os.path.splitext(basename)[0]
+    
+    # new split for chunks is #, e.g.: 741_w20#aa.xyzsplit -> 741_w20#aa
+    components = raw_name.split('.')
+    # now split into rid and weight (using '_') -> 741, w20#aa
+    components = components[0].split('_')
+    # first part of filename is rid
+    rid = components[0]
+    # after harmonisation, it should be guaranteed that ALL files are rid_weight! e.g.: w20#aa -> 20
+    weight = components[1].split('#')[0]
+    weight = weight.split('w')[1]
+    
+    return raw_name, rid, weight
+
+@timeit
+def format_tiles(data, fragment_name, output_dir, tile_format='ascii', highres_weights=None):
+    """
+    Format data points of chunk for their tile files.
+    
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Chunk of data with assigned [ID,basicTile,weight,rid] columns
+    fragment_name : str
+        Suffix of tile files (name of input file or batch)
+    output_dir : str
+        Output directory
+    tile_format : str
+        Format of tile files ("ascii" or "binary")
+    highres_weights : list
+        Weights of high resolution data written to separate fragments ("*_high.til") (default: no separation)
+        
+    Returns
+    ----------
+    payloads : list
+        Tuples of tile file path and formatted data (str or bytes)
+    
+    """
+    # sort by tile ID (stable sort to keep order of points within each tile)
+    data = data[data['ID'].notna().values]
+    if highres_weights is None:
+        data = data.sort_values('ID', kind='mergesort')
+        keys = data['ID'].values
+    else:
+        # high resolution records before the other records of each tile (key: 2*ID for high, 2*ID+1 for other)
+        keys = data['ID'].values * 2 + ~np.isin(data['weight'].values.astype(np.int64), highres_weights)
+        order = np.argsort(keys, kind='mergesort')
+        data, keys = data.iloc[order], keys[order]
+    keys, idx_start = np.unique(keys, return_index=True)
+    if len(keys) == 0:
+        return []
+    if highres_weights is None:
+        tile_ids, suffixes = keys, [''] * len(keys)
+    else:
+        tile_ids, suffixes = keys // 2, np.where(keys % 2 == 0, '_high', '')
     
-    # initialize min and max values (reversed for comparison!)
-    xmin, xmax = int(tile_extents['East'].max()), int(tile_extents['West'].min()) 
-    ymin, ymax = int(tile_extents['North'].max()), int(tile_extents['South'].min())
-    zmax, zmin = 0, -9999
+    # format complete chunk once and split into lines (or records) of each tile
+    if tile_format == 'binary':
+        records = to_records(data['x'].values, data['y'].values, data['z'].values,
+                             data['weight'].values.astype(np.int64), data['rid'].values.astype(np.int64))
+    else:
+        lines = format_tile_lines(data)
+    basic_tiles = data['basicTile'].values[idx_start]
+    idx_end = np.append(idx_start[1:], len(data))
+    
+    payloads = []
+    for tile_id, basic_tile, suffix, start, end in zip(tile_ids, basic_tiles, suffixes, idx_start, idx_end):
+        log_message(2, f'[INFO]   Writing tile < {tile_id:.0f} > to buffer...')
+        out_name = os.path.join(output_dir, f'tile_{int(tile_id)}_{int(basic_tile)}_{fragment_name}{suffix}.til')
+        if tile_format == 'binary':
+            payloads.append((out_name, records[start:end].tobytes()))
+        else:
+            payloads.append((out_name, '\n'.join(lines[start:end]) + '\n'))
+    
+    return payloads
+
+def tile_split(input_file, rid, weight, tile_grid, output_dir, raw_name, fragment_name, write_removed_lines,
+               reader='fast', tile_format='ascii', highres_weights=None):
+    """
+    Assign all points of cruise split to tiles. Generator yielding the formatted tile data of each chunk
+    (to be written by a single tile writer). Min/max values, unique tile IDs and removed lines
+    are written to files of the split.
+    """
+    # read data into pandas DataFrame
+    log_message(2, f'[INFO]   Read data into pandas DataFrame (reader: {reader})')
+    data_iterator = read_split(input_file, reader=reader, chunksize=1_000_000)
     
-    # initialize list to hold tile IDs
-    tile_list = []
+    # extents and number of points per tile
+    stats = TileStatsAccumulator(tile_grid)
     
     # process each chunk individually
     for idx, data_chunk in enumerate(data_iterator):
         log_message(1, f'\n[INFO]   Processing chunk < {idx} >')
         # bin each point into corresponding tile
         log_message(2, '[INFO]   Assign tile ID to each point (2D binning)')
-        data = bin_data(data_chunk, tile_extents)
+        data = bin_data(data_chunk, tile_grid)
         
         # assign tile ID to each row in df
         log_message(2, '[INFO]   Assign tile ID to each row in DataFrame')
-        data, data_nan, data_invalid_depth = assign_tile_ID(data, tile_extents, weight, rid, depth_threshold=-9999)
-        
-        # get min and max values for X, Y & Z
-        xmin, xmax = compare_min_max(xmin, xmax, data['x'].min(), data['x'].max())
-        ymin, ymax = compare_min_max(ymin, ymax, data['y'].min(), data['y'].max())
-        zmax, zmin = compare_min_max(zmax, zmin, data['z'].max(), data['z'].min())
+        data, data_nan, data_invalid_depth = assign_tile_ID(data, tile_grid, weight, rid, depth_threshold=-9999)
         
-        # groupby tile ID (actual 2D binning)
-        log_message(2, '[INFO]   Group data by tile ID')
-        tiles = data.groupby('ID')
-        
-        # append assigned tile IDs to list of all tile IDs
-        tile_list.extend(list(tiles.groups.keys()))
+        # update min and max values for X, Y & Z and number of points per tile
+        stats.update(data)
         
         # write removed lines to log files
         if write_removed_lines == True:
             log_message(1, '[INFO]   Writing removed lines to files...')
-            write_discarted_lines(data_nan, out_type='NaN', prefix=raw_name, output_dir=output_dir)
-            write_discarted_lines(data_invalid_depth, out_type='invalid_depths', prefix=raw_name, output_dir=output_dir)
-            
-        # loop over individual tile IDs and write data to disk
-        for tile_id, tile in tiles:
-            log_message(2, f'[INFO]   Writing tile < {tile_id:.0f} > to disk...')
-            basic_tile = tile['basicTile'].iloc[0]
-            out_name = os.path.join(output_dir, f'tile_{int(tile_id)}_{int(basic_tile)}_{raw_name}.til')
-            tile.to_csv(out_name, sep=' ', columns=['x','y','z','weight','rid'], float_format='%.0f',
-                        index=False, header=False, mode='a', line_terminator='\n')
-    
-    log_message(2, f'[INFO]   xmin: {int(xmin)}, xmax: {int(xmax)}, ymin: {int(ymin)}, ymax: {int(ymax)}, zmin: {int(zmin)}, zmax: {int(zmax)}')
+            write_discarted_lines(data_nan, out_type='NaN', prefix=raw_name, output_dir=output_dir, rid=rid)
+            write_discarted_lines(data_invalid_depth, out_type='invalid_depths', prefix=raw_name, output_dir=output_dir, rid=rid)
+        
+        # group data by tile ID and format data of each tile
+        log_message(2, '[INFO]   Group data by tile ID')
+        payloads = format_tiles(data, fragment_name, output_dir=output_dir, tile_format=tile_format,
+                                highres_weights=highres_weights)
+        
+        yield payloads
+    
+    log_message(2, f'[INFO]   xmin: {int(stats.xmin)}, xmax: {int(stats.xmax)}, ymin: {int(stats.ymin)}, ymax: {int(stats.ymax)}, zmin: {int(stats.zmin)}, zmax: {int(stats.zmax)}')
     log_message(1, f'[INFO]   Writing MIN and MAX values for X,Y and Z to file "{raw_name}_xyz.minmax"...')
-    write_min_max_values(xmin, xmax, ymin, ymax, zmin, zmax, rid, prefix=raw_name, output_dir=output_dir)
+    write_min_max_values(stats.xmin, stats.xmax, stats.ymin, stats.ymax, stats.zmin, stats.zmax, rid, prefix=raw_name, output_dir=output_dir)
     
     log_message(1, f'[INFO]   Writing sorted and unique tile IDs to file "{raw_name}.uniquetiles"...')
-    write_sorted_unique_tiles(tile_list, prefix=raw_name, output_dir=output_dir)
+    write_sorted_unique_tiles(stats.unique_tiles(), prefix=raw_name, output_dir=output_dir)
+    
+    log_message(1, f'[INFO]   Writing number of points per tile to file "{raw_name}.tilecounts"...')
+    write_tile_counts(*stats.tile_counts(), prefix=raw_name, output_dir=output_dir)
     
     log_message(1, "")
 
+def write_payloads(tile_writer, payloads)->None:
+    """Pass formatted tile data to tile writer."""
+    for out_name, payload in payloads:
+        tile_writer.write(out_name, payload)
+
+@timeit
+def sort_fragments(paths, tile_format='ascii', processes=1)->None:
+    """Sort records of written tile fragments by x, y, z, weight, rid (in place)."""
+    paths = sorted(paths)
+    if processes > 1 and len(paths) > 1:
+        with multiprocessing.Pool(min(processes, len(paths))) as pool:
+            pool.starmap(sort_tile_file, [(path, tile_format) for path in paths])
+    else:
+        for path in paths:
+            sort_tile_file(path, tile_format)
+    log_message(1, f'[INFO]   Sorted < {len(paths)} > tile fragments')
+
+@timeit
+def split_to_tiles(input_file, rid, weight, tile_file, output_dir, raw_name, write_removed_lines, reader='fast',
+                   buffer_size=BUFFER_SIZE, max_open_files=MAX_OPEN_FILES, tile_format='ascii', sort_tiles=False,
+                   highres_weights=None):
+    """
+    Main function wrapping all actual work.
+    """
+    # create search patterns to delete
+    pattern_tiles = os.path.join(output_dir, f'*{raw_name}*.til')
+    pattern_removed_lines = os.path.join(output_dir, '*.removed')
+    pattern_unique_tile_list = os.path.join(output_dir, '*.uniquetiles')
+    pattern_tile_counts = os.path.join(output_dir, '*.tilecounts')
+    # clean the server in case there are remainders!
+    for pattern in [pattern_tiles, pattern_removed_lines, pattern_unique_tile_list, pattern_tile_counts]:
+        clean_server(pattern)
+    
+    # load tile definitions from csv into numpy array
+    log_message(2, '[INFO]   Load tile extents from file')
+    tile_extents = load_tile_extents(tile_file)
+    tile_grid = TileGrid(tile_extents)
+    
+    # buffered writer for all tile files (limits number of file operations)
+    tile_writer = TileWriter(buffer_size=buffer_size, max_open_files=max_open_files, binary=(tile_format == 'binary'))
+    
+    for payloads in tile_split(input_file, rid, weight, tile_grid, output_dir, raw_name, raw_name,
+                               write_removed_lines, reader, tile_format, highres_weights):
+        write_payloads(tile_writer, payloads)
+    
+    tile_writer.close()
+    log_message(2, f'[INFO]   Tile files opened: {tile_writer.cnt_opened}, write operations: {tile_writer.cnt_writes}')
+    
+    if sort_tiles:
+        sort_fragments(tile_writer.paths, tile_format)
+
+def tile_split_buffered(input_file, tile_grid, output_dir, batch_name, write_removed_lines, reader='fast',
+                        tile_format='ascii', highres_weights=None)->list:
+    """
+    Tile complete split and return formatted tile data of all chunks. Tile data is only passed on
+    once the whole split was tiled, so a failing split leaves no partial data in the batch fragments
+    (files of failed split are removed before the error is raised again).
+    """
+    raw_name, rid, weight = parse_split_name(input_file)
+    try:
+        payloads = []
+        for chunk_payloads in tile_split(input_file, rid, weight, tile_grid, output_dir, raw_name, batch_name,
+                                         write_removed_lines, reader, tile_format, highres_weights):
+            payloads.extend(chunk_payloads)
+    except Exception:
+        for pattern in [f'{raw_name}_*.removed', f'{raw_name}_xyz.minmax', f'{raw_name}.uniquetiles', f'{raw_name}.tilecounts']:
+            clean_server(os.path.join(output_dir, pattern))
+        raise
+    return payloads
+
+def batch_worker(task_queue, result_queue, tile_grid, output_dir, batch_name, write_removed_lines, reader, tile_format,
+                 highres_weights=None):
+    """Worker process tiling splits from task queue and sending formatted tile data of each split to result queue."""
+    for input_file in iter(task_queue.get, None):
+        try:
+            payloads = tile_split_buffered(input_file, tile_grid, output_dir, batch_name, write_removed_lines,
+                                           reader, tile_format, highres_weights)
+        except Exception as err:
+            result_queue.put(('error', input_file, f'{type(err).__name__}: {err}'))
+            continue
+        result_queue.put(('done', input_file, payloads))
+
+@timeit
+def batch_to_tiles(input_files:list, tile_file, output_dir, batch_name, write_removed_lines, reader='fast',
+                   buffer_size=BUFFER_SIZE, max_open_files=MAX_OPEN_FILES, tile_format='ascii', processes=1,
+                   sort_tiles=False, highres_weights=None)->list:
+    """
+    Tile multiple splits in a single run. The tile grid is created once and shared by all worker
+    processes, while all tile data is routed to a single tile writer (one fragment per tile and batch).
+    
+    Returns
+    ----------
+    failed : list
+        Input files which could not be tiled
+    
+    """
+    # clean the server in case there are remainders!
+    for pattern in [os.path.join(output_dir, f'*{batch_name}*.til'),
+                    os.path.join(output_dir, '*.removed'),
+                    os.path.join(output_dir, '*.uniquetiles'),
+                    os.path.join(output_dir, '*.tilecounts')]:
+        clean_server(pattern)
+    
+    # load tile definitions from csv into numpy array
+    log_message(2, '[INFO]   Load tile extents from file')
+    tile_grid = TileGrid(load_tile_extents(tile_file))
+    tile_writer = TileWriter(buffer_size=buffer_size, max_open_files=max_open_files, binary=(tile_format == 'binary'))
+    
+    # skip empty splits
+    files = []
+    for input_file in input_files:
+        if get_filesize(input_file) == 0:
+            log_message(1, f'[WARNING]  Cruise file < {os.path.basename(input_file)} > is empty. Skipped further processing!')
+        else:
+            files.append(input_file)
+    
+    failed = []
+    processes = max(1, min(processes, len(files)))
+    if processes == 1:
+        for input_file in files:
+            log_message(1, f'[INFO]   Tiling < {os.path.basename(input_file)} >')
+            try:
+                payloads = tile_split_buffered(input_file, tile_grid, output_dir, batch_name, write_removed_lines,
+                                               reader, tile_format, highres_weights)
+            except Exception as err:
+                log_message(0, f'[ERROR]  {os.path.basename(input_file)}: {type(err).__name__}: {err}')
+                failed.append(input_file)
+                continue
+            write_payloads(tile_writer, payloads)
+    else:
+        task_queue = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue(maxsize=processes) # limits memory of pending tile data (one split each)
+        for input_file in files:
+            task_queue.put(input_file)
+        for _ in range(processes):
+            task_queue.put(None)
+        
+        workers = [multiprocessing.Process(target=batch_worker,
+                                           args=(task_queue, result_queue, tile_grid, output_dir, batch_name,
+                                                 write_removed_lines, reader, tile_format, highres_weights))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        
+        remaining = len(files)
+        while remaining > 0:
+            try:
+                status, input_file, payloads = result_queue.get(timeout=10)
+            except Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    log_message(0, f'[ERROR]  Worker processes terminated with < {remaining} > splits left!')
+                    failed.append(None)
+                    break
+                continue
+            remaining -= 1
+            if status == 'error':
+                log_message(0, f'[ERROR]  {os.path.basename(input_file)}: {payloads}')
+                failed.append(input_file)
+            else:
+                write_payloads(tile_writer, payloads)
+                log_message(1, f'[INFO]   Tiled < {os.path.basename(input_file)} >')
+        
+        for worker in workers:
+            worker.join()
+    
+    tile_writer.close()
+    log_message(1, f'[INFO]   Tiled < {len(files) - len(failed)} > splits into < {tile_writer.cnt_opened} > tile fragments '
+                   f'({tile_writer.cnt_writes} write operations)')
+    
+    if sort_tiles:
+        sort_fragments(tile_writer.paths, tile_format, processes)
+    return failed
+
 
 if __name__ =='__main__':
     # get input arguments
     parser = define_input_args()
     args = parser.parse_args()
     
-    # first argument of the script (input file)
-    input_file = args.input_file
+    # input file(s) of the script
+    input_files = list(args.input_files)
+    if args.manifest is not None:
+        with open(args.manifest, 'r') as f:
+            input_files.extend([line.strip() for line in f if line.strip() != ''])
+    if len(input_files) == 0:
+        parser.error('No input files given (use input_files or --manifest)')
     # second argument of the script (reference file with tile extents)
     tile_file = args.tile_file
     # verbosity
@@ -327,24 +784,34 @@ if __name__ =='__main__':
     verbosity = args.verbose
     # write removed lines to files?
     write_removed_lines = args.output_removed
+    # parser for input file
+    reader = args.reader
+    # size of tile buffers (MB) and max. number of open tile files
+    buffer_size = args.buffer_size * 2**20
+    max_open_files = args.max_open_files
+    # format of tile files
+    tile_format = args.format
+    # sort records of tile fragments
+    sort_tiles = args.sorted
+    # separate fragments of high resolution data
+    highres_weights = args.highres_weights if args.split_highres else None
     
     # get the output directory
-    output_dir = os.path.dirname(input_file)
+    output_dir = args.output_dir if args.output_dir is not None else os.path.dirname(input_files[0])
     
-    # get the input_file without the path; e.g. 741_w20#aa.xyzsplit
-    basename = os.path.basename(input_file)
-    # pure filename; e.g.: 741_w20#aa
-    raw_name = os.path.splitext(basename)[0]
+    # batch mode: several splits are tiled into one fragment per tile
+    batch_name = args.batch_name
+    if batch_name is None and args.manifest is not None:
+        batch_name = os.path.splitext(os.path.basename(args.manifest))[0]
     
-    # new split for chunks is #, e.g.: 741_w20#aa.xyzsplit -> 741_w20#aa
-    components = raw_name.split('.')
-    # now split into rid and weight (using '_') -> 741, w20#aa
-    components = components[0].split('_')
-    # first part of filename is rid
-    rid = components[0]
-    # after harmonisation, it should be guaranteed that ALL files are rid_weight! e.g.: w20#aa -> 20
-    weight = components[1].split('#')[0]
-    weight = weight.split('w')[1]
+    if batch_name is not None or len(input_files) > 1:
+        batch_name = batch_name if batch_name is not None else 'batch'
+        failed = batch_to_tiles(input_files, tile_file, output_dir, batch_name, write_removed_lines, reader,
+                                buffer_size, max_open_files, tile_format, args.processes, sort_tiles, highres_weights)
+        sys.exit(1 if len(failed) > 0 else 0)
+    
+    input_file = input_files[0]
+    raw_name, rid, weight = parse_split_name(input_file)
     
     # check for data in file
     FILESIZE = get_filesize(input_file)
@@ -353,5 +820,5 @@ if __name__ =='__main__':
         sys.exit(0)     # exit program with signal "success" (to enable dependency sbatch to run)
     
     # === assign and write to output tile ===
-    split_to_tiles(input_file, rid, weight, tile_file, output_dir, raw_name, write_removed_lines)
-    
\ No newline at end of file
+    split_to_tiles(input_file, rid, weight, tile_file, output_dir, raw_name, write_removed_lines, reader,
+                   buffer_size, max_open_files, tile_format, sort_tiles, highres_weights)
@@ -0,0 +1,53 @@
+#-----------------------------------------------------------
+#   SEABED2030 - B3
+#   Merge sorted tile fragments (*.til) into tiles (*.tile)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import os
+import sys
+import time
+import argparse
+
+from GENERAL.lib.tile_merge import merge_tiles, filter_tile, CHUNK_ROWS, MEMORY
+
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Merge sorted tile fragments (B2 "--sorted") into single sorted tile (streaming k-way merge).')
+    parser.add_argument('input_files', type=str, nargs='+', help='Sorted tile fragments (*.til)')
+    parser.add_argument('--output', '-o', type=str, required=True, help='Output tile (*.tile)')
+    parser.add_argument('--format', '-f', type=str, default='ascii', choices=['ascii', 'binary'],
+                        help='Format of tile files: "ascii" or "binary" (int32 records x,y,z,weight,rid) (default="ascii")')
+    parser.add_argument('--unique', '-u', action='store_true', help='Remove identical records (x, y, z, weight, rid)')
+    parser.add_argument('--drop-rids', type=str, default=None,
+                        help='Copy single input tile without records of RIDs listed in file (one RID per line) instead of merging (incremental build)')
+    parser.add_argument('--memory', '-m', type=int, default=MEMORY,
+                        help=f'Memory budget (MB) of merge, determines number of records read at once per fragment (default={MEMORY})')
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help=f'Number of records read at once per fragment (default: derived from --memory and number of fragments, max. {CHUNK_ROWS})')
+    return parser
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.drop_rids is not None:
+        if len(args.input_files) != 1:
+            parser.error('--drop-rids requires a single input tile')
+        with open(args.drop_rids, 'r') as f:
+            drop_rids = [line.strip() for line in f if line.strip() != '']
+        cnt_records, cnt_written = filter_tile(args.input_files[0], args.output, args.format, drop_rids, args.chunk_rows or CHUNK_ROWS)
+        print(f'INFO:\t{os.path.basename(args.output)}\t{cnt_records} records\t{cnt_records - cnt_written} records of '
+              f'{len(drop_rids)} changed datasets removed\t{time.perf_counter() - start_time:.2f} sec')
+        sys.exit(0)
+    try:
+        cnt_records, cnt_written = merge_tiles(args.input_files, args.output, args.format, args.unique, args.chunk_rows, args.memory)
+    except ValueError as err:
+        print(f'ERROR:\t{err}')
+        sys.exit(1)
+    print(f'INFO:\t{os.path.basename(args.output)}\t{len(args.input_files)} fragments\t{cnt_records} records\t'
+          f'{cnt_records - cnt_written} duplicates removed\t{time.perf_counter() - start_time:.2f} sec')
+    sys.exit(0)
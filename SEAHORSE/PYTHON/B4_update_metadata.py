@@ -14,6 +14,7 @@ import argparse
 import pandas as pd
 
 from GENERAL.lib.MySQL import MySQL_Handler
+from GENERAL.lib.build_manifest import BuildManifest
 
 def read_minmax_files(dir_files):
     """
@@ -75,6 +76,84 @@ def get_cruise_RID_per_tile(dir_files):
         
     return results
 
+def get_cruise_RID_per_tile_from_lists(dir_files):
+    """
+    Read all '*.uniquetiles' files (tile IDs per split) and extract cruise RID from filename.
+    Required for tile fragments of batch mode (B2) featuring several cruises.
+    
+    Parameters
+    ----------
+    dir_files : str
+        Input directory with all '*.uniquetiles' files
+    
+    Returns
+    -------
+    results : dict
+        Dictionary with "tile ID" as key and string of all featured RIDs (e.g. '11102;12578;11001') as item
+    """
+    files = glob.glob(os.path.join(dir_files,'*.uniquetiles'))
+    
+    results = {}
+    for f in files:
+        f_dir, f_name = os.path.split(f)
+        rid = f_name.split('_')[0] # extract RID from filename (e.g. 741_w20#aa.uniquetiles)
+        with open(f, 'r') as fin:
+            tile_ids = [int(line) for line in fin if line.strip() != '']
+        
+        for tile_id in tile_ids:
+            rid_entries = results.get(tile_id)
+            if rid_entries is None:
+                results[tile_id] = rid
+            else:
+                results[tile_id] = rid_entries + ';' + rid
+        
+    return results
+
+def read_tile_counts(dir_files):
+    """
+    Read all '*.tilecounts' files (number of points per tile and split) and extract cruise RID from filename.
+    
+    Parameters
+    ----------
+    dir_files : str
+        Input directory with all '*.tilecounts' files
+    
+    Returns
+    -------
+    results : dict
+        Dictionary with "tile ID" as key and string of all featured RIDs (e.g. '11102;12578;11001') as item
+    counts : pandas.Series
+        Total number of points per tile ID (sorted by tile ID)
+    """
+    files = glob.glob(os.path.join(dir_files,'*.tilecounts'))
+    
+    frames = []
+    for f in files:
+        f_dir, f_name = os.path.split(f)
+        df = pd.read_csv(f, sep=' ', header=None, names=['tile_id', 'count'], dtype=int)
+        df['rid'] = f_name.split('_')[0] # extract RID from filename (e.g. 741_w20#aa.tilecounts)
+        frames.append(df)
+    if len(frames) == 0:
+        return {}, pd.Series([], name='count', dtype=int)
+    df = pd.concat(frames, ignore_index=True)
+    
+    results = df.groupby('tile_id')['rid'].agg(';'.join).to_dict()
+    counts = df.groupby('tile_id')['count'].sum()
+    return results, counts
+
+def write_tile_counts(counts, out_file):
+    """
+    Write total number of points per tile (e.g. for scheduling of blockmedian jobs)
+    
+    Parameters
+    ----------
+    counts : pandas.Series
+        Total number of points per tile ID
+    out_file : str
+        Output file ("tile_id count" per line)
+    """
+    counts.to_csv(out_file, sep=' ', header=False)
+
 def update_minmax(results_dict, sql_handler):
     """
     Update mysql with extents for X,Y,Z data of every cruise RID
@@ -116,6 +195,14 @@ def defineInputArguments():
     parser = argparse.ArgumentParser(description='sync minmax and tile info with db')
     parser.add_argument('--minmax', '-m', nargs='?', type=str, help='Folder containing minmax files')
     parser.add_argument('--tiledir', '-t', nargs='?', type=str, help='Folder containing tiles')
+    parser.add_argument('--tilelists', '-l', nargs='?', type=str, default=None,
+                        help='Folder containing lists of unique tiles per split (*.uniquetiles). Used instead of tile filenames to get RIDs per tile.')
+    parser.add_argument('--tilecounts', '-c', nargs='?', type=str, default=None,
+                        help='Folder containing number of points per tile and split (*.tilecounts). Used instead of tile lists or filenames to get RIDs per tile.')
+    parser.add_argument('--tilecounts-out', nargs='?', type=str, default=None,
+                        help='Output file for total number of points per tile (requires --tilecounts)')
+    parser.add_argument('--build-manifest', nargs='?', type=str, default=None,
+                        help='Build manifest of incremental build (all RIDs per tile, not only the ones tiled in this run). Used instead of tile counts, lists or filenames.')
     return parser
 
 if __name__ =='__main__':
@@ -125,7 +212,16 @@ if __name__ =='__main__':
     minmax_dir=args.minmax
     tile_dir=args.tiledir
     results_minmax = read_minmax_files(minmax_dir)                   # combine minmax values per cruise RID
-    results_featured_cruises = get_cruise_RID_per_tile(tile_dir)     # extract RIDs per tile
+    if args.build_manifest is not None:
+        results_featured_cruises = BuildManifest(args.build_manifest).featured_cruises() # RIDs per tile of all builds
+    elif args.tilecounts is not None:
+        results_featured_cruises, tile_counts = read_tile_counts(args.tilecounts) # extract RIDs and number of points per tile
+        if args.tilecounts_out is not None:
+            write_tile_counts(tile_counts, args.tilecounts_out)
+    elif args.tilelists is not None:
+        results_featured_cruises = get_cruise_RID_per_tile_from_lists(args.tilelists) # extract RIDs per tile from lists of unique tiles
+    else:
+        results_featured_cruises = get_cruise_RID_per_tile(tile_dir)     # extract RIDs per tile
     
     sql_handler = MySQL_Handler()                                         # create mysql handler
     update_minmax(results_minmax, sql_handler)                            # update metadata table with min/max values
@@ -0,0 +1,65 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Benchmark B2 reader
+#   Compare parsers for harmonised cruise splits (*.xyzsplit)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import B2_data_to_tiles as B2
+import synthetic
+
+B2.verbosity = 0
+
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Benchmark "fast" and "regex" reader of B2_data_to_tiles on a synthetic split.')
+    parser.add_argument('--points', '-n', type=int, default=10_000_000, help='Number of points in synthetic split (default=10M)')
+    parser.add_argument('--output-dir', '-o', type=str, default=None, help='Directory for synthetic split (default: temporary directory)')
+    parser.add_argument('--readers', type=str, nargs='+', default=['fast', 'regex'], choices=['fast', 'regex'],
+                        help='Readers to benchmark (default: fast regex)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of random number generator')
+    return parser
+
+def benchmark_reader(path:str, reader:str):
+    """Read full split with given reader and return runtime (sec), number of rows and checksum."""
+    start_time = time.perf_counter()
+    cnt_rows, checksum = 0, 0.0
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        for chunk in B2.read_split(path, reader=reader):
+            cnt_rows += len(chunk)
+            checksum += chunk.to_numpy(dtype=np.float64).sum()
+    return time.perf_counter() - start_time, cnt_rows, checksum
+
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.output_dir) as tmp_dir:
+        path = os.path.join(tmp_dir, '1_w10#aa.xyzsplit')
+        print(f'[INFO]   Create synthetic split with {args.points} points')
+        synthetic.create_split(path, args.points, seed=args.seed)
+        size_mb = os.path.getsize(path) / 1024**2
+
+        results = {}
+        for reader in args.readers:
+            runtime, cnt_rows, checksum = benchmark_reader(path, reader)
+            results[reader] = (runtime, cnt_rows, checksum)
+            print(f'[TIME]   {reader:<6}\t{runtime:8.2f} sec\t{cnt_rows/runtime:12,.0f} points/s\t{size_mb/runtime:8.1f} MB/s')
+
+        if len(set(r[1:] for r in results.values())) > 1:
+            print('[ERROR]  Readers returned different data!')
+            sys.exit(1)
@@ -0,0 +1,285 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Benchmark suite
+#   Time pipeline kernels (A2, B2, C3, bending, D6) on synthetic data and report throughput as JSON
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import warnings
+import contextlib
+import multiprocessing
+from queue import Empty
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+CASES = ['harmonise', 'split_to_tiles', 'augment_bm', 'bending', 'morphology', 'calc_factor']
+SCALES = { # points (A2, B2, C3) and grid size in cells per axis (bending, D6)
+    'small':  {'points': 200_000,    'grid': 1024},
+    'medium': {'points': 2_000_000,  'grid': 4096},
+    'large':  {'points': 20_000_000, 'grid': 9600},
+    }
+
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Benchmark SEAHORSE kernels on synthetic data. Each case runs in a separate process '
+                                                 '(peak RSS per case) and results are written as JSON for run-to-run comparison.')
+    parser.add_argument('--cases', type=str, nargs='+', default=CASES, choices=CASES, help='Cases to run (default: all)')
+    parser.add_argument('--scale', type=str, default='small', choices=list(SCALES.keys()), help='Size of synthetic data (default="small")')
+    parser.add_argument('--points', '-n', type=int, default=None, help='Number of points (overrides --scale)')
+    parser.add_argument('--grid', '-g', type=int, default=None, help='Grid size in cells per axis (overrides --scale)')
+    parser.add_argument('--chunks', type=int, default=1024, help='Dask chunk size in cells per axis (default=1024)')
+    parser.add_argument('--buffer', type=int, default=20, help='Buffer size of transition zone (default=20)')
+    parser.add_argument('--morphology', type=str, default='footprint', choices=['footprint', 'edt'],
+                        help='Backend of binary dilation/erosion of bending case (default="footprint")')
+    parser.add_argument('--messiness', type=float, default=0.1, help='Fraction of messy lines in synthetic cruises (default=0.1)')
+    parser.add_argument('--tile-format', type=str, default='ascii', choices=['ascii', 'binary'], help='Format of tiles (default="ascii")')
+    parser.add_argument('--geotiff', action='store_true', help='Read grids from synthetic GeoTIFFs (requires rioxarray)')
+    parser.add_argument('--repeat', '-r', type=int, default=1, help='Number of runs per case (fastest run is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of random number generator')
+    parser.add_argument('--output', '-o', type=str, default=None, help='Output JSON report (default: print only)')
+    parser.add_argument('--compare', '-c', type=str, default=None, help='JSON report of previous run to compare with')
+    parser.add_argument('--tmpdir', type=str, default=None, help='Directory for synthetic data (default: temporary directory)')
+    return parser
+
+@contextlib.contextmanager
+def quiet():
+    """Suppress stdout (INFO messages of pipeline functions) and warnings."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+def peak_rss_mb()->float:
+    """Peak resident set size (MB) of current process."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == 'darwin' else rss / 1024 # bytes on macOS, kilobytes on Linux
+
+def load_grids(args, tmp_dir:str)->tuple:
+    """Synthetic composite, background and mask as dask arrays (optionally read from GeoTIFFs like D6)."""
+    import dask.array as da
+    composite, background, mask = synthetic.create_grids(args.grid, seed=args.seed)
+    if not args.geotiff:
+        chunks = (args.chunks, args.chunks)
+        return da.from_array(composite, chunks=chunks), da.from_array(background, chunks=chunks), da.from_array(mask, chunks=chunks)
+
+    import rioxarray
+    arrays = []
+    for name, array in [('composite', composite), ('background', background), ('mask', mask)]:
+        path = os.path.join(tmp_dir, f'{name}.tif')
+        synthetic.write_geotiff(path, array)
+        arrays.append(rioxarray.open_rasterio(path, chunks=(1, args.chunks, args.chunks)).squeeze(drop=True).data)
+    arrays[2] = arrays[2].astype('int8')
+    return tuple(arrays)
+
+#%% CASES
+# each case prepares synthetic data (not timed) and returns (runtime, metrics) of the timed kernel
+
+def case_harmonise(args, tmp_dir:str):
+    import A2_harmonise_data as A2
+    path = os.path.join(tmp_dir, 'synthetic#aa.insplit')
+    nbytes = synthetic.create_cruise(path, args.points, messiness=args.messiness, seed=args.seed)
+    records = {'dataset_rid': 1, 'weight': 10}
+    with quiet():
+        start = time.perf_counter()
+        A2.harmonise_file(path, records)
+        runtime = time.perf_counter() - start
+    return runtime, {'points': args.points, 'bytes': nbytes}
+
+def case_split_to_tiles(args, tmp_dir:str):
+    import B2_data_to_tiles as B2
+    B2.verbosity = 0
+    split = os.path.join(tmp_dir, '1_w10#aa.xyzsplit')
+    tile_file = os.path.join(tmp_dir, 'tiles.csv')
+    output_dir = os.path.join(tmp_dir, 'tiles')
+    os.makedirs(output_dir, exist_ok=True)
+    nbytes = synthetic.create_split(split, args.points, seed=args.seed)
+    cnt_tiles = synthetic.create_tile_extents(tile_file, seed=args.seed)
+    with quiet():
+        start = time.perf_counter()
+        B2.split_to_tiles(split, 1, 10, tile_file, output_dir, '1_w10#aa', False, tile_format=args.tile_format)
+        runtime = time.perf_counter() - start
+    return runtime, {'points': args.points, 'bytes': nbytes, 'tiles': cnt_tiles}
+
+def case_augment_bm(args, tmp_dir:str):
+    """Augment blockmedian file using RID codefile (timed) and compare with output using metadata index (byte-for-byte)."""
+    import filecmp
+    import C3_augment_bm as C3
+    from GENERAL.lib.metadata_index import build_metadata_index
+    codefile = os.path.join(tmp_dir, 'rid_codes.txt')
+    index_file = os.path.join(tmp_dir, 'metadata_index.sqlite')
+    bm_file = os.path.join(tmp_dir, 'tile_1_1.bmz')
+    n_rids = 10_000
+    synthetic.create_metadata(codefile, n_rids, messiness=args.messiness, seed=args.seed)
+    nbytes = synthetic.create_blockmedian(bm_file, args.points, n_rids, seed=args.seed)
+    with quiet():
+        start = time.perf_counter()
+        rid, metadata = C3.get_translation(codefile)
+        C3.augment_BM(bm_file, os.path.join(tmp_dir, 'tile_1_1.bmplus'), rid, metadata)
+        runtime = time.perf_counter() - start
+        build_metadata_index(index_file, {'rid': codefile})
+        rid, metadata = C3.get_translation(index_file)
+        C3.augment_BM(bm_file, os.path.join(tmp_dir, 'tile_1_1_index.bmplus'), rid, metadata)
+    if not filecmp.cmp(os.path.join(tmp_dir, 'tile_1_1.bmplus'), os.path.join(tmp_dir, 'tile_1_1_index.bmplus'), shallow=False):
+        raise ValueError('Results of RID codefile and metadata index differ')
+    return runtime, {'points': args.points, 'bytes': nbytes}
+
+def case_bending(args, tmp_dir:str):
+    import dask
+    from GENERAL.bending.functions_bending import (create_transition_zone_dask, fill_transition_zone_dask,
+                                                   calc_weighting_functions_dask, combine_data_dask)
+    composite, background, mask = load_grids(args, tmp_dir)
+    stages = {}
+    with quiet(), dask.config.set(scheduler='threads'):
+        start = time.perf_counter()
+        t = time.perf_counter()
+        mask, mask_dilation, mask_erosion, mask_diff, footprint = create_transition_zone_dask(mask, args.buffer, morphology=args.morphology)
+        mask_dilation, mask_diff = dask.persist(mask_dilation, mask_diff)
+        stages['create_transition_zone_dask'] = time.perf_counter() - t
+        t = time.perf_counter()
+        data_transition = fill_transition_zone_dask(mask, mask_erosion, composite, background, footprint).persist()
+        stages['fill_transition_zone_dask'] = time.perf_counter() - t
+        t = time.perf_counter()
+        dist_in, dist_out = dask.persist(*calc_weighting_functions_dask(mask, mask_dilation, mask_erosion, args.buffer))
+        stages['calc_weighting_functions_dask'] = time.perf_counter() - t
+        t = time.perf_counter()
+        combine_data_dask(data_transition, background, mask, mask_dilation, mask_diff, dist_in, dist_out).compute()
+        stages['combine_data_dask'] = time.perf_counter() - t
+        runtime = time.perf_counter() - start
+    return runtime, {'cells': args.grid**2, 'stages': stages}
+
+def case_morphology(args, tmp_dir:str):
+    """Compare "edt" and "footprint" backend of create_transition_zone_dask (cell-for-cell, incl. removal of small patches)."""
+    import dask
+    from GENERAL.bending.functions_bending import create_transition_zone_dask
+    _, _, mask = load_grids(args, tmp_dir)
+    results, runtimes = {}, {}
+    with quiet(), dask.config.set(scheduler='threads'):
+        for morphology in ['footprint', 'edt']:
+            start = time.perf_counter()
+            _, mask_dilation, _, mask_diff, _ = create_transition_zone_dask(mask, args.buffer, morphology=morphology,
+                                                                           remove_small_patches=True)
+            results[morphology] = dask.compute(mask_dilation, mask_diff)
+            runtimes[morphology] = time.perf_counter() - start
+    if not all(np.array_equal(a, b) for a, b in zip(results['footprint'], results['edt'])):
+        raise ValueError('Results of morphology backends "footprint" and "edt" differ')
+    return runtimes['edt'], {'cells': args.grid**2, 'stages': runtimes}
+
+def case_calc_factor(args, tmp_dir:str):
+    import dask
+    import xarray as xr
+    from D6_gap_fill import calc_factor_xr
+    composite, background, mask = [xr.DataArray(a, dims=('y', 'x')) for a in load_grids(args, tmp_dir)]
+    with quiet(), dask.config.set(scheduler='threads'):
+        start = time.perf_counter()
+        xr.apply_ufunc(calc_factor_xr, composite, background, mask, dask='parallelized',
+                       output_dtypes=['float32'], kwargs={'nan_value': np.nan}).compute()
+        runtime = time.perf_counter() - start
+    return runtime, {'cells': args.grid**2}
+
+def run_case(case:str, args, queue):
+    """Run case in worker process and put result (or error) into queue."""
+    try:
+        with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmp_dir:
+            runtime, metrics = globals()[f'case_{case}'](args, tmp_dir)
+        result = {'status': 'ok', 'runtime_s': runtime, **metrics}
+        for key, unit in [('points', 'points_per_s'), ('cells', 'cells_per_s')]:
+            if key in result:
+                result[unit] = result[key] / runtime
+        if 'bytes' in result:
+            result['mb_per_s'] = result['bytes'] / 1024**2 / runtime
+    except ImportError as err:
+        result = {'status': 'skipped', 'reason': f'missing dependency: {err.name}'}
+    except Exception as err:
+        result = {'status': 'failed', 'reason': f'{type(err).__name__}: {err}'}
+    result['peak_rss_mb'] = peak_rss_mb()
+    queue.put(result)
+
+def benchmark(case:str, args)->dict:
+    """Run case (repeatedly) in fresh processes and return fastest run."""
+    ctx = multiprocessing.get_context('spawn') # fresh interpreter: peak RSS of case only
+    runs = []
+    for _ in range(args.repeat):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_case, args=(case, args, queue))
+        proc.start()
+        proc.join()
+        try:
+            result = queue.get(timeout=10)
+        except Empty: # worker killed (e.g. out of memory)
+            result = {'status': 'failed', 'reason': f'worker exited with code {proc.exitcode}'}
+        runs.append(result)
+        if result['status'] != 'ok':
+            break
+    best = min(runs, key=lambda r: r.get('runtime_s', np.inf))
+    if len(runs) > 1 and best['status'] == 'ok':
+        best['runtimes_s'] = [r['runtime_s'] for r in runs]
+    return best
+
+def get_environment()->dict:
+    """Versions of interpreter and libraries used by the benchmarked kernels."""
+    env = {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+    for module in ['numpy', 'pandas', 'scipy', 'dask', 'xarray']:
+        try:
+            env[module] = __import__(module).__version__
+        except ImportError:
+            env[module] = None
+    return env
+
+def format_result(case:str, result:dict)->str:
+    if result['status'] != 'ok':
+        return f'[{result["status"].upper()}] {case:<16}\t{result["reason"]}'
+    rates = [f'{result[k]:14,.0f} {k[:-6]}/s' for k in ['points_per_s', 'cells_per_s'] if k in result]
+    if 'mb_per_s' in result:
+        rates.append(f'{result["mb_per_s"]:8.1f} MB/s')
+    return f'[TIME]   {case:<16}\t{result["runtime_s"]:8.2f} sec\t' + '\t'.join(rates) + f'\t{result["peak_rss_mb"]:8.1f} MB RSS'
+
+def compare_reports(report:dict, reference:dict)->None:
+    """Print speedup (runtime ratio) and change of peak RSS per case compared to reference report."""
+    print(f'[INFO]   Comparison with {reference.get("created")} (speedup > 1: faster)')
+    for case, result in report['results'].items():
+        ref = reference.get('results', {}).get(case)
+        if ref is None or result['status'] != 'ok' or ref.get('status') != 'ok':
+            print(f'[INFO]   {case:<16}\tnot comparable')
+            continue
+        if ref.get('parameters') != result.get('parameters'):
+            print(f'[WARNING] {case:<16}\tdifferent parameters')
+        speedup = ref['runtime_s'] / result['runtime_s']
+        rss = result['peak_rss_mb'] - ref['peak_rss_mb']
+        print(f'[INFO]   {case:<16}\t{speedup:6.2f}x\t{rss:+8.1f} MB RSS')
+
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+    args.points = args.points if args.points is not None else SCALES[args.scale]['points']
+    args.grid = args.grid if args.grid is not None else SCALES[args.scale]['grid']
+
+    parameters = {'points': args.points, 'grid': args.grid, 'chunks': args.chunks, 'buffer': args.buffer, 'morphology': args.morphology,
+                  'messiness': args.messiness, 'tile_format': args.tile_format, 'geotiff': args.geotiff, 'seed': args.seed}
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': get_environment(), 'parameters': parameters, 'results': {}}
+    print(f'[INFO]   {args.points:,} points, grid {args.grid} x {args.grid} cells, {args.repeat} run(s) per case')
+    for case in args.cases:
+        result = benchmark(case, args)
+        result['parameters'] = parameters
+        report['results'][case] = result
+        print(format_result(case, result))
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'[INFO]   Report written to {args.output}')
+    if args.compare is not None:
+        with open(args.compare, 'r') as f:
+            compare_reports(report, json.load(f))
@@ -0,0 +1,197 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Synthetic benchmark data
+#   Generate synthetic cruises, tile extents, blockmedian files, metadata and grids in the IBCSO extent
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+All generators are deterministic for a given seed. Coordinates are in the IBCSO polar stereographic
+projection (EPSG:9354) and restricted to the grid extent of +/- 4800 km (see D6_gap_fill).
+"""
+
+import os
+
+import numpy as np
+
+EXTENT = 4_800_000 # half width (m) of IBCSO grid
+TILE_SIZE = 200_000 # edge length (m) of synthetic tiles
+TILES_PER_BASIC = 4 # tiles per basic tile (along each axis)
+WEIGHTS = [1, 5, 10, 15, 20, 25, 30]
+METADATA_HEADER = ['rid', 'dataset_tid', 'weight', 'source', 'platform', 'cruise']
+
+# line formats of messy cruises (A2 harmonises all of them; malformed lines are removed)
+MESSY_FORMATS = {
+    'tab':         '{x:.2f}\t{y:.2f}\t{z:.2f}',
+    'semicolon':   '{x:.2f};{y:.2f};{z:.2f}',
+    'comma':       '{x:.2f},{y:.2f},{z:.2f}',
+    'whitespace':  '  {x:.3f}   {y:.3f}  {z:.3f}  ',
+    'positive':    '{x:.0f} {y:.0f} {zpos:.0f}',
+    'extra':       '{x:.1f} {y:.1f} {z:.1f} 1 2023-01-01',
+    'units':       '{x:.1f}m {y:.1f}m {z:.1f}m',
+    'decimals':    '{x:.1f}.5 {y:.1f}.5 {z:.1f}',
+    'malformed':   '{x:.1f} NaN',
+    }
+
+
+def random_track(rng, n_points:int, step:float=50.0, x0=None, y0=None)->tuple:
+    """Random walk (x, y in m) of cruise track reflected at the IBCSO extent."""
+    if x0 is None or y0 is None:
+        x0, y0 = rng.uniform(-0.8 * EXTENT, 0.8 * EXTENT, 2)
+    x = x0 + np.cumsum(rng.normal(0, step, n_points))
+    y = y0 + np.cumsum(rng.normal(0, step, n_points))
+    # reflect track at boundaries to stay inside of the grid
+    x = EXTENT - np.abs(np.mod(x + EXTENT, 4 * EXTENT) - 2 * EXTENT)
+    y = EXTENT - np.abs(np.mod(y + EXTENT, 4 * EXTENT) - 2 * EXTENT)
+    return x, y
+
+def random_depths(rng, x, y)->np.ndarray:
+    """Smooth depths (m, negative) along track with noise."""
+    z = -3500 + 2500 * np.sin(x / 7.5e5) * np.cos(y / 5e5) + rng.normal(0, 20, len(x))
+    return np.clip(z, -10_999, -1)
+
+def create_cruise(path:str, n_points:int, messiness:float=0.0, seed:int=42, chunksize:int=1_000_000)->int:
+    """
+    Write synthetic cruise (random walk) to text file.
+
+    Parameters
+    ----------
+    path : str
+        Output file
+    n_points : int
+        Number of lines
+    messiness : float
+        Fraction of lines (0-1) using one of MESSY_FORMATS instead of clean "x y z"
+    seed : int
+        Seed of random number generator
+    chunksize : int
+        Number of lines generated at once
+
+    Returns
+    ----------
+    filesize : int
+        Size of cruise (bytes)
+    """
+    rng = np.random.default_rng(seed)
+    formats = list(MESSY_FORMATS.values())
+    x0 = y0 = None
+    with open(path, 'w', newline='\n') as fout:
+        for start in range(0, n_points, chunksize):
+            n = min(chunksize, n_points - start)
+            x, y = random_track(rng, n, x0=x0, y0=y0)
+            z = random_depths(rng, x, y)
+            x0, y0 = x[-1], y[-1]
+            messy = rng.random(n) < messiness
+            if not messy.any():
+                np.savetxt(fout, np.column_stack([x, y, z]), fmt='%.2f', delimiter=' ')
+                continue
+            style = rng.integers(0, len(formats), n)
+            lines = [formats[s].format(x=xi, y=yi, z=zi, zpos=-zi) if m else f'{xi:.2f} {yi:.2f} {zi:.2f}'
+                     for xi, yi, zi, m, s in zip(x.tolist(), y.tolist(), z.tolist(), messy.tolist(), style.tolist())]
+            fout.write('\n'.join(lines) + '\n')
+    return os.path.getsize(path)
+
+def create_split(path:str, n_points:int, seed:int=42, chunksize:int=1_000_000)->int:
+    """Write synthetic harmonised split ("x y z" integers, see A2) and return its size (bytes)."""
+    rng = np.random.default_rng(seed)
+    x0 = y0 = None
+    with open(path, 'w', newline='\n') as fout:
+        for start in range(0, n_points, chunksize):
+            n = min(chunksize, n_points - start)
+            x, y = random_track(rng, n, step=2000, x0=x0, y0=y0)
+            z = random_depths(rng, x, y)
+            x0, y0 = x[-1], y[-1]
+            np.savetxt(fout, np.column_stack([x, y, z]).astype(np.int64), fmt='%d', delimiter=' ')
+    return os.path.getsize(path)
+
+def create_tile_extents(path:str, tile_size:int=TILE_SIZE, drop:float=0.05, seed:int=42)->int:
+    """
+    Write synthetic tile extents (CSV with "ID,West,East,South,North,basicTile", see B2) covering the IBCSO extent.
+    A fraction of tiles ("drop") is removed to mimic land areas. Returns number of tiles.
+    """
+    rng = np.random.default_rng(seed)
+    edges = np.arange(-EXTENT, EXTENT, tile_size)
+    n_basic = int(np.ceil(len(edges) / TILES_PER_BASIC))
+    cnt = 0
+    with open(path, 'w', newline='\n') as fout:
+        fout.write('ID,West,East,South,North,basicTile\n')
+        for iy, south in enumerate(edges):
+            for ix, west in enumerate(edges):
+                tile_id = iy * len(edges) + ix + 1
+                if rng.random() < drop:
+                    continue
+                basic_id = (iy // TILES_PER_BASIC) * n_basic + ix // TILES_PER_BASIC + 1
+                fout.write(f'{tile_id},{west},{west + tile_size},{south},{south + tile_size},{basic_id}\n')
+                cnt += 1
+    return cnt
+
+def create_metadata(path:str, n_rids:int, messiness:float=0.0, seed:int=42)->list:
+    """
+    Write synthetic RID codefile (tab-separated with header, see C3) and return list of RIDs.
+    A fraction of rows ("messiness") features quoted values and missing trailing columns.
+    """
+    rng = np.random.default_rng(seed)
+    rids = [str(r) for r in range(1, n_rids + 1)]
+    with open(path, 'w', newline='\n') as fout:
+        fout.write('\t'.join(METADATA_HEADER) + '\n')
+        for rid in rids:
+            weight = WEIGHTS[rng.integers(0, len(WEIGHTS))]
+            if rng.random() < messiness:
+                fout.write(f'{rid}\t{weight}\t{weight}\t"synthetic {rid}"\n')
+            else:
+                fout.write(f'{rid}\t{weight}\t{weight}\tsynthetic\tRV Benchmark\tBM{rid}\n')
+    return rids
+
+def create_blockmedian(path:str, n_points:int, n_rids:int, seed:int=42, unknown:float=0.01)->int:
+    """
+    Write synthetic blockmedian file ("x y z rid" tab-separated, see C3) with RIDs in the third column.
+    A fraction of RIDs ("unknown") is not part of the codefile. Returns size of file (bytes).
+    """
+    rng = np.random.default_rng(seed)
+    x, y = random_track(rng, n_points, step=500)
+    z = random_depths(rng, x, y)
+    rid = rng.integers(1, n_rids + 1, n_points)
+    rid[rng.random(n_points) < unknown] = n_rids + 1
+    np.savetxt(path, np.column_stack([x.astype(np.int64), y.astype(np.int64), rid, z.astype(np.int64)]),
+               fmt='%d', delimiter='\t')
+    return os.path.getsize(path)
+
+def create_grids(size:int, coverage:float=0.3, seed:int=42)->tuple:
+    """
+    Create synthetic grids (int32) of composite (sparse IBCSO), background (SRTM15) and data mask (int8).
+    The mask consists of elongated survey patches covering roughly "coverage" of the cells.
+
+    Returns
+    ----------
+    composite, background, mask : np.ndarray
+        Arrays of shape (size, size)
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32)
+    background = (-3500 + 2500 * np.sin(xx / (size / 6)) * np.cos(yy / (size / 4))).astype(np.int32)
+    composite = background + rng.normal(0, 50, (size, size)).astype(np.int32)
+
+    mask = np.zeros((size, size), dtype=np.int8)
+    width = max(size // 100, 2)
+    while mask.mean() < coverage:
+        x, y = random_track(rng, 4 * size, step=1.0, x0=rng.uniform(0, size), y0=rng.uniform(0, size))
+        ix, iy = np.mod(x.astype(np.int64), size), np.mod(y.astype(np.int64), size)
+        for off in range(width):
+            mask[iy, np.minimum(ix + off, size - 1)] = 1
+    composite[mask == 0] = 0
+    return composite, background, mask
+
+def write_geotiff(path:str, array:np.ndarray, resolution:int=500, nodata=None)->None:
+    """Write array as GeoTIFF (EPSG:9354) centered in IBCSO extent (requires rioxarray)."""
+    import xarray as xr
+    import rioxarray # noqa: F401 (registers "rio" accessor)
+
+    ny, nx = array.shape
+    x = (np.arange(nx) - nx / 2 + 0.5) * resolution
+    y = (ny / 2 - 0.5 - np.arange(ny)) * resolution
+    da = xr.DataArray(array[np.newaxis], dims=('band', 'y', 'x'), coords={'band': [1], 'y': y, 'x': x})
+    da = da.rio.write_crs('EPSG:9354')
+    if nodata is not None:
+        da = da.rio.write_nodata(nodata)
+    da.rio.to_raster(path, tiled=True, compress='deflate')
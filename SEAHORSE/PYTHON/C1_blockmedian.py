@@ -0,0 +1,279 @@
+#-----------------------------------------------------------
+#   SEABED2030 - C1
+#   Single-pass block statistics (weighted median) of tiles
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+Replacement for the four "gmt blockmedian" calls of C1 (low and high resolution, "-Es" and "-Eb").
+The tile is read and sorted by block and depth only once, all statistics are computed
+vectorized for both variants. Output files are format-compatible with the GMT output of
+
+    gmt blockmedian <tile> -Q -R<region> -I<inc> -fc -W -Es -r  ->  *.bm     (x y z w sid)
+    gmt blockmedian <tile> -Q -R<region> -I<inc> -fc -W -Eb -r  ->  *.stats  (x y z l q25 q75 h w)
+
+(tab-separated, "%.12g", blocks ordered from north-west to south-east).
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from GENERAL.lib.tile_format import TILE_RECORD, read_tile
+
+HIGHRES_WEIGHTS = [15, 20, 25, 30] # weights (TIDs) of high resolution data
+MAD_NORMALIZE = 1.4826 # scale of median absolute deviation (L1 scale)
+BOX_QUANTILES = [0.25, 0.5, 0.75] # quantiles of box-and-whisker output ("-Eb")
+
+
+def log_message(ref_lvl:int, *msg_args)->None:
+    """Print log messages depending on level of verbosity"""
+    if ref_lvl <= verbosity:
+        print(*msg_args)
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Compute weighted block median and statistics of tile (low and high resolution) in a single pass.')
+    parser.add_argument('input_file', type=str, help='Input tile (*.tile)')
+    parser.add_argument('--region', '-R', type=str, required=True,
+                        help='Region "west/east/south/north" (BM_REGION). Use "--region=-4800000/..." for negative values.')
+    parser.add_argument('--increment', '-I', type=float, required=True, help='Block size in meters (BM_SIZE)')
+    parser.add_argument('--output-dir', '-o', type=str, default=None, help='Output directory (default: directory of input tile)')
+    parser.add_argument('--format', '-f', type=str, default='ascii', choices=['ascii', 'binary'],
+                        help='Format of tile: "ascii" (whitespace-separated text) or "binary" (int32 records x,y,z,weight,rid) (default="ascii")')
+    parser.add_argument('--highres-weights', type=int, nargs='+', default=HIGHRES_WEIGHTS,
+                        help=f'Weights of high resolution data (default: {" ".join(str(w) for w in HIGHRES_WEIGHTS)})')
+    parser.add_argument('--extended', '-E', action='store_true',
+                        help='Additionally write L1 scale, min and max ("*.ext": x y z s l h w, like "gmt blockmedian -E")')
+    parser.add_argument('--verbose', '-v', type=int, nargs='?', default=0, const=0, choices=[0, 1, 2],
+                        help='Level of output verbosity (default=0)')
+    return parser
+
+def parse_region(region:str)->tuple:
+    """Parse GMT region string "west/east/south/north"."""
+    west, east, south, north = [float(v) for v in region.split('/')]
+    return west, east, south, north
+
+def read_tile_data(input_file:str, tile_format:str='ascii')->dict:
+    """
+    Read tile (x y z weight rid) into dictionary of float64 arrays.
+    Records with non-finite values are removed (skipped by GMT as well).
+    """
+    if tile_format == 'binary':
+        chunks = list(read_tile(input_file))
+        records = np.concatenate(chunks) if len(chunks) > 0 else np.empty(0, dtype=TILE_RECORD)
+        data = {c: records[n].astype(np.float64) for c, n in zip(['x','y','z','w','sid'], TILE_RECORD.names)}
+    else:
+        df = pd.read_csv(input_file, delim_whitespace=True, header=None, usecols=[0,1,2,3,4],
+                         names=['x','y','z','w','sid'], dtype=np.float64, engine='c')
+        data = {c: df[c].to_numpy() for c in df.columns}
+    valid = np.ones(len(data['x']), dtype=bool)
+    for values in data.values():
+        valid &= np.isfinite(values)
+    if not valid.all():
+        data = {c: v[valid] for c, v in data.items()}
+    return data
+
+class BlockGrid():
+    """
+    Pixel registered grid of blocks ("-R<region> -I<inc> -r").
+
+    Parameters
+    ----------
+    region : str
+        GMT region "west/east/south/north"
+    inc : float
+        Block size
+    """
+    def __init__(self, region:str, inc:float):
+        self.west, self.east, self.south, self.north = parse_region(region)
+        self.inc = float(inc)
+        self.nx = int(round((self.east - self.west) / self.inc))
+        self.ny = int(round((self.north - self.south) / self.inc))
+
+    def block_index(self, x, y)->np.ndarray:
+        """
+        Return block index (row * nx + col, rows from north to south) of points or -1 if outside.
+        Rows and columns are computed like GMT (lrint of pixel offset), i.e. points exactly on a
+        block boundary are rounded half to even.
+        """
+        inside = (x >= self.west) & (x <= self.east) & (y >= self.south) & (y <= self.north)
+        col = np.rint((x - self.west) / self.inc - 0.5)
+        row = np.rint((self.north - y) / self.inc - 0.5)
+        inside &= (col >= 0) & (col < self.nx) & (row >= 0) & (row < self.ny)
+        index = row * self.nx + col
+        return np.where(inside, index, -1).astype(np.int64)
+
+def sort_by_block(data:dict, grid:BlockGrid)->dict:
+    """Remove points outside of grid and sort remaining points by block index and depth."""
+    index = grid.block_index(data['x'], data['y'])
+    inside = index >= 0
+    index = index[inside]
+    z = data['z'][inside]
+    z_min, z_max = (z.min(), z.max()) if len(z) > 0 else (0, 0)
+    z_range = z_max - z_min + 1
+    if np.array_equal(z, np.rint(z)) and (index.max(initial=0) + 1) * z_range < 2**62:
+        # integer depths (tiles): single sort of combined key is much faster than lexsort
+        order = np.argsort(index * np.int64(z_range) + (z - z_min).astype(np.int64), kind='stable')
+    else:
+        order = np.lexsort((z, index))
+    sorted_index = index[order]
+    if not inside.all():
+        order = np.flatnonzero(inside)[order]
+    sorted_data = {c: v[order] for c, v in data.items()}
+    sorted_data['index'] = sorted_index
+    return sorted_data
+
+def block_statistics(data:dict, quantiles:list=BOX_QUANTILES, l1_scale:bool=False)->dict:
+    """
+    Compute weighted quantiles, min/max and weight sum per block (like "gmt blockmedian -Q -W").
+
+    Quantile q of a block is the depth of the first point (sorted by depth) whose cumulative
+    weight reaches q * sum(weights). If the cumulative weight hits q * sum(weights) exactly,
+    the mean of this and the next depth is used. Coordinates (and source ID) are taken from the
+    median point ("-Q").
+
+    Parameters
+    ----------
+    data : dict
+        Points sorted by block index and depth (see sort_by_block)
+    quantiles : list
+        Quantiles to compute (must include 0.5)
+    l1_scale : bool
+        Compute L1 scale (1.4826 * median absolute deviation from median)
+
+    Returns
+    ----------
+    stats : dict
+        Arrays per block: "x", "y", "sid", "min", "max", "weight" and one entry per quantile
+        (e.g. 0.5 for median) and "l1_scale" (optional)
+    """
+    index, z, w = data['index'], data['z'], data['w']
+    n = len(index)
+    if n == 0:
+        return None
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    ends = np.r_[starts[1:], n] # exclusive
+    counts = ends - starts
+
+    cum_weight = np.cumsum(w)
+    offset = cum_weight[starts] - w[starts] # cumulative weight before block
+    weight_sum = cum_weight[ends - 1] - offset
+
+    stats = {'index': index[starts], 'min': z[starts], 'max': z[ends - 1], 'weight': weight_sum}
+    for q in quantiles:
+        target = q * weight_sum
+        node = np.searchsorted(cum_weight, offset + target, side='left')
+        node = np.clip(node, starts, ends - 1)
+        # exact hit of quantile weight: mean of two points (unless last point of block)
+        exact = (cum_weight[node] - offset == target) & (node + 1 < ends)
+        node1 = np.where(exact, node + 1, node)
+        stats[q] = np.where(exact, 0.5 * (z[node] + z[node1]), z[node])
+        if q == 0.5:
+            stats['x'] = np.where(exact, 0.5 * (data['x'][node] + data['x'][node1]), data['x'][node])
+            stats['y'] = np.where(exact, 0.5 * (data['y'][node] + data['y'][node1]), data['y'][node])
+            stats['sid'] = data['sid'][node] # source ID of lower value for ties ("-Es+l")
+
+    if l1_scale:
+        deviation = np.abs(z - np.repeat(stats[0.5], counts))
+        deviation = deviation[np.lexsort((deviation, index))]
+        lower = starts + (counts - 1) // 2
+        upper = starts + counts // 2
+        stats['l1_scale'] = MAD_NORMALIZE * 0.5 * (deviation[lower] + deviation[upper])
+    return stats
+
+def format_values(values)->list:
+    """Format values like "%.12g" (default FORMAT_FLOAT_OUT of GMT) with fast path for integers."""
+    values = np.asarray(values, dtype=np.float64)
+    integral = (values == np.rint(values)) & (np.abs(values) < 1e12)
+    out = np.where(integral, values, 0).astype(np.int64).tolist()
+    for i in np.flatnonzero(~integral):
+        out[i] = '%.12g' % values[i]
+    for i in np.flatnonzero(integral & (values == 0) & np.signbit(values)):
+        out[i] = '-0'
+    return out
+
+def write_table(path:str, columns:list)->None:
+    """Write columns as tab-separated text file (empty file if no columns given)."""
+    if len(columns) == 0:
+        open(path, 'w').close()
+        return
+    template = '\t'.join(['{}'] * len(columns)) + '\n'
+    with open(path, 'w', newline='\n') as f:
+        f.writelines(map(template.format, *[format_values(c) for c in columns]))
+
+def write_block_files(stats:dict, prefix:str, extended:bool=False)->list:
+    """
+    Write block median ("{prefix}.bm": x y z w sid) and box-and-whisker statistics
+    ("{prefix}.stats": x y z l q25 q75 h w) and optionally the extended output
+    ("{prefix}.ext": x y z s l h w).
+    """
+    paths = [f'{prefix}.bm', f'{prefix}.stats']
+    write_table(paths[0], [stats['x'], stats['y'], stats[0.5], stats['weight'], stats['sid']])
+    write_table(paths[1], [stats['x'], stats['y'], stats[0.5], stats['min'], stats[0.25], stats[0.75],
+                           stats['max'], stats['weight']])
+    if extended:
+        paths.append(f'{prefix}.ext')
+        write_table(paths[2], [stats['x'], stats['y'], stats[0.5], stats['l1_scale'], stats['min'],
+                               stats['max'], stats['weight']])
+    return paths
+
+def blockmedian(input_file:str, region:str, inc:float, output_dir:str=None, tile_format:str='ascii',
+                highres_weights:list=HIGHRES_WEIGHTS, extended:bool=False)->dict:
+    """
+    Compute block statistics of tile for all data ("low") and high resolution data ("high").
+    Output files are named "{tile}_low.bm", "{tile}_low.stats", "{tile}_high.bm" and "{tile}_high.stats".
+    High resolution files are only written if the tile contains high resolution data.
+
+    Returns
+    ----------
+    cnt_blocks : dict
+        Number of blocks per variant
+    """
+    output_dir = output_dir if output_dir is not None else os.path.dirname(input_file)
+    name = os.path.splitext(os.path.basename(input_file))[0]
+    grid = BlockGrid(region, inc)
+
+    start_time = time.perf_counter()
+    data = read_tile_data(input_file, tile_format)
+    log_message(2, f'[TIME]   read tile:\t{time.perf_counter() - start_time:.3f} sec ({len(data["x"])} points)')
+    data = sort_by_block(data, grid)
+    log_message(2, f'[TIME]   sort by block:\t{time.perf_counter() - start_time:.3f} sec')
+
+    # high resolution subset keeps order of sorted data (no further sorting required)
+    highres = np.isin(data['w'], highres_weights)
+    variants = {'low': data, 'high': {c: v[highres] for c, v in data.items()}}
+
+    cnt_blocks = {}
+    for variant, variant_data in variants.items():
+        stats = block_statistics(variant_data, l1_scale=extended)
+        if stats is None:
+            log_message(1, f'[INFO]   {name}: no {variant} resolution data inside region')
+            cnt_blocks[variant] = 0
+            if variant == 'low':
+                # GMT writes empty files for "low" (output redirected by srun)
+                write_table(os.path.join(output_dir, f'{name}_low.bm'), [])
+                write_table(os.path.join(output_dir, f'{name}_low.stats'), [])
+            continue
+        write_block_files(stats, os.path.join(output_dir, f'{name}_{variant}'), extended)
+        cnt_blocks[variant] = len(stats['index'])
+        log_message(1, f'[INFO]   {name}_{variant}:\t{len(variant_data["x"])} points in {cnt_blocks[variant]} blocks')
+    log_message(2, f'[TIME]   total:\t{time.perf_counter() - start_time:.3f} sec')
+    return cnt_blocks
+
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    global verbosity
+    verbosity = args.verbose
+
+    blockmedian(args.input_file, args.region, args.increment, args.output_dir, args.format,
+                args.highres_weights, args.extended)
+    sys.exit(0)
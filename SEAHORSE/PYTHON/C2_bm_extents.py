@@ -0,0 +1,44 @@
+#-----------------------------------------------------------
+#   SEABED2030 - C2
+#   Extents and RID statistics of blockmedian files (*.bm)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import sys
+import time
+import argparse
+
+from GENERAL.lib.bm_stats import bm_statistics, write_table, merge_tables
+
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Compute extents, unique RIDs and number of blockmedian windows per RID '
+                                                 'of blockmedian files (single pass per file) and write them to one table.')
+    parser.add_argument('bm_files', type=str, nargs='*', help='Blockmedian files (tile_<ID>_<basicTile>_<type>.bm)')
+    parser.add_argument('--output', '-o', type=str, required=True, help='Output table (tab-separated)')
+    parser.add_argument('--merge', '-m', type=str, default=None,
+                        help='Merge all tables matching pattern (e.g. "WORK_BLOCKDIR/*.bmstats") into output table')
+    return parser
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.merge is not None:
+        cnt_rows = merge_tables(args.merge, args.output)
+        print(f'INFO:\tMerged statistics of {cnt_rows} blockmedian files into {args.output}\t{time.perf_counter() - start_time:.2f} sec')
+        sys.exit(0)
+
+    rows = []
+    for path in args.bm_files:
+        stats = bm_statistics(path)
+        if stats is None:
+            print(f'WARNING:\t{path} is empty and skipped')
+            continue
+        rows.append(stats)
+    write_table(rows, args.output)
+    print(f'INFO:\t{len(rows)} blockmedian files\t{args.output}\t{time.perf_counter() - start_time:.2f} sec')
+    sys.exit(0)
@@ -8,51 +8,73 @@
 
 import sys
 import os
-    
+import csv
+
+import numpy as np
+import pandas as pd
+
+from GENERAL.lib.metadata_index import MetadataIndex, is_metadata_index
+
+CHUNK_ROWS = 2**20 # number of blockmedian lines augmented at once
+DUMMY_DATA = ['0', '0', '0', '0', '0'] #we need dummy data for unknown RIDs otherwise empty lines will shift everything around
+
 def get_translation(codefile):
     """
-    Load data from rid codefile
+    Load data from rid codefile (or 'rid' table of metadata index)
+    """
+    if is_metadata_index(codefile):
+        with MetadataIndex(codefile) as index:
+            return split_codes(index.lines('rid')) # raw lines: identical to codefile
+    with open(codefile, 'r') as f:
+        next(f, None) # header
+        return split_codes(f)
+
+def split_codes(rows):
+    """
+    Split lines of rid codefile (without header) into RIDs and metadata fields
     """
     rid=[]
     lines=[]
-    header=None
-    with open(codefile, 'r') as f:
-        for i,row in enumerate(f):
-            row=row.strip()
-            if i==0: 
-                header = row
-                continue
-            info = row.split('\t')
-            rid.append(info.pop(0))
-            lines.append(list(info))
+    for row in rows:
+        row=row.strip()
+        info = row.split('\t')
+        rid.append(info.pop(0))
+        lines.append(list(info))
     return rid, lines
 
-def augment_BM(inFile,outFile,rid,metadata, delim='\t'):
+def build_lookup(rid, metadata, delim='\t'):
+    """
+    Build hash index of RIDs (first occurrence) and joined metadata lines.
+    The dummy line for unknown RIDs is appended as last element (position -1).
+    """
+    index = pd.Index(rid, dtype=object)
+    first = ~index.duplicated(keep='first')
+    lines = [delim.join(data) for data, keep in zip(metadata, first) if keep]
+    lines.append(delim.join(DUMMY_DATA))
+    return index[first], np.array(lines, dtype=object)
+
+def augment_BM(inFile,outFile,rid,metadata, delim='\t', chunk_rows=CHUNK_ROWS):
     """
     Augment each line in blockmedian by metadata attributes.
+    RIDs (3rd column) are read in chunks and looked up in hash index built once from codefile.
     """
-    with open(outFile,'w+') as o:    
-        with open(inFile,'r+') as f:
-            for i,line in enumerate(f):
-                #if i==0: continue #header row no it'S not dummy!
-                line=line.strip()
-                line = line.split(delim)
-                bm_rid = str(line[2])
-                if bm_rid in rid: pos = rid.index(bm_rid)
-                else: pos = None    
-                if pos is None:
-                    data=['0', '0', '0', '0', '0'] #we need dummy data otherwise empty lines will shift everything around
-                else:
-                    data=metadata[pos]
-                o.writelines(delim.join(data))
-                o.writelines('\n')
+    index, lines = build_lookup(rid, metadata, delim)
+    with open(outFile,'w+') as o:
+        try:
+            reader = pd.read_csv(inFile, sep=delim, header=None, usecols=[2], dtype=str, na_filter=False,
+                                 quoting=csv.QUOTE_NONE, chunksize=chunk_rows)
+            for chunk in reader:
+                pos = index.get_indexer(chunk[2]) # -1 (unknown RID) selects dummy line
+                o.write('\n'.join(lines[pos]) + '\n')
+        except pd.errors.EmptyDataError:
+            pass
 
 if __name__ == '__main__':
     
     if len(sys.argv) > 1: # check if there are any commandline arguments
         inFile = sys.argv[1].rstrip() # input file "*.bmz"
         outFile = sys.argv[2].rstrip() # output file "*.bmplus"
-        codefile = sys.argv[3].rstrip() # metadata table extract (from SQL dump)
+        codefile = sys.argv[3].rstrip() # metadata table extract (from SQL dump) or metadata index
     else:
         print('[ERROR]    No input argument(s) given!')
         sys.exit(1)
@@ -13,12 +13,14 @@ import glob
 import csv
 
 from GENERAL.lib.MySQL import MySQL_Handler #custom MySQL library
+from GENERAL.lib.bm_stats import read_table
 
 
 def defineInputArguments():
     parser = argparse.ArgumentParser(description='Update tile database with blockmedian info')
-    parser.add_argument('--infolder', '-i', nargs='?', type=str, help='folder of extent file location.', default=None, required=True)
+    parser.add_argument('--infolder', '-i', nargs='?', type=str, help='folder of extent file location.', default=None, required=False)
     parser.add_argument('--suffix', '-s', nargs='?', type=str, help='Lines file suffix (defauts to "extent").', default='extent', required=False)
+    parser.add_argument('--table', '-t', nargs='?', type=str, help='blockmedian statistics table (written by C2_bm_extents.py). Used instead of extent files.', default=None, required=False)
     return parser
 
 def get_files(infolder:str,suffix:str):
@@ -45,6 +47,10 @@ def convert_to_table(fileList:[str],sep='\t'):
         data.append(linedata)
     return data
 
+def read_stats_table(table:str):
+    data = read_table(table)
+    return data.to_dict('records')
+
 def update_db(handler:MySQL_Handler, data:[dict]):
     query = f"TRUNCATE info_bm;"
     handler.query(query)
@@ -61,10 +67,15 @@ if __name__ == '__main__':
         print('\nNo arguments passed!\n')
         quit()
 
-    folder = args.infolder
-    suffix = args.suffix
-    extentfiles = get_files(folder, suffix)
-    data = convert_to_table(extentfiles)
+    if args.table is not None:
+        data = read_stats_table(args.table)
+    elif args.infolder is not None:
+        folder = args.infolder
+        suffix = args.suffix
+        extentfiles = get_files(folder, suffix)
+        data = convert_to_table(extentfiles)
+    else:
+        parser.error('either --table or --infolder is required')
     update_db(handler,data)
     print('Done.')
     
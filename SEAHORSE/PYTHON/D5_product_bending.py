@@ -18,7 +18,7 @@ import rioxarray
 from dask.distributed import Client, LocalCluster, performance_report
 
 from GENERAL.bending.functions_bending import (create_transition_zone_dask, fill_transition_zone_dask,
-                                               calc_weighting_functions_dask, combine_data_dask)
+                                               calc_weighting_functions_dask, combine_data_dask, classify_chunks)
 try:
     import dask_memusage
     profile_mem = True
@@ -35,6 +35,7 @@ def defineInputArguments():
     parser.add_argument('type', type=str, help='Type of input/output data')
     parser.add_argument('--buffer', '-b', nargs='?', type=int, help='Buffer size (N x N)', default=5, required=True)
     parser.add_argument('--version', '-v', nargs='?', type=str, help='Specify algorithm version', choices=['standard', 'smooth'], default='standard')
+    parser.add_argument('--morphology', '-m', type=str, help='Backend of binary dilation/erosion (edt: distance transform, faster for large buffers)', choices=['footprint', 'edt'], default='footprint')
     parser.add_argument('--percentage', '-p', nargs='?', type=float, help='Percentage of high resolution data to incorporate (format: 0.x)', default=0.2)
     parser.add_argument('--outdir', '-o', nargs='?', type=str, help='Output directory for computed GeoTIFFs')
     return parser
@@ -77,6 +78,7 @@ if __name__ == '__main__':
     # print info block to log
     print(f'[INFO]   type:           {type_stats}')
     print(f'[INFO]   version:        {version}')
+    print(f'[INFO]   morphology:     {args.morphology}')
     print(f'[INFO]   percentage:     {percentage}')
     print(f'[INFO]   buffer size:    {buffer_size}')
     print(f'[INFO]   dask chunks:    {chunks}\n')
@@ -112,16 +114,18 @@ if __name__ == '__main__':
         mask_dask = mask.squeeze(drop=True).data.persist()
         
         #%% CREATE TRANSITION ZONE
+        chunk_classes = classify_chunks(mask_dask, buffer_size)
+        print(f'[INFO]   uniform mask chunks: {(chunk_classes >= 0).sum()} of {chunk_classes.size} (incl. halo, not processed by moving window operations)')
         print('[STATUS]   Create transition zone between low and high resolution data')
-        _, mask_dilation, mask_erosion, mask_diff, footprint = create_transition_zone_dask(mask_dask, buffer_size, percentage, version=version)
+        _, mask_dilation, mask_erosion, mask_diff, footprint = create_transition_zone_dask(mask_dask, buffer_size, percentage, version=version, morphology=args.morphology)
         
         #%% FILL TRANSITION ZONE
         print('[STATUS]   Fill transition zone by convolution of both datasets')
-        data_nearneighbor_transition = fill_transition_zone_dask(mask_dask, mask_erosion, data_nearneighbor_dask, data_surface_dask, footprint, version=version)
+        data_nearneighbor_transition = fill_transition_zone_dask(mask_dask, mask_erosion, data_nearneighbor_dask, data_surface_dask, footprint, version=version, mask_diff=mask_diff)
         
         #%% CALCULATE WEIGHTING FUNCTION
         print('[STATUS]   Generate hyperbolic weighting functions (1/d^2)')
-        dist_inner_func, dist_outer_func = calc_weighting_functions_dask(mask_dask, mask_dilation, mask_erosion, buffer_size, version=version)
+        dist_inner_func, dist_outer_func = calc_weighting_functions_dask(mask_dask, mask_dilation, mask_erosion, buffer_size, version=version, mask_diff=mask_diff)
         
         #%% COMBINE DATA
         print('[STATUS]   Combine low resolution, high resolution and convolved (transition zone) data into single array')
@@ -9,7 +9,6 @@
 
 import os
 import argparse
-import warnings
 
 import numpy as np
 
@@ -62,18 +61,62 @@ def calc_factor_xr(data_composite, data_background, mask, nan_value=np.nan):
     
     return factor
 
+def nanmedian_blocks(block, bm_cells:int):
+    """
+    NaN-aware median of non-overlapping (bm_cells x bm_cells) windows of array chunk.
+    The last two axes (y, x) are reshaped to (ny/bm_cells, bm_cells, nx/bm_cells, bm_cells).
+    Windows without NaN (fast path) use a partition-based selection of the two central values,
+    windows with NaN are sorted (NaN last) to select the central values of the valid cells only.
+    All-NaN windows return NaN (same as np.nanmedian).
+    
+    Parameters
+    ----------
+    block : np.ndarray
+        Array chunk with shape (..., ny, nx) and ny, nx multiples of bm_cells.
+    bm_cells : int
+        Number of aggregated cells.
+    
+    Returns
+    -------
+    out : np.ndarray
+        Median of windows with shape (..., ny/bm_cells, nx/bm_cells).
+    """
+    *lead, ny, nx = block.shape
+    n_cells = bm_cells * bm_cells
+    windows = block.reshape(*lead, ny // bm_cells, bm_cells, nx // bm_cells, bm_cells).swapaxes(-3, -2)
+    windows = windows.reshape(-1, n_cells)
+    
+    out = np.full(len(windows), np.nan, dtype=np.result_type(block.dtype, np.float32))
+    cnt_valid = n_cells - np.count_nonzero(np.isnan(windows), axis=1)
+    
+    full = cnt_valid == n_cells
+    if full.any():
+        lo, hi = (n_cells - 1) // 2, n_cells // 2
+        part = np.partition(windows[full], [lo, hi], axis=1)
+        out[full] = (part[:, lo] + part[:, hi]) / 2
+    
+    partial = (cnt_valid > 0) & ~full
+    if partial.any():
+        part = np.sort(windows[partial], axis=1) # NaN sorted to the end
+        cnt = cnt_valid[partial][:, np.newaxis]
+        out[partial] = (np.take_along_axis(part, (cnt - 1) // 2, axis=1) + np.take_along_axis(part, cnt // 2, axis=1))[:, 0] / 2
+    
+    return out.reshape(*lead, ny // bm_cells, nx // bm_cells)
+
 def blockmedian_chunkwise(array, bm_cells:int, chunks:tuple):
     """
     Perform blockmedian reduction for DataArray chunks using window of (bm_cells x bm_cells).
+    Chunks are resized to multiples of bm_cells (no window spans two chunks) and reduced 
+    independently using nanmedian_blocks (via dask.array.map_blocks).
     
     Parameters
     ----------
     array : xarray.DataArray
-        DESCRIPTION.
+        Input array with dimensions "y" and "x" (multiples of bm_cells).
     bm_cells : int
         Number of aggregated cells.
     chunks : tuple
-        Tuple of chunks to split output (band, x, y)
+        Tuple of chunks of input (band, x, y), rounded to multiples of bm_cells
     
     Returns
     -------
@@ -83,41 +126,82 @@ def blockmedian_chunkwise(array, bm_cells:int, chunks:tuple):
     Reference:
     http://xarray.pydata.org/en/stable/generated/xarray.DataArray.coarsen.html
     """
-    array_bm = array.coarsen(y=bm_cells, x=bm_cells, 
-                             coord_func={'y':'mean', 'x':'mean'}).median(skipna=True)#.chunk(chunks)
+    if array.sizes['y'] % bm_cells != 0 or array.sizes['x'] % bm_cells != 0:
+        raise ValueError(f'Array size ({array.sizes["y"]} x {array.sizes["x"]}) is not a multiple of bm_cells ({bm_cells})')
+    
+    array = array.transpose(..., 'y', 'x')
+    chunks_yx = [max(bm_cells, c // bm_cells * bm_cells) for c in chunks[-2:]]
+    array = array.chunk(dict(zip(['y', 'x'], chunks_yx)))
+    
+    data = array.data
+    chunks_bm = data.chunks[:-2] + tuple(tuple(c // bm_cells for c in dim) for dim in data.chunks[-2:])
+    data_bm = data.map_blocks(nanmedian_blocks, bm_cells=bm_cells, chunks=chunks_bm, 
+                              dtype=np.result_type(array.dtype, np.float32), name='blockmedian')
+    
+    # window centers as new coordinates (same as coarsen with coord_func "mean")
+    coords = {name: coord for name, coord in array.coords.items() if not set(coord.dims) & {'y', 'x'}}
+    for dim in ['y', 'x']:
+        coords[dim] = array[dim].values.reshape(-1, bm_cells).mean(axis=1)
+    array_bm = xr.DataArray(data_bm, dims=array.dims, coords=coords, attrs=array.attrs, name=array.name)
     
     # update 'spatial_reference' attribute to account for changed resolution
     gt = [float(g) for g in array_bm['spatial_ref'].attrs['GeoTransform'].split()]
-    gt[1] = gt[1] * blocksize
-    gt[-1] = gt[-1] * blocksize
+    gt[1] = gt[1] * bm_cells
+    gt[-1] = gt[-1] * bm_cells
     gt_bm = ' '.join([str(g) for g in gt])
     array_bm['spatial_ref'] = array_bm['spatial_ref'].rio.update_attrs({'GeoTransform':gt_bm})
     
     return array_bm
 
-def preprocess_blockmedian_array(array_bm):
+def finite_triplets(values, x, y):
     """
-    Preprocess xarray.DataArray for usage in pygmt.surface.
+    Gather X, Y and Z of finite cells of 2D array (y, x) into float32 array (N x 3).
+    Rows are ordered by X and Y (same as stacking dimensions ['x','y']).
+    """
+    ix, iy = np.nonzero(np.isfinite(values).T)
+    out = np.empty((len(ix), 3), dtype=np.float32)
+    out[:, 0] = x[ix]
+    out[:, 1] = y[iy]
+    out[:, 2] = values[iy, ix]
+    return out
+
+def preprocess_blockmedian_array(array_bm, out_file:str=None):
+    """
+    Preprocess xarray.DataArray for usage in pygmt.surface. 
+    Only finite cells (no NaN or inf) are extracted as X,Y,Z triplets.
     
     Parameters
     ----------
     array_bm : xarray.DataArray
         Blockmedian-filtered factor array.
+    out_file : str, optional
+        Write triplets as binary float32 records (GMT: -bi3f) to file instead of returning them.
+        The array is computed and written in slabs of chunk rows (peak memory scales with valid cells of slab).
     
     Returns
     -------
-    array_out : np.ndarray
-        2D numpy array with X,Y and Z as columns.
+    array_out : np.ndarray | int
+        2D numpy array with X,Y and Z as columns (number of written triplets if out_file is given).
     
     """
-    with warnings.catch_warnings():
-        warnings.filterwarnings(action='ignore', message='All-NaN slice encountered') # catch sepcified warning
-        array_out = array_bm.squeeze(dim='band', drop=True).drop('spatial_ref').stack(dims=['x','y'])
-        array_out = array_out.to_dataframe(name='factor_bm').reset_index(drop=False)
-        array_out = array_out.replace([np.inf, -np.inf], np.nan).dropna(axis=0, how='any')
-        array_out = array_out.to_numpy(dtype=np.float32) # convert to 2D array
-    
-    return array_out
+    array_bm = array_bm.squeeze(dim='band', drop=True).transpose('y', 'x')
+    x = array_bm['x'].values
+    y = array_bm['y'].values
+    
+    if out_file is None:
+        return finite_triplets(np.asarray(array_bm.values), x, y)
+    
+    rows = array_bm.chunks[0] if array_bm.chunks is not None else (array_bm.sizes['y'],)
+    cnt = 0
+    with open(out_file, 'wb') as f:
+        start = 0
+        for nrows in rows:
+            slab = np.asarray(array_bm[start:start + nrows].values)
+            triplets = finite_triplets(slab, x, y[start:start + nrows])
+            triplets.tofile(f)
+            cnt += len(triplets)
+            start += nrows
+    return cnt
 
 def adjust_background(data_background, factor):
     """Wrapper for background adjustment."""
@@ -138,9 +222,11 @@ def define_input_arguments():
     parser.add_argument('background', help='SRTM15 V2 GeoTIFF')
     parser.add_argument('mask', help='Mask of IBCSO data (only high-resolution; TID >=15)')
     parser.add_argument('--mask_srtm', help='Mask where to use SRTM15+ grid (1: use, 0: do NOT)')
+    parser.add_argument('--stream_bm', action='store_true', help='Stream blockmedian factor grid to binary file (-bi3f) for pygmt.surface instead of memory')
     parser.add_argument('--blocksize_bm', '-bs', nargs='?', type=int, help='Blockmedian window size (N x N)', default=20)
     parser.add_argument('--buffer', '-bu', nargs='?', type=int, help='Buffer size for transition zone', default=20)
     parser.add_argument('--version', '-v', nargs='?', type=str, help='Specify algorithm version', choices=['standard', 'smooth'], default='standard')
+    parser.add_argument('--morphology', '-m', type=str, help='Backend of binary dilation/erosion (edt: distance transform, faster for large buffers)', choices=['footprint', 'edt'], default='footprint')
     parser.add_argument('--percentage', '-p', nargs='?', type=float, help='Percentage of high resolution data to incorporate (format: 0.x)', default=0.0)
     parser.add_argument('--outdir', '-o', nargs='?', type=str, help='Output directory for files to write')
     parser.add_argument('--type', type=str, help='Type of input/output data', default='median')
@@ -196,7 +282,9 @@ if __name__ == '__main__':
     print(f'[INFO]   blockmedian size:   {blocksize}')
     print(f'[INFO]   buffer size:        {buffer_size}')
     print(f'[INFO]   version:            {version}')
+    print(f'[INFO]   morphology:         {args.morphology}')
     print(f'[INFO]   percentage:         {args.percentage}')
+    print(f'[INFO]   stream blockmedian: {args.stream_bm}')
     print(f'[INFO]   resolution:         {resolution}')
     print(f'[INFO]   res_surface:        {res_surface}')
     print(f'[INFO]   res_filter:         {res_filter}')
@@ -234,8 +322,16 @@ if __name__ == '__main__':
         factor_bm = blockmedian_chunkwise(factor, bm_cells=blocksize, chunks=chunks).rename('factor_bm')
         
         #%% INTERPOLATE FACTOR (BLOCKMEDIAN)
-        print('[STATUS]   Preprocess blockmedian factor grid (convert to numpy array with X,Y,Z columns)')
-        factor_preproc = preprocess_blockmedian_array(factor_bm)
+        if args.stream_bm:
+            print('[STATUS]   Preprocess blockmedian factor grid (stream X,Y,Z triplets to binary file)')
+            factor_preproc = os.path.join(output_dir, f'{timestamp}_{type_stats}_factor_bm.bin')
+            cnt_triplets = preprocess_blockmedian_array(factor_bm, out_file=factor_preproc)
+            kwargs_bm = {'bi':'3f'}     # binary input (3 float32 columns)
+            print(f'[INFO]   blockmedian triplets: {cnt_triplets}')
+        else:
+            print('[STATUS]   Preprocess blockmedian factor grid (convert to numpy array with X,Y,Z columns)')
+            factor_preproc = preprocess_blockmedian_array(factor_bm)
+            kwargs_bm = {}
         
         print('[STATUS]   Interpolate factor residuals using pygmt.surface')
         out_surface = os.path.join(output_dir, f'{timestamp}_{type_stats}_factor_surface.nc')
@@ -248,7 +344,7 @@ if __name__ == '__main__':
                                         'C':0.001,  # convergence limit
                                         'Ll':'d',      # limit lower output solution to minimum input value
                                         'Lu':'d',      # limit upper output solution to maximum input value
-                                        },
+                                        **kwargs_bm},
                                     outfile=out_surface)
         
         #%% FILTER INTERPOLATED FACTOR
@@ -303,11 +399,11 @@ if __name__ == '__main__':
         #%% CREATE TRANSITION ZONE
         print('[STATUS]   Create transition zone between low and high resolution data')
         mask_dask, mask_dilation, mask_erosion, mask_diff_dilation, _ = create_transition_zone_dask(mask_dask, buffer_size, version=version, 
-                                                                                                    mask_srtm=mask_srtm, remove_small_patches=True, remove_divisor=5)
+                                                                                                    mask_srtm=mask_srtm, remove_small_patches=True, remove_divisor=5, morphology=args.morphology)
         
         #%% CALCULATE WEIGHTING FUNCTION
         print('[STATUS]   Generate hyperbolic weighting functions (1/d^2)')
-        dist_inner_func, dist_outer_func = calc_weighting_functions_dask(mask_dask, mask_dilation, mask_erosion, buffer_size, version=version)
+        dist_inner_func, dist_outer_func = calc_weighting_functions_dask(mask_dask, mask_dilation, mask_erosion, buffer_size, version=version, mask_diff=mask_diff_dilation)
         
         #%% COMBINE IBCSO AND SRTM15
         print('[STATUS]   Combine low resolution, high resolution and convolved (transition zone) data into single array')
@@ -14,6 +14,7 @@ import argparse
 import csv
 
 from lib.MySQL import MySQL_Handler #custom MySQL library
+from lib.metadata_index import build_metadata_index
  
 def getMetadata(outFile, table='metadata', limit='\t', ALL_RECORDS=False):
     
@@ -94,6 +95,7 @@ def defineInputArguments():
     parser.add_argument('--table', '-Q', nargs='?', type=str, help='Get user defined schema.', default = None, required=False)
     parser.add_argument('--output', nargs='?', type=str, help='Filename for user defined schema download.', default = None, required=False)
     parser.add_argument('--tileQA', nargs='?', type=str, help='Filename for tile_info QA data.', default = None, required=False)
+    parser.add_argument('--index', nargs='?', type=str, help='Build metadata index (SQLite) from downloaded metadata tables.', default = None, required=False)
     parser.add_argument('--curate', nargs='*', type=str, help='Curate tables.', default = None, required=False)
     return parser
 
@@ -155,3 +157,9 @@ if __name__ == '__main__':
         if args.output is not None:
             print(f'Downloading schema {args.table} into {args.output}')
             getTable(args.table,args.output)
+    
+    if args.index is not None:
+        tables = {'metadata':args.metadata, 'metadata_working':args.metadata_fixed_cols, 'rid':args.rid}
+        tables = {name:path for name, path in tables.items() if path is not None}
+        print(f'Building metadata index ({", ".join(tables)}) into {args.index}')
+        build_metadata_index(args.index, tables)
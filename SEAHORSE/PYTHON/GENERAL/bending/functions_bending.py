@@ -38,8 +38,165 @@ def get_circular_buffer(buffersize:int):
         
     return kernel
 
+def get_uniform_value(block):
+    """
+    Return value of array block if all cells are equal (None otherwise).
+    """
+    if block.size == 0:
+        return None
+    value = block.flat[0]
+    return value if (block == value).all() else None
+
+def classify_chunks(mask, depth:int):
+    """
+    Classify chunks of data mask including halo of neighbouring chunks (as used by map_overlap).
+    
+    Parameters
+    ----------
+    mask : dask.array
+        IBCSO data mask.
+    depth : int
+        Halo size (cells), e.g. buffer size of transition zone.
+    
+    Returns
+    -------
+    classes : np.array
+        Class per chunk: 0 (all cells 0), 1 (all cells 1), -1 (mixed).
+    """
+    def _classify(block):
+        value = get_uniform_value(block)
+        return np.full((1,) * block.ndim, -1 if value is None else value, dtype=np.int8)
+    
+    classes = mask.map_overlap(_classify, depth=depth, boundary='none', trim=False, dtype=np.int8,
+                               chunks=tuple((1,) * len(c) for c in mask.chunks), name='classify_chunks')
+    return classes.compute()
+
+def binary_morphology_edt(mask, radius:int, operation:str='dilation', border_value:int=0):
+    """
+    Binary dilation or erosion of mask with circular footprint (get_circular_buffer(radius)) using 
+    thresholds of the euclidean distance transform instead of moving window operations.
+    Identical (cell-for-cell) to binary_dilation/binary_erosion with the same footprint (iterations=1), 
+    but runtime independent of the radius.
+    
+    Parameters
+    ----------
+    mask : np.array
+        Binary mask.
+    radius : int
+        Buffer size (radius) of circular footprint.
+    operation : str, optional
+        Either 'dilation' or 'erosion'. The default is 'dilation'.
+    border_value : int, optional
+        Value of cells outside of mask. The default is 0.
+    
+    Returns
+    -------
+    out : np.array
+        Dilated or eroded mask (bool).
+    """
+    threshold = radius**2 + int(radius/2) # squared radius of circular footprint
+    erosion = operation == 'erosion'
+    # erosion of mask is complement of dilation of complement (circular footprint is symmetric)
+    padded = np.pad(np.asarray(mask, dtype=bool) ^ erosion, radius, mode='constant', 
+                    constant_values=bool(border_value) ^ erosion)
+    if not padded.any():
+        dilated = padded
+    else:
+        # squared distances to closest cell of mask are integers
+        dilated = np.rint(distance_transform_edt(~padded)**2) <= threshold
+    return dilated[radius:radius + mask.shape[0], radius:radius + mask.shape[1]] ^ erosion
+
+def _morphology_sparse(block, operation=None, radius=None, **kwargs):
+    """
+    Binary morphology (dilation or erosion) of block including halo.
+    Uniform blocks are returned unchanged (their dilation and erosion is the block itself,
+    apart from cells within the halo that are trimmed by map_overlap).
+    With radius the operation is computed by binary_morphology_edt (circular footprint).
+    """
+    if get_uniform_value(block) is not None:
+        return block.astype(bool)
+    if radius is not None:
+        return binary_morphology_edt(block, radius, 'erosion' if operation is binary_erosion else 'dilation', 
+                                     border_value=kwargs.get('border_value', 0))
+    return operation(block, **kwargs)
+
+def _distance_transform_sparse(block, transition=None):
+    """
+    Euclidean distance transform of block including halo.
+    Blocks without transition zone cells (transition == 0) are not computed (NaN, values not used),
+    blocks of zeros have a distance of 0.
+    """
+    if transition is not None and get_uniform_value(transition) == 0:
+        return np.full(block.shape, np.nan)
+    if get_uniform_value(block) == 0:
+        return np.zeros(block.shape)
+    return distance_transform_edt(block)
+
+def convolve_binary_footprint(data, footprint):
+    """
+    Convolution of 2D data with binary footprint (odd shape) using prefix sums along rows.
+    Each footprint row is split into runs of ones, whose window sums are differences of the 
+    cumulative row sums (runtime grows with footprint height instead of footprint area).
+    Identical to scipy.ndimage.convolve(data, footprint, mode='reflect') for integer data.
+    
+    Parameters
+    ----------
+    data : np.array
+        2D data array.
+    footprint : np.array
+        Binary (0/1) footprint with odd number of rows and columns.
+    
+    Returns
+    -------
+    out : np.array
+        Convolved data (int64 for integer data, float64 otherwise).
+    """
+    kernel = np.asarray(footprint)[::-1, ::-1] # convolution is correlation with flipped footprint
+    half_y, half_x = kernel.shape[0] // 2, kernel.shape[1] // 2
+    ny, nx = data.shape
+    acc_dtype = np.int64 if np.issubdtype(data.dtype, np.integer) else np.float64
+    padded = np.pad(data.astype(acc_dtype), ((half_y, half_y), (half_x, half_x)), mode='symmetric') # scipy 'reflect'
+    csum = np.zeros((padded.shape[0], padded.shape[1] + 1), dtype=acc_dtype)
+    np.cumsum(padded, axis=1, out=csum[:, 1:])
+    
+    out = np.zeros((ny, nx), dtype=acc_dtype)
+    for i, row in enumerate(kernel != 0):
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], row, [False])).astype(np.int8)))
+        for start, end in zip(edges[::2], edges[1::2]): # run of ones [start, end)
+            out += csum[i:i + ny, end:end + nx]
+            out -= csum[i:i + ny, start:start + nx]
+    return out
+
+def convolve_normalised(data, weights):
+    """
+    Convolution of data normalised by convolution of dummy grid (divisor) in single pass.
+    The divisor is the convolution of ones padded with ones (cval=1.0), i.e. constant (sum of weights)
+    and therefore not convolved. Binary footprints of 2D data are convolved using prefix sums 
+    (convolve_binary_footprint), others using scipy.ndimage.convolve.
+    Identical to convolve(data, weights, mode='reflect') / convolve(ones_like(data), weights, mode='constant', cval=1.0).
+    """
+    weights = np.asarray(weights)
+    binary = (data.ndim == 2 and np.isin(weights, [0, 1]).all() and 
+              all(n % 2 == 1 and n // 2 < size for n, size in zip(weights.shape, data.shape))) # padding by single reflection
+    if binary and np.issubdtype(data.dtype, np.integer):
+        data_tmp = convolve_binary_footprint(data, weights)
+    else:
+        data_tmp = convolve(data, weights=weights, mode='reflect')
+    # divisor with same dtype as convolution of dummy grid
+    data_kernel = convolve(np.ones((1,) * data.ndim, dtype=data.dtype), weights=weights, mode='constant', cval=1.0).flat[0]
+    return np.true_divide(data_tmp, data_kernel)
+
+def _convolve_sparse(data, transition=None, weights=None):
+    """
+    Normalised convolution of data block (including halo), see convolve_normalised.
+    Blocks without transition zone cells (transition == 0) are returned unchanged.
+    """
+    if transition is not None and get_uniform_value(transition) == 0:
+        return data.astype(np.float64)
+    return convolve_normalised(data, weights)
+
 def create_transition_zone_dask(mask_data, buffer_size, percentage=0.0, version='standard', 
-                                mask_srtm=None, remove_small_patches=False, remove_divisor=5):
+                                mask_srtm=None, remove_small_patches=False, remove_divisor=5, morphology='footprint'):
     """
     Create transition zone between IBCSO composite data and SRTM15 background grid based on data mask.
     
@@ -60,6 +217,10 @@ def create_transition_zone_dask(mask_data, buffer_size, percentage=0.0, version=
     remove_divisor : int
         Divisor of buffer_size (divident) to calculate reduced footprint for removal of small patches. 
         The default is '5' (1/5 of buffer_size [radius]).
+    morphology : str
+        Backend of binary dilation and erosion: 'footprint' (moving window with circular footprint) 
+        or 'edt' (threshold of euclidean distance transform, identical results, faster for large buffer sizes).
+        The default is 'footprint'.
     
     Returns
     -------
@@ -74,6 +235,10 @@ def create_transition_zone_dask(mask_data, buffer_size, percentage=0.0, version=
     footprint : np.array
         Structure used for morphological operations.
     """
+    if morphology not in ['footprint', 'edt']:
+        raise ValueError(f'Unknown morphology backend "{morphology}" (use "footprint" or "edt")')
+    use_edt = morphology == 'edt'
+    
     # create circular buffer footprint
     footprint = get_circular_buffer(buffer_size)
     
@@ -87,24 +252,26 @@ def create_transition_zone_dask(mask_data, buffer_size, percentage=0.0, version=
         mask = mask_data
     
     if version == 'standard':
-        kwargs = {'structure':footprint, 'iterations':1, 'border_value':0}
+        kwargs = {'structure':footprint, 'iterations':1, 'border_value':0, 'radius':buffer_size if use_edt else None}
         
         # perform binary dilation chunkwise (1: data + buffered areas [dilation], 0: else)
-        mask_dilation = mask.map_overlap(binary_dilation, depth=buffer_size, boundary='none', trim=True,
+        mask_dilation = mask.map_overlap(_morphology_sparse, operation=binary_dilation, depth=buffer_size, boundary='none', trim=True,
                                          dtype=np.int8, name='mask_dilation', **kwargs)
         
         if remove_small_patches:
             print('[INFO]   Removing small SRTM15 infill patches')
             remove_divisor = int(remove_divisor) # make sure divisor is int
-            footprint_cleaning = get_circular_buffer(int(buffer_size//remove_divisor))
+            radius_cleaning = int(buffer_size//remove_divisor)
+            footprint_cleaning = get_circular_buffer(radius_cleaning)
             if len(footprint_cleaning) == 1: footprint_cleaning = np.ones((3,3), dtype=np.int8) # fallback value if buffer_size small
+            radius_cleaning = radius_cleaning if use_edt and radius_cleaning > 0 else None # fallback footprint is not circular
 
             # perform binary_closing to eliminate small patches where SRTM15 grid would be used
-            kwargs_dilation = {'structure':footprint_cleaning, 'iterations':1, 'border_value':0}
-            tmp = mask_dilation.map_overlap(binary_dilation, depth=buffer_size, boundary='none', trim=True,
+            kwargs_dilation = {'structure':footprint_cleaning, 'iterations':1, 'border_value':0, 'radius':radius_cleaning}
+            tmp = mask_dilation.map_overlap(_morphology_sparse, operation=binary_dilation, depth=buffer_size, boundary='none', trim=True,
                                             dtype=np.int8, name='mask_dilation_cleaned', **kwargs_dilation)
-            kwargs_erosion = {'structure':footprint_cleaning, 'iterations':1, 'border_value':1} # border_values must be 1 --> avoid edge effects!
-            mask_cleaned = tmp.map_overlap(binary_erosion, depth=buffer_size, boundary='none', trim=True,
+            kwargs_erosion = {'structure':footprint_cleaning, 'iterations':1, 'border_value':1, 'radius':radius_cleaning} # border_values must be 1 --> avoid edge effects!
+            mask_cleaned = tmp.map_overlap(_morphology_sparse, operation=binary_erosion, depth=buffer_size, boundary='none', trim=True,
                                            dtype=np.int8, name='mask_dilation_cleaned', **kwargs_erosion)
             
             # calc additional mask of buffered areas using logical binary check (1: buffered areas [dilation], 0: data + else)
@@ -125,14 +292,14 @@ def create_transition_zone_dask(mask_data, buffer_size, percentage=0.0, version=
         
         # ----- DILATION --> surface grid area -----
         footprint_dilation = get_circular_buffer(buffer_dilation)
-        kwargs_dil = {'structure':footprint_dilation, 'iterations':1, 'border_value':0}
-        mask_dilation = mask.map_overlap(binary_dilation, depth=buffer_size, boundary='none', trim=True,
+        kwargs_dil = {'structure':footprint_dilation, 'iterations':1, 'border_value':0, 'radius':buffer_dilation if use_edt else None}
+        mask_dilation = mask.map_overlap(_morphology_sparse, operation=binary_dilation, depth=buffer_size, boundary='none', trim=True,
                                          dtype=np.int8, name='mask_dilation', **kwargs_dil)
         
         # ----- EROSION --> nearneighbor grid area -----
         footprint_erosion = get_circular_buffer(buffer_erosion)
-        kwargs_ero = {'structure':footprint_erosion, 'iterations':1, 'border_value':0}
-        mask_erosion = mask.map_overlap(binary_erosion, depth=buffer_size, boundary=1, trim=True,
+        kwargs_ero = {'structure':footprint_erosion, 'iterations':1, 'border_value':0, 'radius':buffer_erosion if use_edt else None}
+        mask_erosion = mask.map_overlap(_morphology_sparse, operation=binary_erosion, depth=buffer_size, boundary=1, trim=True,
                                         dtype=np.int8, name='mask_erosion', **kwargs_ero).astype(np.int8)
         
         # ----- only TRANSITION ZONE -----
@@ -141,7 +308,7 @@ def create_transition_zone_dask(mask_data, buffer_size, percentage=0.0, version=
         
         return mask, mask_dilation, mask_erosion, mask_diff, footprint
 
-def fill_transition_zone_dask(mask, mask_erosion, data_nn, data_s, footprint, version='standard'):
+def fill_transition_zone_dask(mask, mask_erosion, data_nn, data_s, footprint, version='standard', mask_diff=None):
     """
     Compute data values for used in transition zone using a convolution of merged nearneighbor and surface data.
 
@@ -160,6 +327,9 @@ def fill_transition_zone_dask(mask, mask_erosion, data_nn, data_s, footprint, ve
     version : str, optional
         Define algorihtm method to use. Either 'standard' (only on background grid) 
         or 'smooth' (both on high-res and background grid).The default is 'standard'.
+    mask_diff : dask.array, optional
+        Transition zone mask (from create_transition_zone_dask). If given, chunks without 
+        transition zone cells (including halo) are not convolved. The default is None.
     
     Returns
     -------
@@ -174,16 +344,11 @@ def fill_transition_zone_dask(mask, mask_erosion, data_nn, data_s, footprint, ve
     depth = tuple(np.array(footprint.shape) // 2) # depth should be at least(!) half the footprint size to avoid issues!
     depth = dict(zip(range(data_merge.ndim), depth))
     boundary = 'none'
-    # convolve combined nearneighbor and surface data
-    data_tmp = dask.array.map_overlap(convolve, data_merge, depth=depth, boundary=boundary, trim=True,
-                                      dtype=np.float32, name='convolve_temp', meta=data_merge._meta, 
-                                      weights=footprint, mode='reflect')
-    # convolve dummy grid (used as divisor)
-    data_kernel = dask.array.map_overlap(convolve, dask.array.ones_like(data_merge), depth=depth, boundary=boundary, trim=True,
-                                         dtype=np.float32, name='convolve_kernel', meta=data_merge._meta,
-                                         weights=footprint, mode='constant', cval=1.0)
-    # get actual convolved nearneighbor and surface data
-    data_convolve = dask.array.true_divide(data_tmp, data_kernel)
+    # convolve combined nearneighbor and surface data (divided by convolved dummy grid)
+    arrays = [data_merge] if mask_diff is None else [data_merge, mask_diff]
+    data_convolve = dask.array.map_overlap(_convolve_sparse, *arrays, depth=depth, boundary=boundary, trim=True,
+                                           dtype=np.float32, name='convolve', meta=data_merge._meta, 
+                                           weights=footprint)
     
     # [standard]: fill only surface transition zone
     if version == 'standard':
@@ -194,7 +359,7 @@ def fill_transition_zone_dask(mask, mask_erosion, data_nn, data_s, footprint, ve
         data_out = dask.array.where(mask_erosion==1, data_nn, data_convolve)
         return data_out
 
-def calc_weighting_functions_dask(mask, mask_dilation, mask_erosion, buffer_size, version='standard'):
+def calc_weighting_functions_dask(mask, mask_dilation, mask_erosion, buffer_size, version='standard', mask_diff=None):
     """
     Calculate euclidean distances from zero values of sparse high-resolution data mask (== 0) to actual data cells (mask == 1).
     Vis versa for dilated mask (low-resolution data). Closest cells to each mask equal "1" and decreasing values with increasing distance.
@@ -211,6 +376,9 @@ def calc_weighting_functions_dask(mask, mask_dilation, mask_erosion, buffer_size
     version : str
         Either 'standard' (only on background grid) or 'smooth' (both on composite and background grid). 
         The default is 'standard'.
+    mask_diff : dask.array, optional
+        Transition zone mask (from create_transition_zone_dask). If given, distances are only 
+        computed for chunks with transition zone cells (including halo), otherwise NaN. The default is None.
     
     Returns
     -------
@@ -228,18 +396,20 @@ def calc_weighting_functions_dask(mask, mask_dilation, mask_erosion, buffer_size
     depth = {0:buffer_size, 1:buffer_size}
     boundary = 'none'
     
+    transition = [] if mask_diff is None else [mask_diff]
+    
     if version == 'standard':
         # distance from inner part (*inverted* mask used!)
-        dist_inner = dask.array.map_overlap(distance_transform_edt, abs(mask - 1), depth=depth, boundary=boundary, trim=True, dtype=np.float32, name='dist_inner')
+        dist_inner = dask.array.map_overlap(_distance_transform_sparse, abs(mask - 1), *transition, depth=depth, boundary=boundary, trim=True, dtype=np.float32, name='dist_inner')
     elif version == 'smooth':
         # distance from inner part (*inverted* mask_erosion used!)
-        dist_inner = dask.array.map_overlap(distance_transform_edt, abs(mask_erosion - 1), depth=depth, boundary=boundary, trim=True, dtype=np.float32, name='dist_inner')
+        dist_inner = dask.array.map_overlap(_distance_transform_sparse, abs(mask_erosion - 1), *transition, depth=depth, boundary=boundary, trim=True, dtype=np.float32, name='dist_inner')
         
     # inner weighting factor
     dist_inner_sq = dask.array.map_overlap(_weight_func, dist_inner, depth=depth, boundary=boundary, trim=True, dtype=np.float32, name='dist_inner_sq')
     
     # distance from outer part
-    dist_outer = dask.array.map_overlap(distance_transform_edt, mask_dilation, depth=depth, boundary=boundary, trim=True, dtype=np.float32, name='dist_outer')
+    dist_outer = dask.array.map_overlap(_distance_transform_sparse, mask_dilation, *transition, depth=depth, boundary=boundary, trim=True, dtype=np.float32, name='dist_outer')
     
     # outer weighting factor
     dist_outer_sq = dask.array.map_overlap(_weight_func, dist_outer, depth=depth, boundary=boundary, trim=True, dtype=np.float32, name='dist_outer_sq')
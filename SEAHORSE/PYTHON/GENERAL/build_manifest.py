@@ -0,0 +1,104 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Build manifest
+#   Plan and commit incremental builds (only datasets changed since the last build are re-tiled)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import os
+import sys
+import glob
+import json
+import argparse
+
+from lib.build_manifest import BuildManifest, read_tilecounts, write_list, PENDING_FILE
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Incremental build: find datasets (RIDs) changed since last build (plan, B1) '
+                                                 'and update build manifest after tiling (commit, B4).')
+    parser.add_argument('action', type=str, choices=['plan', 'commit'], help='"plan" (before tiling) or "commit" (after tiling)')
+    parser.add_argument('--manifest', '-m', type=str, required=True, help='Persistent build manifest (JSON)')
+    parser.add_argument('--build-dir', '-b', type=str, required=True, help='Directory for lists of changed datasets and tiles')
+    parser.add_argument('--xyz-dir', type=str, default=None, help='[plan] Directory of XYZ files (rid_wweight.xyz)')
+    parser.add_argument('--metadata', type=str, default=None,
+                        help='[plan] Metadata table (tab-separated, RID in 1st and usage flag in 7th column). Only datasets with flag "1" are used.')
+    parser.add_argument('--tilecounts', type=str, default=None, help='[commit] Directory of "*.tilecounts" files (B2)')
+    parser.add_argument('--tiledir', type=str, default=None, help='[commit] Directory of tiles (tile_<ID>_<basicTile>.tile)')
+    parser.add_argument('--tilecounts-out', type=str, default=None, help='[commit] Output file for total number of points per tile')
+    return parser
+
+def read_usage_flags(metadata_file:str)->dict:
+    """Read usage flag (7th column) per RID (1st column) from metadata table."""
+    flags = {}
+    with open(metadata_file, 'r', errors='replace') as f:
+        for line in f:
+            fields = line.rstrip('\r\n').split('\t')
+            if len(fields) >= 7:
+                flags[fields[0]] = fields[6].strip()
+    return flags
+
+def plan(args):
+    manifest = BuildManifest(args.manifest)
+    files = glob.glob(os.path.join(args.xyz_dir, '*.xyz'))
+    flags = None
+    if args.metadata is not None:
+        flags = read_usage_flags(args.metadata)
+        files = [f for f in files if flags.get(os.path.basename(f).split('_')[0]) == '1'] # restricted datasets count as removed
+    fingerprints = manifest.fingerprint(files, flags)
+    changed, removed = manifest.diff(fingerprints)
+    drop_rids = sorted(set(changed) | set(removed))
+    dirty_tiles = sorted(manifest.tiles_of(drop_rids), key=int)
+
+    changed_files = sorted(info['path'] for rid in changed for info in fingerprints[rid]['files'].values())
+    write_list(changed_files, os.path.join(args.build_dir, 'changed_files.txt'))
+    write_list(drop_rids, os.path.join(args.build_dir, 'drop_rids.txt'))
+    write_list(dirty_tiles, os.path.join(args.build_dir, 'dirty_tiles.txt'))
+    with open(os.path.join(args.build_dir, PENDING_FILE), 'w') as f:
+        json.dump(dict(fingerprints={rid: fingerprints[rid] for rid in changed}, drop_rids=drop_rids,
+                       dirty_tiles=dirty_tiles, dirty_basic_tiles=sorted(manifest.basic_tiles_of(dirty_tiles))), f)
+    print(f'INFO:\t{len(fingerprints)} datasets\t{len(changed)} changed or new\t{len(removed)} removed\t'
+          f'{len(changed_files)} files to tile\t{len(dirty_tiles)} existing tiles affected')
+
+def commit(args):
+    manifest = BuildManifest(args.manifest)
+    with open(os.path.join(args.build_dir, PENDING_FILE), 'r') as f:
+        pending = json.load(f)
+    fingerprints = pending['fingerprints']
+    counts = read_tilecounts(args.tilecounts, set(fingerprints))
+
+    basic_ids, tile_files = {}, {}
+    for path in glob.glob(os.path.join(args.tiledir, 'tile_*.tile')):
+        parts = os.path.splitext(os.path.basename(path))[0].split('_')
+        basic_ids[parts[1]], tile_files[parts[1]] = parts[2], path
+    manifest.update(fingerprints, pending['drop_rids'], counts, basic_ids)
+    manifest.save()
+
+    rebuilt = sorted(set(pending['dirty_tiles']) | set(counts['tile_id'].astype(str)), key=int)
+    write_list([tile_files[t] for t in rebuilt if t in tile_files], os.path.join(args.build_dir, 'rebuilt_tiles.txt')) # empty tiles were removed in B3
+    basic_tiles = sorted(manifest.basic_tiles_of(rebuilt) | set(pending['dirty_basic_tiles']), key=int)
+    with open(os.path.join(args.build_dir, 'basic_tiles.txt'), 'w') as f:
+        f.write(' '.join(basic_tiles) + '\n') # row-style list (like BASIC_TILE_TABLE)
+    if args.tilecounts_out is not None:
+        manifest.tile_counts().to_csv(args.tilecounts_out, sep=' ', header=False)
+    os.remove(os.path.join(args.build_dir, PENDING_FILE))
+    print(f'INFO:\t{len(fingerprints)} datasets tiled\t{len(pending["drop_rids"])} datasets replaced or removed\t'
+          f'{len(rebuilt)} tiles rebuilt\t{len(basic_tiles)} basic tiles affected\t{len(manifest.tiles)} tiles in manifest')
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    os.makedirs(args.build_dir, exist_ok=True)
+    if args.action == 'plan':
+        if args.xyz_dir is None:
+            parser.error('plan requires --xyz-dir')
+        plan(args)
+    else:
+        if args.tilecounts is None or args.tiledir is None:
+            parser.error('commit requires --tilecounts and --tiledir')
+        if not os.path.isfile(os.path.join(args.build_dir, PENDING_FILE)):
+            print(f'ERROR:\tNo planned build found in {args.build_dir} (run "plan" first)')
+            sys.exit(1)
+        commit(args)
+    sys.exit(0)
@@ -0,0 +1,37 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Deduplicate rows
+#   Remove duplicate rows from harmonised xyz files (A4) or blockmedian files (C2)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import sys
+import time
+import argparse
+
+from lib.dedup import deduplicate, MEMORY
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Remove duplicate rows from text file (replacement for "sort -u").')
+    parser.add_argument('input_file', type=str, help='Input file (e.g. *.mxyz, *.bm, *.stats)')
+    parser.add_argument('output_file', type=str, help='Output file without duplicates')
+    parser.add_argument('--mode', '-m', type=str, default='xyz', choices=['xyz', 'line'],
+                        help='Key of rows: "xyz" (integer triplets, harmonised data) or "line" (complete text line) (default="xyz")')
+    parser.add_argument('--keep-order', '-k', action='store_true',
+                        help='Keep first occurrence of rows in original order (default: sorted by key)')
+    parser.add_argument('--memory', type=int, default=MEMORY,
+                        help=f'Memory limit (MB). Larger files are partitioned on disk (default={MEMORY})')
+    parser.add_argument('--tmp-dir', type=str, default=None, help='Directory for partitions (default: directory of output file)')
+    return parser
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    cnt_rows, cnt_unique, n_partitions = deduplicate(args.input_file, args.output_file, args.mode, args.keep_order,
+                                                     args.memory, args.tmp_dir)
+    print(f'INFO:\t{args.input_file}\t{cnt_rows} rows\t{cnt_unique} unique rows\t{cnt_rows - cnt_unique} duplicates removed'
+          f'\t{n_partitions} partition(s)\t{time.perf_counter() - start_time:.2f} sec')
+    sys.exit(0)
@@ -0,0 +1,77 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Blockmedian statistics
+#   Extents and RID statistics of blockmedian files (*.bm) collected in one table
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import os
+import glob
+
+import numpy as np
+import pandas as pd
+
+# columns of blockmedian statistics table (one row per blockmedian file)
+BM_STATS_COLUMNS = ['ID', 'btile', 'type', 'bm_windows', 'xmin', 'xmax', 'ymin', 'ymax', 'zmin', 'zmax',
+                    'no_cruises', 'cruises', 'cruise_counts', 'creationtime', 'filesize']
+
+
+def parse_bm_filename(path:str)->tuple:
+    """Return tile ID, basic tile and type from blockmedian filename (tile_<ID>_<basicTile>_<type>.bm)."""
+    parts = os.path.splitext(os.path.basename(path))[0].split('_')
+    return parts[1], parts[2], parts[3]
+
+def format_value(value)->str:
+    """Format number like GMT output (integer values without decimals)."""
+    return f'{value:.12g}'
+
+def bm_statistics(path:str)->dict:
+    """
+    Read blockmedian file (x y z w sid) once and compute statistics.
+
+    Returns
+    ----------
+    stats : dict
+        Extents, number of blockmedian windows, unique RIDs (';'-separated) and
+        number of blockmedian windows per RID (same order) or None for empty files
+    """
+    tileID, basicTile, fileType = parse_bm_filename(path)
+    try:
+        data = pd.read_csv(path, sep='\t', header=None, usecols=[0, 1, 2, 4], names=['x', 'y', 'z', 'sid'],
+                           dtype={'x':np.float64, 'y':np.float64, 'z':np.float64, 'sid':np.float64}, engine='c')
+    except pd.errors.EmptyDataError:
+        return None
+    if len(data) == 0:
+        return None
+    mins = data[['x', 'y', 'z']].min().to_numpy()
+    maxs = data[['x', 'y', 'z']].max().to_numpy()
+    rids, counts = np.unique(data['sid'].dropna().to_numpy(), return_counts=True)
+
+    stats = dict(ID=tileID, btile=basicTile, type=fileType, bm_windows=len(data))
+    for i, col in enumerate('xyz'):
+        stats[f'{col}min'] = format_value(mins[i])
+        stats[f'{col}max'] = format_value(maxs[i])
+    stats['no_cruises'] = len(rids)
+    stats['cruises'] = ';'.join(map(format_value, rids))
+    stats['cruise_counts'] = ';'.join(map(str, counts))
+    stats['creationtime'] = os.path.getmtime(path)
+    stats['filesize'] = os.path.getsize(path) / 1024 / 1024
+    return stats
+
+def write_table(rows:list, path:str):
+    """Write statistics table (tab-separated with header)."""
+    pd.DataFrame(rows, columns=BM_STATS_COLUMNS).to_csv(path, sep='\t', index=False)
+
+def read_table(path:str)->pd.DataFrame:
+    """Read statistics table (IDs and RIDs as text)."""
+    return pd.read_csv(path, sep='\t', dtype={'ID':str, 'btile':str, 'type':str, 'cruises':str, 'cruise_counts':str,
+                                              'xmin':str, 'xmax':str, 'ymin':str, 'ymax':str, 'zmin':str, 'zmax':str},
+                       keep_default_na=False)
+
+def merge_tables(pattern:str, path:str)->int:
+    """Merge statistics tables matching pattern into single table. Returns number of rows."""
+    tables = [read_table(f) for f in sorted(glob.glob(pattern)) if os.path.abspath(f) != os.path.abspath(path)]
+    table = pd.concat(tables, ignore_index=True) if len(tables) > 0 else pd.DataFrame(columns=BM_STATS_COLUMNS)
+    table.to_csv(path, sep='\t', index=False)
+    return len(table)
@@ -0,0 +1,192 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Build manifest
+#   Persistent state of tiled datasets (RIDs) for incremental builds
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+The build manifest (JSON) stores for each dataset (RID) the content hash of its XYZ file(s) and the
+number of points per tile, and for each tile its basic tile and the hashes of the featured RIDs:
+
+    {"version": 1,
+     "rids":  {"741": {"hash": "...", "files": {"741_w20.xyz": {"size": 123, "mtime": 1.6e9, "hash": "..."}},
+                       "tiles": {"1234": 5678}}},
+     "tiles": {"1234": {"basic": "12", "inputs": {"741": "..."}}}}
+
+An incremental build consists of two steps:
+    1. plan (B1):   hash XYZ files (cached by size and modification time) and compare them with the manifest.
+                    Changed or new RIDs are re-tiled. Records of changed and removed RIDs are dropped from
+                    the existing tiles ("dirty" tiles).
+    2. commit (B4): replace the entries of changed and removed RIDs using the tile counts of the new
+                    tile fragments and write the tiles and basic tiles to process in stage C.
+"""
+
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+MANIFEST_VERSION = 1
+HASH_CHUNK = 2**24 # bytes read at once when hashing files
+PENDING_FILE = 'pending.json' # state of planned build (written by plan, read by commit)
+
+
+def get_rid(path:str)->str:
+    """Get RID from standard XYZ filename (rid_wweight.xyz)."""
+    return os.path.basename(path).split('_')[0]
+
+def file_hash(path:str)->str:
+    """Content hash of file (BLAKE2b, 128 bit)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def read_list(path:str)->list:
+    """Read list (one entry per line)."""
+    if not os.path.isfile(path):
+        return []
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip() != '']
+
+def write_list(entries, path:str):
+    """Write list (one entry per line)."""
+    with open(path, 'w') as f:
+        f.write(''.join(f'{e}\n' for e in entries))
+
+def read_tilecounts(dir_files:str, rids:set=None)->pd.DataFrame:
+    """
+    Read '*.tilecounts' files of B2 (number of points per tile and split, RID from filename).
+
+    Returns
+    ----------
+    counts : pandas.DataFrame
+        Number of points per RID and tile (columns "rid", "tile_id", "count")
+    """
+    frames = []
+    for name in os.listdir(dir_files) if os.path.isdir(dir_files) else []:
+        if not name.endswith('.tilecounts'):
+            continue
+        rid = get_rid(name)
+        if rids is not None and rid not in rids:
+            continue
+        df = pd.read_csv(os.path.join(dir_files, name), sep=' ', header=None, names=['tile_id', 'count'], dtype={'tile_id':str, 'count':int})
+        df['rid'] = rid
+        frames.append(df)
+    if len(frames) == 0:
+        return pd.DataFrame(columns=['rid', 'tile_id', 'count'])
+    return pd.concat(frames, ignore_index=True).groupby(['rid', 'tile_id'], as_index=False)['count'].sum()
+
+class BuildManifest():
+    """Persistent build manifest (RID: content hash and tiles, tile: basic tile and input RID hashes)."""
+    def __init__(self, path:str):
+        self.path = path
+        self.rids, self.tiles = {}, {}
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                raise ValueError(f'Unsupported version of build manifest "{path}"')
+            self.rids, self.tiles = data['rids'], data['tiles']
+
+    def save(self):
+        """Write manifest (atomic replace of existing file)."""
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(dict(version=MANIFEST_VERSION, rids=self.rids, tiles=self.tiles), f, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def fingerprint(self, files:list, flags:dict=None)->dict:
+        """
+        Hash XYZ files per RID. Hashes of files with unchanged size and modification time are taken from the manifest.
+        Flags (e.g. usage restriction from metadata) are part of the RID hash.
+
+        Returns
+        ----------
+        fingerprints : dict
+            Dictionary with RID as key and dict of "hash" and "files" as item
+        """
+        fingerprints = {}
+        for path in sorted(files):
+            rid, name = get_rid(path), os.path.basename(path)
+            stat = os.stat(path)
+            cached = self.rids.get(rid, {}).get('files', {}).get(name)
+            if cached is not None and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+                digest = cached['hash']
+            else:
+                digest = file_hash(path)
+            entry = fingerprints.setdefault(rid, dict(files={}))
+            entry['files'][name] = dict(size=stat.st_size, mtime=stat.st_mtime, hash=digest, path=path)
+        for rid, entry in fingerprints.items():
+            h = hashlib.blake2b(digest_size=16)
+            for name, info in sorted(entry['files'].items()): # filename contains weight
+                h.update(f'{name}:{info["hash"]};'.encode())
+            if flags is not None:
+                h.update(f'flag:{flags.get(rid, "")}'.encode())
+            entry['hash'] = h.hexdigest()
+        return fingerprints
+
+    def diff(self, fingerprints:dict)->tuple:
+        """Return sorted lists of changed (new or different hash) and removed RIDs."""
+        changed = sorted(rid for rid, entry in fingerprints.items() if self.rids.get(rid, {}).get('hash') != entry['hash'])
+        removed = sorted(set(self.rids) - set(fingerprints))
+        return changed, removed
+
+    def tiles_of(self, rids)->set:
+        """Tiles featuring any of the RIDs (according to manifest)."""
+        return {tile for rid in rids for tile in self.rids.get(rid, {}).get('tiles', {})}
+
+    def basic_tiles_of(self, tiles)->set:
+        """Basic tiles of tiles (according to manifest)."""
+        return {self.tiles[t]['basic'] for t in tiles if t in self.tiles and self.tiles[t].get('basic') is not None}
+
+    def update(self, fingerprints:dict, drop_rids:list, counts:pd.DataFrame, basic_ids:dict):
+        """
+        Replace entries of dropped (changed or removed) RIDs by new entries.
+
+        Parameters
+        ----------
+        fingerprints : dict
+            Fingerprints of changed RIDs (see fingerprint)
+        drop_rids : list
+            Changed and removed RIDs
+        counts : pandas.DataFrame
+            Number of points per RID and tile of new tile fragments (see read_tilecounts)
+        basic_ids : dict
+            Basic tile per tile ID
+        """
+        for rid in drop_rids:
+            for tile in self.rids.pop(rid, {}).get('tiles', {}):
+                inputs = self.tiles.get(tile, {}).get('inputs', {})
+                inputs.pop(rid, None)
+                if len(inputs) == 0:
+                    self.tiles.pop(tile, None)
+        groups = dict(list(counts.groupby('rid')))
+        for rid in fingerprints:
+            group = groups.get(rid)
+            files = {name: {k: v for k, v in info.items() if k != 'path'} for name, info in fingerprints[rid]['files'].items()}
+            # RIDs without points in any tile are kept (with empty tiles) to avoid re-tiling them every build
+            tiles = {} if group is None else {str(t): int(c) for t, c in zip(group['tile_id'], group['count'])}
+            self.rids[rid] = dict(hash=fingerprints[rid]['hash'], files=files, tiles=tiles)
+            for tile in tiles:
+                entry = self.tiles.setdefault(tile, dict(basic=None, inputs={}))
+                entry['inputs'][rid] = fingerprints[rid]['hash']
+        for tile, entry in self.tiles.items():
+            if basic_ids.get(tile) is not None:
+                entry['basic'] = basic_ids[tile]
+
+    def tile_counts(self)->pd.Series:
+        """Total number of points per tile ID (sorted by tile ID)."""
+        counts = {}
+        for entry in self.rids.values():
+            for tile, count in entry['tiles'].items():
+                counts[int(tile)] = counts.get(int(tile), 0) + count
+        return pd.Series(counts, name='count', dtype=int).sort_index()
+
+    def featured_cruises(self)->dict:
+        """Dictionary with "tile ID" as key and string of all featured RIDs (e.g. '11102;12578;11001') as item."""
+        return {int(tile): ';'.join(sorted(entry['inputs'])) for tile, entry in self.tiles.items()}
@@ -0,0 +1,231 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Deduplication
+#   Remove duplicate rows from (large) text files
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+Replacement for "sort -u" on harmonised xyz files (A4) and blockmedian files (C2).
+
+Two key modes are supported:
+    - "xyz":  rows are integer triplets "x y z" (harmonised data). Rows are packed into a single
+              int64 key (or compared column-wise if the value range is too large) and written
+              in harmonised format ("x y z").
+    - "line": rows are arbitrary text lines (e.g. *.bm, *.stats) compared byte-wise and written unchanged.
+
+Files larger than the memory limit are split into hash partitions on disk (duplicates always
+end up in the same partition), which are deduplicated one after another.
+Without "keep_order" the output is sorted by key (numerically for "xyz", like "LC_ALL=C sort -u" for "line")
+within each partition. With "keep_order" the first occurrence of each row is kept in the original order.
+"""
+
+import os
+import math
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .tile_writer import TileWriter
+
+MEMORY = 4096 # memory limit (MB)
+MEMORY_FACTOR = 4 # approx. memory usage per byte of input file
+CHUNK_ROWS = 2**22 # number of rows read at once
+HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.uint64) # spatial hash of xyz rows
+
+
+def read_rows(path:str, mode:str='xyz', chunk_rows:int=CHUNK_ROWS):
+    """
+    Iterate over chunks of rows of input file.
+    Yields int64 arrays (n, 3) for mode "xyz" and object arrays of lines (bytes without newline) for mode "line".
+    Empty files yield nothing.
+    """
+    if mode == 'xyz':
+        try:
+            reader = pd.read_csv(path, delim_whitespace=True, header=None, usecols=[0,1,2], dtype=np.int64,
+                                 engine='c', chunksize=chunk_rows)
+        except pd.errors.EmptyDataError: # empty file (or blank lines only)
+            return
+        for chunk in reader:
+            yield chunk.to_numpy()
+    else:
+        with open(path, 'rb') as f:
+            while True:
+                lines = f.readlines(chunk_rows * 32)
+                if len(lines) == 0:
+                    break
+                yield np.array([l[:-1] if l.endswith(b'\n') else l for l in lines], dtype=object)
+
+def format_rows(rows, mode:str='xyz')->bytes:
+    """Format rows as text (harmonised format "x y z" for mode "xyz")."""
+    if len(rows) == 0:
+        return b''
+    if mode == 'xyz':
+        return ''.join(map('{} {} {}\n'.format, *rows.T.tolist())).encode()
+    return b'\n'.join(rows) + b'\n'
+
+def pack_xyz(xyz:np.ndarray):
+    """
+    Pack integer triplets into single int64 keys (sorted like x, y, z).
+    Returns None if the value range of the columns exceeds 63 bits.
+    """
+    if len(xyz) == 0:
+        return np.empty(0, dtype=np.int64)
+    mins = xyz.min(axis=0)
+    spans = xyz.max(axis=0).astype(object) - mins.astype(object) # python integers (no overflow)
+    bits = [int(s).bit_length() for s in spans]
+    if sum(bits) > 63:
+        return None
+    shifted = (xyz - mins).astype(np.int64)
+    return (shifted[:, 0] << (bits[1] + bits[2])) | (shifted[:, 1] << bits[2]) | shifted[:, 2]
+
+def unique_index(rows, mode:str='xyz', keep_order:bool=False)->np.ndarray:
+    """
+    Return indices of unique rows (first occurrence).
+
+    Parameters
+    ----------
+    rows : numpy.ndarray
+        int64 array (n, 3) for mode "xyz" or object array of lines for mode "line"
+    mode : str
+        Key mode ("xyz" or "line")
+    keep_order : bool
+        Return indices in original order (hash-based) instead of sorted by key
+
+    Returns
+    ----------
+    index : numpy.ndarray
+        Indices of unique rows
+    """
+    if len(rows) == 0:
+        return np.empty(0, dtype=np.int64)
+    if mode == 'xyz':
+        keys = pack_xyz(rows)
+        if keys is None:
+            # value range too large for packed keys: sort column-wise
+            order = np.lexsort((rows[:, 2], rows[:, 1], rows[:, 0]))
+            sorted_rows = rows[order]
+            first = np.r_[True, (sorted_rows[1:] != sorted_rows[:-1]).any(axis=1)]
+            index = order[first]
+            return np.sort(index) if keep_order else index
+    else:
+        keys = rows
+    if keep_order:
+        return np.flatnonzero(~pd.Series(keys).duplicated(keep='first').to_numpy())
+    if mode == 'line':
+        keys = keys.astype(bytes) # fixed-width bytes are sorted byte-wise (like "LC_ALL=C sort")
+    return np.unique(keys, return_index=True)[1]
+
+def partition_ids(rows, mode:str, n_partitions:int)->np.ndarray:
+    """Assign rows to hash partitions (identical rows are always in the same partition)."""
+    if mode == 'xyz':
+        hashes = np.bitwise_xor.reduce(rows.astype(np.uint64) * HASH_PRIMES, axis=1)
+    else:
+        hashes = np.fromiter(map(hash, rows), dtype=np.int64, count=len(rows)).view(np.uint64)
+    return (hashes % np.uint64(n_partitions)).astype(np.int64)
+
+def get_n_partitions(path:str, memory:int=MEMORY)->int:
+    """Number of partitions required to deduplicate file within memory limit (MB)."""
+    return max(1, math.ceil(os.path.getsize(path) * MEMORY_FACTOR / (memory * 2**20)))
+
+def _read_partition(path:str, mode:str):
+    """Read spilled rows and original row indices of partition."""
+    index = np.fromfile(f'{path}.idx', dtype=np.int64) if os.path.exists(f'{path}.idx') else np.empty(0, dtype=np.int64)
+    if not os.path.exists(path):
+        rows = np.empty((0, 3), dtype=np.int64) if mode == 'xyz' else np.empty(0, dtype=object)
+    elif mode == 'xyz':
+        rows = np.fromfile(path, dtype=np.int64).reshape(-1, 3)
+    else:
+        with open(path, 'rb') as f:
+            rows = np.array(f.read().split(b'\n')[:-1], dtype=object)
+    return rows, index
+
+def deduplicate(input_file:str, output_file:str, mode:str='xyz', keep_order:bool=False,
+                memory:int=MEMORY, tmp_dir:str=None, chunk_rows:int=CHUNK_ROWS)->tuple:
+    """
+    Remove duplicate rows of input file.
+
+    Parameters
+    ----------
+    input_file : str
+        Input text file
+    output_file : str
+        Output text file
+    mode : str
+        Key mode: "xyz" (integer triplets) or "line" (complete text lines)
+    keep_order : bool
+        Keep first occurrence of each row in original order
+    memory : int
+        Memory limit (MB) used to determine number of partitions spilled to disk
+    tmp_dir : str
+        Directory for partitions (default: directory of output file)
+
+    Returns
+    ----------
+    cnt_rows, cnt_unique, n_partitions : int
+        Number of input rows, unique rows and partitions
+    """
+    n_partitions = get_n_partitions(input_file, memory)
+
+    if n_partitions == 1:
+        chunks = list(read_rows(input_file, mode, chunk_rows))
+        if len(chunks) == 0:
+            open(output_file, 'wb').close()
+            return 0, 0, 1
+        rows = np.concatenate(chunks)
+        index = unique_index(rows, mode, keep_order)
+        with open(output_file, 'wb') as fout:
+            for start in range(0, len(index), chunk_rows):
+                fout.write(format_rows(rows[index[start:start + chunk_rows]], mode))
+        return len(rows), len(index), 1
+
+    tmp_dir = tmp_dir if tmp_dir is not None else (os.path.dirname(os.path.abspath(output_file)))
+    part_dir = tempfile.mkdtemp(prefix='dedup_', dir=tmp_dir)
+    try:
+        # pass 1: spill rows (and original row index) to hash partitions
+        cnt_rows = 0
+        with TileWriter(binary=True) as writer:
+            for rows in read_rows(input_file, mode, chunk_rows):
+                part = partition_ids(rows, mode, n_partitions)
+                order = np.argsort(part, kind='stable')
+                bounds = np.searchsorted(part[order], np.arange(n_partitions + 1))
+                for p in np.flatnonzero(np.diff(bounds)):
+                    selected = order[bounds[p]:bounds[p + 1]]
+                    path = os.path.join(part_dir, f'part_{p:04d}')
+                    if mode == 'xyz':
+                        writer.write(path, rows[selected].astype(np.int64).tobytes())
+                    else:
+                        writer.write(path, format_rows(rows[selected], mode))
+                    if keep_order:
+                        writer.write(f'{path}.idx', (selected + cnt_rows).astype(np.int64).tobytes())
+                cnt_rows += len(rows)
+
+        # pass 2: deduplicate partitions
+        cnt_unique = 0
+        keep = np.zeros(cnt_rows, dtype=bool) if keep_order else None
+        with open(output_file, 'wb') as fout:
+            for p in range(n_partitions):
+                path = os.path.join(part_dir, f'part_{p:04d}')
+                rows, index = _read_partition(path, mode)
+                unique = unique_index(rows, mode, keep_order)
+                cnt_unique += len(unique)
+                if keep_order:
+                    keep[index[unique]] = True
+                else:
+                    fout.write(format_rows(rows[unique], mode))
+                for suffix in ['', '.idx']:
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+
+            # pass 3: write first occurrences in original order
+            if keep_order:
+                start = 0
+                for rows in read_rows(input_file, mode, chunk_rows):
+                    fout.write(format_rows(rows[keep[start:start + len(rows)]], mode))
+                    start += len(rows)
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+    return cnt_rows, cnt_unique, n_partitions
@@ -0,0 +1,172 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Job planner
+#   Pack files into balanced manifests (one per SLURM array task) using a runtime model
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+The runtime of an array task is modelled as
+
+    runtime = overhead + rate * size
+
+with the input size in bytes. Overhead and rate are fitted (least squares) to the CSVLINE
+records of previous runs of a stage ("CSVLINE job_name array_job_id task_id task_count evoker
+partition size_bytes start_ms end_ms"). Without sufficient records default values are used.
+If the number of points per file is available (e.g. WORK_TILE_COUNTS for tiles), the size of a file
+is replaced by its number of points times the median number of bytes per point, so that the
+work of ASCII and binary files is comparable.
+
+Files are packed into tasks by "longest processing time first": files sorted by decreasing cost
+are assigned to the task with the lowest total cost. Each task pays the overhead once.
+The number of tasks follows from the target runtime per task.
+"""
+
+import os
+import re
+import glob
+import math
+import heapq
+
+import numpy as np
+import pandas as pd
+
+CSVLINE_COLUMNS = ['job_name', 'array_job_id', 'task_id', 'task_count', 'evoker', 'partition', 'size', 'start', 'end']
+LOG_SUFFIXES = ['slurmlog', 'incominglog'] # log files of array tasks
+DEFAULT_OVERHEAD = 60 # runtime per task (s) without input data (job start, module loading, copying)
+DEFAULT_RATE = 1 / 20e6 # runtime (s) per byte of input data
+MEMORY_BASE = 1024 # memory (MB) per task without input data
+MEMORY_FACTOR = 4 # memory (MB) per MB of largest input file of task
+
+
+def read_csvlines(logdir:str, stage:str)->pd.DataFrame:
+    """
+    Read CSVLINE records of stage from log files (searched recursively in logdir).
+
+    Returns
+    ----------
+    records : pandas.DataFrame
+        Records with valid size and runtime (column "runtime" in seconds)
+    """
+    records = []
+    for suffix in LOG_SUFFIXES:
+        for path in glob.glob(os.path.join(logdir, '**', f'{stage}*.{suffix}'), recursive=True):
+            with open(path, 'r', errors='replace') as f:
+                for line in f:
+                    if line.startswith('CSVLINE'):
+                        fields = line.rstrip('\n').split('\t')[1:]
+                        if len(fields) == len(CSVLINE_COLUMNS):
+                            records.append(fields)
+    records = pd.DataFrame(records, columns=CSVLINE_COLUMNS)
+    for col in ['size', 'start', 'end']:
+        records[col] = pd.to_numeric(records[col], errors='coerce')
+    records['runtime'] = (records['end'] - records['start']) / 1000
+    return records[(records['size'] > 0) & (records['runtime'] > 0)].reset_index(drop=True)
+
+class CostModel():
+    """Linear runtime model of array tasks (overhead per task and rate per byte)."""
+    def __init__(self, overhead:float=DEFAULT_OVERHEAD, rate:float=DEFAULT_RATE, n_samples:int=0):
+        self.overhead = overhead
+        self.rate = rate
+        self.n_samples = n_samples
+
+    def runtime(self, size):
+        """Predicted runtime (s) of task with given input size (bytes)."""
+        return self.overhead + self.rate * np.asarray(size, dtype=np.float64)
+
+    def __repr__(self):
+        return f'CostModel(overhead={self.overhead:.1f} s, rate={self.rate * 1e6:.4f} s/MB, samples={self.n_samples})'
+
+def fit_cost_model(records:pd.DataFrame, overhead:float=DEFAULT_OVERHEAD, rate:float=DEFAULT_RATE)->CostModel:
+    """
+    Fit runtime model to CSVLINE records (least squares).
+    Falls back to rate through the default overhead if the fit is not physical (negative values)
+    and to the defaults if there are no records.
+    """
+    if len(records) == 0:
+        return CostModel(overhead, rate, 0)
+    size = records['size'].to_numpy(dtype=np.float64)
+    runtime = records['runtime'].to_numpy(dtype=np.float64)
+    if len(records) >= 2 and np.ptp(size) > 0:
+        fit_rate, fit_overhead = np.polyfit(size, runtime, 1)
+        if fit_rate > 0 and fit_overhead >= 0:
+            return CostModel(fit_overhead, fit_rate, len(records))
+    fit_rate = np.sum(np.clip(runtime - overhead, 0, None)) / np.sum(size)
+    return CostModel(overhead, fit_rate if fit_rate > 0 else rate, len(records))
+
+def read_point_counts(counts_file:str)->dict:
+    """Read number of points per tile ID ("tile_id count" per line, written by B4_update_metadata.py)."""
+    counts = pd.read_csv(counts_file, sep=' ', header=None, names=['tile', 'count'], dtype={'tile':str, 'count':np.int64})
+    return dict(zip(counts['tile'], counts['count']))
+
+def get_unit_sizes(files:list, counts:dict=None)->np.ndarray:
+    """
+    Size of work units (bytes). With point counts (tile ID parsed from "tile_<ID>_..."),
+    sizes are number of points times median number of bytes per point.
+    """
+    sizes = np.array([os.path.getsize(f) for f in files], dtype=np.float64)
+    if not counts:
+        return sizes
+    ids = [re.match(r'tile_([^_.]+)', os.path.basename(f)) for f in files]
+    points = np.array([counts.get(m.group(1), np.nan) if m else np.nan for m in ids], dtype=np.float64)
+    valid = (points > 0) & (sizes > 0)
+    if not valid.any():
+        return sizes
+    bytes_per_point = np.median(sizes[valid] / points[valid])
+    return np.where(valid, points * bytes_per_point, sizes)
+
+def get_n_tasks(sizes:np.ndarray, model:CostModel, target_time:float, max_tasks:int)->int:
+    """Number of tasks so that each task runs about target_time seconds (bounded by number of files and max_tasks)."""
+    if len(sizes) == 0:
+        return 0
+    # overhead per file is not paid again within a task, only the data dependent part
+    total = model.rate * sizes.sum()
+    n_tasks = math.ceil(total / max(target_time - model.overhead, 1))
+    return int(min(max(n_tasks, 1), len(sizes), max_tasks))
+
+def pack_units(costs:np.ndarray, n_tasks:int)->list:
+    """
+    Pack work units into n_tasks bins (longest processing time first).
+
+    Returns
+    ----------
+    bins : list
+        List of indices of units per task (sorted by decreasing total cost)
+    """
+    bins = [[] for _ in range(n_tasks)]
+    heap = [(0.0, i) for i in range(n_tasks)]
+    for idx in np.argsort(-np.asarray(costs), kind='stable'):
+        load, b = heapq.heappop(heap)
+        bins[b].append(int(idx))
+        heapq.heappush(heap, (load + costs[idx], b))
+    loads = [sum(costs[i] for i in b) for b in bins]
+    return [bins[b] for b in np.argsort(loads)[::-1] if len(bins[b]) > 0]
+
+def plan_jobs(files:list, manifest_dir:str, prefix:str, model:CostModel, target_time:float,
+              max_tasks:int, counts:dict=None, memory_factor:float=MEMORY_FACTOR)->pd.DataFrame:
+    """
+    Pack files into balanced manifests ("<prefix>_<task>.manifest", one path per line).
+    Existing manifests with the same prefix are removed.
+
+    Returns
+    ----------
+    plan : pandas.DataFrame
+        Manifest, number of files, size (bytes), predicted runtime (s) and memory (MB) per task
+    """
+    for path in glob.glob(os.path.join(manifest_dir, f'{prefix}_*.manifest')):
+        os.remove(path)
+    sizes = get_unit_sizes(files, counts)
+    n_tasks = get_n_tasks(sizes, model, target_time, max_tasks)
+    bins = pack_units(model.rate * sizes, n_tasks) if n_tasks > 0 else []
+
+    plan = []
+    for task, units in enumerate(bins):
+        manifest = os.path.join(manifest_dir, f'{prefix}_{task:04d}.manifest')
+        with open(manifest, 'w') as f:
+            f.write(''.join(f'{files[i]}\n' for i in units))
+        task_sizes = sizes[units]
+        plan.append(dict(manifest=os.path.basename(manifest), files=len(units), size=int(task_sizes.sum()),
+                         runtime=round(float(model.runtime(task_sizes.sum())), 1),
+                         memory=int(MEMORY_BASE + memory_factor * task_sizes.max() / 2**20)))
+    return pd.DataFrame(plan, columns=['manifest', 'files', 'size', 'runtime', 'memory'])
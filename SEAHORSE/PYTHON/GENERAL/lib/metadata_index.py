@@ -0,0 +1,120 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Metadata index
+#   Indexed copy (SQLite) of the metadata tables downloaded from MySQL
+#
+#   (C) 2020 Sacha Viquerat, Fynn Warnke, Alfred Wegener Institute Bremerhaven, Germany
+#   sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+Build and query a read-only SQLite sidecar of the tab-separated metadata dumps
+(metadata, metadata_working, RID codes). The index is built once during SYNC_DATA
+and allows lookups by dataset name (case-insensitive) or RID without parsing the
+full tables in every array task.
+"""
+
+import os
+import csv
+import sqlite3
+from pathlib import Path
+
+SQLITE_HEADER = b'SQLite format 3\x00'
+MMAP_SIZE = 2**28 # bytes of the index file that are memory-mapped by SQLite
+NAME_KEY = '_name_key' # dataset_name (lower case)
+RID_KEY = '_rid_key' # dataset_rid
+LINES_SUFFIX = '_lines' # table of raw lines (without header) per metadata table
+
+def is_metadata_index(path:str)->bool:
+    """Check if given file is a SQLite metadata index (instead of a tab-separated table)."""
+    with open(path, 'rb') as f:
+        return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+def build_metadata_index(index_file:str, tables:dict)->None:
+    """
+    Create SQLite index from tab-separated metadata tables (SQL dumps).
+    All values are stored as read by csv.DictReader (text). The raw lines of each table
+    are stored in a separate table for consumers splitting lines themselves (see C3).
+
+    Parameters
+    ----------
+    index_file : str
+        Output path of the index file (replaced atomically)
+    tables : dict
+        Table names (keys) and paths of the corresponding tab-separated files (values)
+    """
+    tmp_file = f'{index_file}.tmp'
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+    connection = sqlite3.connect(tmp_file)
+    for table, path in tables.items():
+        with open(path, 'r', newline='') as f:
+            reader = csv.DictReader(f, delimiter='\t')
+            columns = reader.fieldnames
+            column_defs = ', '.join(f'"{c}" TEXT' for c in columns)
+            connection.execute(f'CREATE TABLE "{table}" ({NAME_KEY} TEXT, {RID_KEY} TEXT, {column_defs});')
+
+            placeholders = ', '.join(['?'] * (len(columns) + 2))
+            rows = ((row['dataset_name'].lower() if row.get('dataset_name') is not None else None,
+                     row.get('dataset_rid'),
+                     *[row[c] for c in columns]) for row in reader)
+            connection.executemany(f'INSERT INTO "{table}" VALUES ({placeholders});', rows)
+        connection.execute(f'CREATE INDEX "{table}_name" ON "{table}" ({NAME_KEY});')
+        connection.execute(f'CREATE INDEX "{table}_rid" ON "{table}" ({RID_KEY});')
+
+        connection.execute(f'CREATE TABLE "{table}{LINES_SUFFIX}" (line TEXT);')
+        with open(path, 'r') as f:
+            next(f, None) # header
+            connection.executemany(f'INSERT INTO "{table}{LINES_SUFFIX}" VALUES (?);', ((line.rstrip('\n'),) for line in f))
+    connection.commit()
+    connection.close()
+    os.replace(tmp_file, index_file)
+
+class MetadataIndex():
+    """Read-only access to metadata index created by build_metadata_index()."""
+
+    def __init__(self, index_file:str):
+        uri = f'{Path(index_file).resolve().as_uri()}?mode=ro&immutable=1'
+        self.connection = sqlite3.connect(uri, uri=True)
+        self.connection.execute(f'PRAGMA mmap_size={MMAP_SIZE};')
+        self._columns = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def columns(self, table:str='metadata')->list:
+        """Column names of given table (as in tab-separated file)."""
+        if table not in self._columns:
+            info = self.connection.execute(f'PRAGMA table_info("{table}");').fetchall()
+            self._columns[table] = [c[1] for c in info if c[1] not in (NAME_KEY, RID_KEY)]
+        return self._columns[table]
+
+    def _select(self, table:str, where:str='', params:tuple=(), limit:str='')->list:
+        columns = self.columns(table)
+        selection = ', '.join(f'"{c}"' for c in columns)
+        query = f'SELECT {selection} FROM "{table}" {where} ORDER BY rowid {limit};'
+        return [dict(zip(columns, row)) for row in self.connection.execute(query, params)]
+
+    def by_name(self, dataset_name:str, table:str='metadata'):
+        """First row matching dataset name (case-insensitive) or None."""
+        rows = self._select(table, f'WHERE {NAME_KEY} = ?', (dataset_name.lower(),), 'LIMIT 1')
+        return rows[0] if len(rows) > 0 else None
+
+    def by_rid(self, rid, table:str='metadata'):
+        """First row matching RID or None."""
+        rows = self._select(table, f'WHERE {RID_KEY} = ?', (str(rid),), 'LIMIT 1')
+        return rows[0] if len(rows) > 0 else None
+
+    def rows(self, table:str='metadata')->list:
+        """All rows of given table (in order of the tab-separated file)."""
+        return self._select(table)
+
+    def lines(self, table:str='metadata')->list:
+        """Raw lines (without header and newline) of given table as in tab-separated file."""
+        return [row[0] for row in self.connection.execute(f'SELECT line FROM "{table}{LINES_SUFFIX}" ORDER BY rowid;')]
@@ -0,0 +1,70 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Tile format
+#   Binary records of tile files (*.til, *.tile)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+Binary tile files consist of fixed-width records of five little-endian int32 values
+(x, y, z, weight, rid) without header. Records of several files can be concatenated
+(e.g. using "cat") and read by GMT as native binary input using "-bi5i".
+"""
+
+import numpy as np
+
+TILE_RECORD = np.dtype([('x', '<i4'), ('y', '<i4'), ('z', '<i4'), ('weight', '<i4'), ('rid', '<i4')])
+GMT_BINARY_INPUT = '-bi5i' # GMT option to read binary tile files
+CHUNK_RECORDS = 2**22 # number of records read at once
+
+def to_records(x, y, z, weight, rid)->np.ndarray:
+    """
+    Create binary tile records from columns. Coordinates and depth are rounded
+    like in ASCII tile files ("%.0f").
+
+    Parameters
+    ----------
+    x, y, z : numpy.ndarray
+        Coordinates and depth
+    weight, rid : numpy.ndarray | int
+        Weight and RID (arrays or scalar values)
+
+    Returns
+    ----------
+    records : numpy.ndarray
+        Structured array of TILE_RECORD
+    """
+    records = np.empty(len(x), dtype=TILE_RECORD)
+    for name, values in zip(TILE_RECORD.names, [x, y, z, weight, rid]):
+        values = np.rint(np.asarray(values, dtype=np.float64))
+        if not np.isfinite(values).all() or np.abs(values).max(initial=0) > np.iinfo(np.int32).max:
+            raise ValueError(f'Column "{name}" contains values not representable as int32')
+        records[name] = values
+    return records
+
+def read_tile(path:str, chunk_records:int=CHUNK_RECORDS):
+    """Iterate over chunks of records (structured arrays of TILE_RECORD) of binary tile file."""
+    with open(path, 'rb') as f:
+        while True:
+            records = np.fromfile(f, dtype=TILE_RECORD, count=chunk_records)
+            if len(records) == 0:
+                break
+            yield records
+
+def select_weights(input_file:str, output_file:str, weights:list, chunk_records:int=CHUNK_RECORDS)->int:
+    """
+    Write records of binary tile file with given weights to output file.
+
+    Returns
+    ----------
+    cnt_selected : int
+        Number of selected records
+    """
+    cnt_selected = 0
+    with open(output_file, 'wb') as fout:
+        for records in read_tile(input_file, chunk_records):
+            selected = records[np.isin(records['weight'], weights)]
+            selected.tofile(fout)
+            cnt_selected += len(selected)
+    return cnt_selected
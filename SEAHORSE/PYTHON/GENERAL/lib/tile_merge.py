@@ -0,0 +1,219 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Tile merge
+#   Sort tile fragments (*.til) and merge sorted fragments into tiles (*.tile)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+Records of sorted tile fragments are ordered by (x, y, z, weight, rid). Sorted fragments are merged
+block-wise: in each step all records up to the smallest "last key" of the currently loaded blocks
+are taken from every fragment, merged (stable sort of already sorted runs) and written sequentially.
+Memory is limited to one block per fragment (block size derived from a memory budget and the number
+of fragments), identical records can be removed on the fly.
+Records are written unchanged (original text lines or binary records).
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from .tile_format import TILE_RECORD, read_tile
+
+CHUNK_ROWS = 2**20 # number of records read at once per fragment (maximum)
+MIN_CHUNK_ROWS = 2**12 # minimum number of records read at once per fragment
+MEMORY = 4096 # memory budget (MB) of merge (blocks of all fragments)
+BYTES_PER_ROW = {'ascii': 400, 'binary': 200} # approx. peak memory per buffered record (block of fragment and merged block)
+
+
+def read_tile_blocks(path:str, tile_format:str='ascii', chunk_rows:int=CHUNK_ROWS):
+    """
+    Iterate over blocks of tile file.
+    Yields int64 arrays (n, 5) of x, y, z, weight, rid and the corresponding records
+    (structured array for "binary", object array of text lines without newline for "ascii").
+    """
+    if tile_format == 'binary':
+        for records in read_tile(path, chunk_rows):
+            yield np.column_stack([records[n] for n in TILE_RECORD.names]).astype(np.int64), records
+        return
+    with open(path, 'rb') as f:
+        remainder = b''
+        while True:
+            block = f.read(chunk_rows * 32)
+            text = remainder + block
+            if not block:
+                remainder = b''
+                if text == b'':
+                    break
+                text += b'\n' # last line without trailing newline
+            else:
+                cut = text.rfind(b'\n') + 1
+                text, remainder = text[:cut], text[cut:]
+                if cut == 0:
+                    continue
+            lines = np.array(text.split(b'\n')[:-1], dtype=object)
+            rows = pd.read_csv(io.BytesIO(text), sep=' ', header=None, usecols=[0,1,2,3,4], dtype=np.int64,
+                               engine='c').to_numpy()
+            if len(rows) != len(lines):
+                raise ValueError(f'Tile file "{path}" contains empty lines')
+            yield rows, lines
+            if not block:
+                break
+
+def read_tile_rows(path:str, tile_format:str='ascii', chunk_rows:int=CHUNK_ROWS):
+    """Iterate over chunks of tile file as int64 arrays (n, 5) of x, y, z, weight, rid."""
+    for rows, _ in read_tile_blocks(path, tile_format, chunk_rows):
+        yield rows
+
+def format_records(records, tile_format:str='ascii')->bytes:
+    """Join records (binary records or text lines) to tile data."""
+    if len(records) == 0:
+        return b''
+    if tile_format == 'binary':
+        return records.tobytes()
+    return b'\n'.join(records) + b'\n'
+
+def row_keys(rows:np.ndarray)->np.ndarray:
+    """
+    Create sort keys of rows: big-endian unsigned representation of int32 values,
+    so that byte-wise order of keys equals the order of (x, y, z, weight, rid).
+    """
+    unsigned = (rows.astype(np.int64) + 2**31).astype('>u4')
+    return np.ascontiguousarray(unsigned).view(f'S{4 * rows.shape[1]}').ravel()
+
+def sort_tile_file(path:str, tile_format:str='ascii')->int:
+    """
+    Sort records of tile file in place by (x, y, z, weight, rid).
+
+    Returns
+    ----------
+    cnt_records : int
+        Number of records
+    """
+    blocks = list(read_tile_blocks(path, tile_format))
+    if len(blocks) == 0:
+        return 0
+    rows = np.concatenate([b[0] for b in blocks])
+    records = np.concatenate([b[1] for b in blocks])
+    order = np.lexsort(rows.T[::-1])
+    with open(path, 'wb') as f:
+        for start in range(0, len(order), CHUNK_ROWS):
+            f.write(format_records(records[order[start:start + CHUNK_ROWS]], tile_format))
+    return len(order)
+
+def filter_tile(input_file:str, output_file:str, tile_format:str='ascii', drop_rids=(),
+                chunk_rows:int=CHUNK_ROWS)->tuple:
+    """
+    Copy tile without records of given RIDs (order of records is kept, e.g. for incremental builds).
+
+    Returns
+    ----------
+    cnt_records, cnt_written : int
+        Number of input records and written records
+    """
+    drop = np.array(sorted(int(r) for r in drop_rids), dtype=np.int64)
+    cnt_records, cnt_written = 0, 0
+    with open(output_file, 'wb') as fout:
+        for rows, records in read_tile_blocks(input_file, tile_format, chunk_rows):
+            keep = ~np.isin(rows[:, 4], drop)
+            fout.write(format_records(records[keep], tile_format))
+            cnt_records += len(rows)
+            cnt_written += int(keep.sum())
+    return cnt_records, cnt_written
+
+def get_chunk_rows(n_fragments:int, tile_format:str='ascii', memory:int=MEMORY)->int:
+    """Number of records read at once per fragment, so that blocks of all fragments fit into memory budget (MB)."""
+    rows = memory * 2**20 // (max(n_fragments, 1) * BYTES_PER_ROW[tile_format])
+    return int(min(CHUNK_ROWS, max(MIN_CHUNK_ROWS, rows)))
+
+class FragmentReader():
+    """Block-wise reader of sorted tile fragment (current block and keys)."""
+    def __init__(self, path:str, tile_format:str='ascii', chunk_rows:int=CHUNK_ROWS):
+        self.path = path
+        self._blocks = read_tile_blocks(path, tile_format, chunk_rows)
+        self._last_key = None
+        self.records, self.keys = None, None
+        self.next_block()
+
+    def next_block(self)->bool:
+        """Load next block of fragment. Returns False if fragment is exhausted."""
+        for rows, records in self._blocks:
+            if len(rows) == 0:
+                continue
+            keys = row_keys(rows)
+            if (keys[1:] < keys[:-1]).any() or (self._last_key is not None and keys[0] < self._last_key):
+                raise ValueError(f'Tile fragment "{self.path}" is not sorted')
+            self._last_key = keys[-1]
+            self.records, self.keys = records, keys
+            return True
+        self.records, self.keys = None, None
+        return False
+
+    def take(self, bound)->tuple:
+        """Remove and return all records of current block with key <= bound (loads next block if block is empty)."""
+        n = np.searchsorted(self.keys, bound, side='right')
+        records, keys = self.records[:n], self.keys[:n]
+        self.records, self.keys = self.records[n:], self.keys[n:]
+        if len(self.keys) == 0:
+            self.next_block()
+        return records, keys
+
+    @property
+    def exhausted(self)->bool:
+        return self.keys is None
+
+def merge_tiles(input_files:list, output_file:str, tile_format:str='ascii', unique:bool=False,
+                chunk_rows:int=None, memory:int=MEMORY)->tuple:
+    """
+    Merge sorted tile fragments into single sorted tile file.
+
+    Parameters
+    ----------
+    input_files : list
+        Sorted tile fragments (*.til)
+    output_file : str
+        Output tile file (*.tile)
+    tile_format : str
+        Format of tile files ("ascii" or "binary")
+    unique : bool
+        Remove identical records
+    chunk_rows : int
+        Number of records read at once per fragment (default: derived from memory and number of fragments)
+    memory : int
+        Memory budget (MB) of all fragment blocks
+
+    Returns
+    ----------
+    cnt_records, cnt_written : int
+        Number of input records and written records
+    """
+    if chunk_rows is None:
+        chunk_rows = get_chunk_rows(len(input_files), tile_format, memory)
+    readers = [FragmentReader(path, tile_format, chunk_rows) for path in input_files]
+    readers = [r for r in readers if not r.exhausted]
+    cnt_records, cnt_written = 0, 0
+    last_key = None
+    with open(output_file, 'wb') as fout:
+        while len(readers) > 0:
+            # all records up to the smallest last key of current blocks can be merged safely
+            bound = min(r.keys[-1] for r in readers)
+            parts = [r.take(bound) for r in readers]
+            readers = [r for r in readers if not r.exhausted]
+
+            records = np.concatenate([p[0] for p in parts])
+            keys = np.concatenate([p[1] for p in parts])
+            if len(parts) > 1:
+                order = np.argsort(keys, kind='stable')
+                records, keys = records[order], keys[order]
+            cnt_records += len(records)
+            if unique:
+                mask = np.r_[True, keys[1:] != keys[:-1]]
+                if last_key is not None and keys[0] == last_key:
+                    mask[0] = False
+                records = records[mask]
+                last_key = keys[-1]
+            fout.write(format_records(records, tile_format))
+            cnt_written += len(records)
+    return cnt_records, cnt_written
@@ -0,0 +1,250 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Tile store
+#   Memory-mapped binary tiles sorted along Z-order curve with offset index (query by bbox, tile ID or RID)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+A tile store is a directory with one record file and one index per tile and a catalog of all tiles:
+
+    catalog.json                    store settings, extent, count and RIDs per tile
+    tile_<ID>_<basic>.tstore        records of TILE_RECORD (x y z weight rid, int32) sorted by block key
+    tile_<ID>_<basic>.tindex.npz    offsets of blocks and records per RID
+
+Records are sorted by the Morton key (Z-order curve) of the block (square cells of "block_size" meters,
+origin at minimum x and y of the tile) they fall in, so points close in space are close in the file.
+The block index stores the key and first record of each non-empty block, the RID index the record
+positions of each RID. Record files are opened as memory maps, queries only touch the blocks (or
+records) they need. Record files can be read by GMT using "-bi5i".
+"""
+
+import os
+import json
+
+import numpy as np
+
+from .tile_format import TILE_RECORD
+from .tile_merge import read_tile_rows
+
+STORE_VERSION = 1
+CATALOG_FILE = 'catalog.json'
+BLOCK_SIZE = 1000 # edge length (m) of index blocks
+
+
+def part1by1(values:np.ndarray)->np.ndarray:
+    """Spread lower 32 bits of values to even bit positions (uint64)."""
+    v = np.asarray(values, dtype=np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in [(16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)]:
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+def compact1by1(values:np.ndarray)->np.ndarray:
+    """Inverse of part1by1 (collect even bit positions)."""
+    v = np.asarray(values, dtype=np.uint64) & np.uint64(0x5555555555555555)
+    for shift, mask in [(1, 0x3333333333333333), (2, 0x0F0F0F0F0F0F0F0F), (4, 0x00FF00FF00FF00FF),
+                        (8, 0x0000FFFF0000FFFF), (16, 0x00000000FFFFFFFF)]:
+        v = (v | (v >> np.uint64(shift))) & np.uint64(mask)
+    return v
+
+def morton_key(ix:np.ndarray, iy:np.ndarray)->np.ndarray:
+    """Morton key (Z-order) of non-negative block indices."""
+    return part1by1(ix) | (part1by1(iy) << np.uint64(1))
+
+def morton_decode(keys:np.ndarray)->tuple:
+    """Block indices (ix, iy) of Morton keys."""
+    keys = np.asarray(keys, dtype=np.uint64)
+    return compact1by1(keys).astype(np.int64), compact1by1(keys >> np.uint64(1)).astype(np.int64)
+
+def read_tile_records(path:str, tile_format:str='ascii')->np.ndarray:
+    """Read complete tile file (ASCII or binary) into structured array of TILE_RECORD."""
+    chunks = list(read_tile_rows(path, tile_format))
+    rows = np.concatenate(chunks) if len(chunks) > 0 else np.empty((0, 5), dtype=np.int64)
+    records = np.empty(len(rows), dtype=TILE_RECORD)
+    for i, name in enumerate(TILE_RECORD.names):
+        records[name] = rows[:, i]
+    return records
+
+def parse_tile_name(path:str)->tuple:
+    """Tile ID and basic tile ID from tile filename ("tile_<ID>_<basic>.<ext>")."""
+    parts = os.path.basename(path).split('.')[0].split('_')
+    return parts[1], parts[2]
+
+class TileIndex():
+    """Block and RID index of single tile of store."""
+    def __init__(self, origin, block_size, block_keys, block_offsets, rid_values, rid_offsets, rid_order):
+        self.origin = np.asarray(origin, dtype=np.int64)
+        self.block_size = int(block_size)
+        self.block_keys = block_keys
+        self.block_offsets = block_offsets
+        self.rid_values = rid_values
+        self.rid_offsets = rid_offsets
+        self.rid_order = rid_order
+
+    @classmethod
+    def build(cls, records:np.ndarray, block_size:int=BLOCK_SIZE):
+        """Sort records by block key and create index. Returns index and sorted records."""
+        if len(records) == 0:
+            origin = np.zeros(2, dtype=np.int64)
+            keys = np.empty(0, dtype=np.uint64)
+        else:
+            origin = np.array([records['x'].min(), records['y'].min()], dtype=np.int64)
+            keys = morton_key((records['x'] - origin[0]) // block_size, (records['y'] - origin[1]) // block_size)
+        order = np.argsort(keys, kind='stable')
+        records, keys = records[order], keys[order]
+        block_keys, block_starts = np.unique(keys, return_index=True)
+        block_offsets = np.append(block_starts, len(records)).astype(np.int64)
+        # record positions grouped by RID (ascending positions within each RID)
+        rid_order = np.argsort(records['rid'], kind='stable').astype(np.int64)
+        rid_values, rid_starts = np.unique(records['rid'][rid_order], return_index=True)
+        rid_offsets = np.append(rid_starts, len(records)).astype(np.int64)
+        return cls(origin, block_size, block_keys, block_offsets, rid_values, rid_offsets, rid_order), records
+
+    def save(self, path:str):
+        """Write index (numpy .npz)."""
+        with open(path, 'wb') as f:
+            np.savez(f, origin=self.origin, block_size=self.block_size, block_keys=self.block_keys,
+                     block_offsets=self.block_offsets, rid_values=self.rid_values,
+                     rid_offsets=self.rid_offsets, rid_order=self.rid_order)
+
+    @classmethod
+    def load(cls, path:str):
+        """Read index (numpy .npz)."""
+        with np.load(path) as data:
+            return cls(data['origin'], data['block_size'], data['block_keys'], data['block_offsets'],
+                       data['rid_values'], data['rid_offsets'], data['rid_order'])
+
+    def block_ranges(self, xmin, xmax, ymin, ymax)->list:
+        """Record ranges (start, end) of non-empty blocks intersecting bounding box (contiguous blocks combined)."""
+        ix, iy = morton_decode(self.block_keys)
+        x0, y0 = self.origin
+        inside = ((ix >= (xmin - x0) // self.block_size) & (ix <= (xmax - x0) // self.block_size) &
+                  (iy >= (ymin - y0) // self.block_size) & (iy <= (ymax - y0) // self.block_size))
+        idx = np.flatnonzero(inside)
+        if len(idx) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(idx) > 1) + 1
+        return [(int(self.block_offsets[run[0]]), int(self.block_offsets[run[-1] + 1]))
+                for run in np.split(idx, breaks)]
+
+    def rid_positions(self, rids)->np.ndarray:
+        """Sorted record positions of RIDs."""
+        found = np.flatnonzero(np.isin(self.rid_values, np.atleast_1d(rids)))
+        parts = [self.rid_order[self.rid_offsets[p]:self.rid_offsets[p + 1]] for p in found]
+        return np.sort(np.concatenate(parts)) if len(parts) > 0 else np.empty(0, dtype=np.int64)
+
+class TileStore():
+    """
+    Directory of memory-mapped tiles with block and RID index.
+
+    Parameters
+    ----------
+    root : str
+        Directory of tile store (created if not existing)
+    block_size : int
+        Edge length (m) of index blocks of new stores
+    """
+    def __init__(self, root:str, block_size:int=BLOCK_SIZE):
+        self.root = root
+        self.catalog = dict(version=STORE_VERSION, block_size=block_size, tiles={})
+        path = os.path.join(root, CATALOG_FILE)
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                self.catalog = json.load(f)
+            if self.catalog.get('version') != STORE_VERSION:
+                raise ValueError(f'Unsupported version of tile store "{root}"')
+        self._cache = {}
+
+    @property
+    def tiles(self)->dict:
+        """Catalog entries (basic tile, number of records, extent, RIDs) per tile ID."""
+        return self.catalog['tiles']
+
+    def save(self):
+        """Write catalog (atomic replace of existing file)."""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, CATALOG_FILE)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.catalog, f, sort_keys=True)
+        os.replace(f'{path}.tmp', path)
+
+    def add_tile(self, tile_path:str, tile_format:str='ascii')->int:
+        """
+        Add (or replace) tile file to store. Call save() to update the catalog.
+
+        Returns
+        ----------
+        cnt_records : int
+            Number of records of tile
+        """
+        tile_id, basic_id = parse_tile_name(tile_path)
+        name = f'tile_{tile_id}_{basic_id}'
+        index, records = TileIndex.build(read_tile_records(tile_path, tile_format), self.catalog['block_size'])
+        os.makedirs(self.root, exist_ok=True)
+        records.tofile(os.path.join(self.root, f'{name}.tstore'))
+        index.save(os.path.join(self.root, f'{name}.tindex.npz'))
+        self._cache.pop(tile_id, None)
+
+        extent = {f'{c}{f.__name__}': int(f(records[c])) if len(records) > 0 else None
+                  for c in ['x', 'y', 'z'] for f in [np.min, np.max]}
+        self.tiles[tile_id] = dict(name=name, basic=basic_id, count=len(records), extent=extent,
+                                   rids=[int(r) for r in index.rid_values])
+        return len(records)
+
+    def remove_tile(self, tile_id:str):
+        """Remove tile from store. Call save() to update the catalog."""
+        entry = self.tiles.pop(str(tile_id), None)
+        self._cache.pop(str(tile_id), None)
+        if entry is not None:
+            for suffix in ['tstore', 'tindex.npz']:
+                path = os.path.join(self.root, f'{entry["name"]}.{suffix}')
+                if os.path.isfile(path):
+                    os.remove(path)
+
+    def _open(self, tile_id:str)->tuple:
+        """Memory map of records and index of tile (cached)."""
+        tile_id = str(tile_id)
+        if tile_id not in self._cache:
+            name = self.tiles[tile_id]['name']
+            path = os.path.join(self.root, f'{name}.tstore')
+            records = np.memmap(path, dtype=TILE_RECORD, mode='r') if os.path.getsize(path) > 0 else np.empty(0, dtype=TILE_RECORD)
+            self._cache[tile_id] = (records, TileIndex.load(os.path.join(self.root, f'{name}.tindex.npz')))
+        return self._cache[tile_id]
+
+    def query_tile(self, tile_id)->np.ndarray:
+        """All records of tile (memory map)."""
+        return self._open(tile_id)[0]
+
+    def query_bbox(self, xmin, xmax, ymin, ymax, rids=None)->np.ndarray:
+        """
+        Records inside bounding box (xmin <= x <= xmax, ymin <= y <= ymax), optionally only of given RIDs.
+        Only tiles overlapping the bounding box and blocks intersecting it are read.
+        """
+        parts = []
+        rids = None if rids is None else np.atleast_1d(np.asarray(rids, dtype=np.int64))
+        for tile_id, entry in self.tiles.items():
+            ext = entry['extent']
+            if entry['count'] == 0 or ext['xmax'] < xmin or ext['xmin'] > xmax or ext['ymax'] < ymin or ext['ymin'] > ymax:
+                continue
+            if rids is not None and not np.isin(rids, entry['rids']).any():
+                continue
+            records, index = self._open(tile_id)
+            for start, end in index.block_ranges(xmin, xmax, ymin, ymax):
+                block = records[start:end]
+                inside = (block['x'] >= xmin) & (block['x'] <= xmax) & (block['y'] >= ymin) & (block['y'] <= ymax)
+                if rids is not None:
+                    inside &= np.isin(block['rid'], rids)
+                parts.append(np.array(block[inside]))
+        return np.concatenate(parts) if len(parts) > 0 else np.empty(0, dtype=TILE_RECORD)
+
+    def query_rid(self, rid)->np.ndarray:
+        """All records of RID (only tiles featuring the RID and only its records are read)."""
+        parts = []
+        for tile_id, entry in self.tiles.items():
+            if int(rid) not in entry['rids']:
+                continue
+            records, index = self._open(tile_id)
+            parts.append(np.array(records[index.rid_positions(int(rid))]))
+        return np.concatenate(parts) if len(parts) > 0 else np.empty(0, dtype=TILE_RECORD)
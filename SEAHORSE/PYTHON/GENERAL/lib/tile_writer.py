@@ -0,0 +1,109 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Tile writer
+#   Buffered output of tile files (*.til)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+"""
+Collect output for many tile files in memory and append it to disk in large sequential writes.
+The number of simultaneously open file handles is capped (least recently used handles are closed).
+Files are always opened in append mode, so the content of each file is identical to appending
+every write directly (in the same order).
+"""
+
+from collections import OrderedDict
+
+BUFFER_SIZE = 2**26 # total size (bytes) of all buffers before flushing to disk
+FLUSH_SIZE = 2**22 # size (bytes) of a single tile buffer before it is flushed to disk
+MAX_OPEN_FILES = 64 # max. number of open file handles
+
+class TileWriter():
+    """
+    Buffered writer for multiple output files.
+
+    Parameters
+    ----------
+    buffer_size : int
+        Total size (bytes) of all buffers. Largest buffers are flushed when exceeded.
+    flush_size : int
+        Size (bytes) of a single buffer that triggers flushing of this buffer
+    max_open_files : int
+        Maximum number of open file handles (least recently used are closed)
+    binary : bool
+        Write bytes (binary tile records) instead of text
+
+    """
+    def __init__(self, buffer_size:int=BUFFER_SIZE, flush_size:int=FLUSH_SIZE,
+                 max_open_files:int=MAX_OPEN_FILES, binary:bool=False):
+        self.buffer_size = buffer_size
+        self.flush_size = min(flush_size, buffer_size)
+        self.max_open_files = max(1, max_open_files)
+        self.binary = binary
+        self._buffers = {}
+        self._sizes = {}
+        self._total_size = 0
+        self._handles = OrderedDict()
+        self.paths = set() # all files written
+        self.cnt_writes = 0 # number of write calls to disk
+        self.cnt_opened = 0 # number of opened file handles
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, path:str, data)->None:
+        """Add text (or bytes) to buffer of given output file."""
+        if len(data) == 0:
+            return
+        self._buffers.setdefault(path, []).append(data)
+        self.paths.add(path)
+        self._sizes[path] = self._sizes.get(path, 0) + len(data)
+        self._total_size += len(data)
+
+        if self._sizes[path] >= self.flush_size:
+            self.flush(path)
+        if self._total_size > self.buffer_size:
+            # flush largest buffers until half of the buffer size is available again
+            for p in sorted(self._sizes, key=self._sizes.get, reverse=True):
+                self.flush(p)
+                if self._total_size <= self.buffer_size // 2:
+                    break
+
+    def flush(self, path:str=None)->None:
+        """Write buffer of given output file (or all buffers) to disk."""
+        paths = list(self._buffers) if path is None else [path]
+        for p in paths:
+            chunks = self._buffers.pop(p, None)
+            if not chunks:
+                continue
+            empty = b'' if self.binary else ''
+            self._get_handle(p).write(empty.join(chunks))
+            self._total_size -= self._sizes.pop(p)
+            self.cnt_writes += 1
+
+    def _get_handle(self, path:str):
+        """Return open file handle (append mode) and close least recently used if necessary."""
+        if path in self._handles:
+            self._handles.move_to_end(path)
+            return self._handles[path]
+        while len(self._handles) >= self.max_open_files:
+            _, handle = self._handles.popitem(last=False)
+            handle.close()
+        if self.binary:
+            handle = open(path, 'ab')
+        else:
+            handle = open(path, 'a', newline='\n')
+        self._handles[path] = handle
+        self.cnt_opened += 1
+        return handle
+
+    def close(self)->None:
+        """Flush all buffers and close all file handles."""
+        self.flush()
+        while len(self._handles) > 0:
+            _, handle = self._handles.popitem(last=False)
+            handle.close()
@@ -0,0 +1,63 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Plan jobs
+#   Pack input files of SLURM array stages into balanced manifests (one per array task)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import os
+import sys
+import argparse
+
+from lib.job_planner import (read_csvlines, fit_cost_model, read_point_counts, plan_jobs,
+                             DEFAULT_OVERHEAD, DEFAULT_RATE, MEMORY_FACTOR)
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Pack input files into balanced manifests (one per array task) '
+                                                 'using a runtime model fitted to CSVLINE records of previous runs.')
+    parser.add_argument('input_files', type=str, nargs='*', help='Input files (work units)')
+    parser.add_argument('--file-list', type=str, default=None, help='Text file listing input files (one path per line)')
+    parser.add_argument('--manifest-dir', '-d', type=str, required=True, help='Output directory of manifests')
+    parser.add_argument('--prefix', '-p', type=str, required=True, help='Prefix of manifests ("<prefix>_<task>.manifest")')
+    parser.add_argument('--logdir', '-l', type=str, default=None, help='Directory of log files with CSVLINE records (searched recursively)')
+    parser.add_argument('--stage', '-s', type=str, default=None, help='Job name of stage in CSVLINE records (default: prefix)')
+    parser.add_argument('--counts', '-c', type=str, default=None,
+                        help='Number of points per tile ("tile_id count" per line, e.g. WORK_TILE_COUNTS)')
+    parser.add_argument('--target-time', '-t', type=float, default=1800, help='Target runtime (s) per array task (default=1800)')
+    parser.add_argument('--max-tasks', type=int, default=1000, help='Maximum number of array tasks (default=1000)')
+    parser.add_argument('--overhead', type=float, default=DEFAULT_OVERHEAD,
+                        help=f'Default runtime (s) per task without data (default={DEFAULT_OVERHEAD})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE * 1e6,
+                        help=f'Default runtime (s) per MB of input data (default={DEFAULT_RATE * 1e6:.3f})')
+    parser.add_argument('--memory-factor', type=float, default=MEMORY_FACTOR,
+                        help=f'Memory (MB) per MB of largest input file of task (default={MEMORY_FACTOR})')
+    parser.add_argument('--plan', type=str, default=None, help='Output table of planned tasks (default: <manifest-dir>/<prefix>.plan)')
+    return parser
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    files = list(args.input_files)
+    if args.file_list is not None:
+        with open(args.file_list, 'r') as f:
+            files.extend(line.strip() for line in f if line.strip())
+    files = [f for f in files if os.path.isfile(f)]
+    if len(files) == 0:
+        print('WARNING:\tNo input files found')
+        sys.exit(0)
+
+    records = read_csvlines(args.logdir, args.stage or args.prefix) if args.logdir is not None else []
+    model = fit_cost_model(records, args.overhead, args.rate / 1e6)
+    counts = read_point_counts(args.counts) if args.counts is not None and os.path.isfile(args.counts) else None
+
+    os.makedirs(args.manifest_dir, exist_ok=True)
+    plan = plan_jobs(files, args.manifest_dir, args.prefix, model, args.target_time, args.max_tasks, counts, args.memory_factor)
+    plan_file = args.plan if args.plan is not None else os.path.join(args.manifest_dir, f'{args.prefix}.plan')
+    plan.to_csv(plan_file, sep='\t', index=False)
+
+    print(f'INFO:\t{model}')
+    print(f'INFO:\t{len(files)} files packed into {len(plan)} tasks (runtime min/max: {plan["runtime"].min()}/{plan["runtime"].max()} s, '
+          f'memory max: {plan["memory"].max()} MB)\t{plan_file}')
+    sys.exit(0)
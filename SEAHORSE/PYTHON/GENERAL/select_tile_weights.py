@@ -0,0 +1,27 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Select tile weights
+#   Extract records with given weights from binary tile file (e.g. high resolution data for C1)
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import sys
+import argparse
+
+from lib.tile_format import select_weights
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Extract records with given weights from binary tile file (TILE_FORMAT=binary).')
+    parser.add_argument('input_file', type=str, help='Input binary tile file (*.tile)')
+    parser.add_argument('output_file', type=str, help='Output binary tile file')
+    parser.add_argument('--weights', '-w', type=int, nargs='+', required=True, help='Weights of records to select (e.g. 15 20 25 30)')
+    return parser
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    cnt_selected = select_weights(args.input_file, args.output_file, args.weights)
+    print(f'INFO:\t{args.input_file}\t{cnt_selected} records selected (weights: {" ".join(str(w) for w in args.weights)})')
+    sys.exit(0)
@@ -0,0 +1,104 @@
+#-----------------------------------------------------------
+#   SEABED2030 - Tile store
+#   Build tile store (memory-mapped, indexed tiles) and query points by bbox, tile ID or RID
+#
+#   (C) 2020 Fynn Warnke, Sacha Viquerat Alfred Wegener Institute Bremerhaven, Germany
+#   fwarnke@awi.de, sacha.vsop@gmail.com
+#-----------------------------------------------------------
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+import numpy as np
+
+from lib.tile_store import TileStore, parse_tile_name, BLOCK_SIZE
+from lib.tile_format import TILE_RECORD
+
+def define_input_args():
+    parser = argparse.ArgumentParser(description='Build tile store from tiles (build) or query points by bounding box, tile ID or RID (query).')
+    parser.add_argument('action', type=str, choices=['build', 'query'], help='"build" (add tiles to store) or "query"')
+    parser.add_argument('tile_files', type=str, nargs='*', help='[build] Tile files (*.tile)')
+    parser.add_argument('--store', '-s', type=str, required=True, help='Directory of tile store')
+    parser.add_argument('--tiledir', type=str, default=None,
+                        help='[build] Directory of tiles: tiles no longer in directory are removed from store, all tiles are added '
+                             'unless tile files or --file-list are given')
+    parser.add_argument('--file-list', type=str, default=None, help='[build] Text file listing tile files (one path per line)')
+    parser.add_argument('--format', '-f', type=str, default='ascii', choices=['ascii', 'binary'],
+                        help='[build] Format of tiles, [query] format of output (default="ascii")')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help=f'[build] Edge length (m) of index blocks of new store (default={BLOCK_SIZE})')
+    parser.add_argument('--bbox', '-R', type=float, nargs=4, default=None, metavar=('XMIN', 'XMAX', 'YMIN', 'YMAX'),
+                        help='[query] Bounding box')
+    parser.add_argument('--rid', type=int, nargs='+', default=None, help='[query] RID(s)')
+    parser.add_argument('--tile', type=str, default=None, help='[query] Tile ID')
+    parser.add_argument('--output', '-o', type=str, default=None, help='[query] Output file (default: stdout)')
+    return parser
+
+def write_records(records:np.ndarray, output:str=None, tile_format:str='ascii'):
+    """Write records as tile file ("x y z weight rid" per line or binary TILE_RECORD)."""
+    if tile_format == 'binary':
+        records.astype(TILE_RECORD).tofile(output if output is not None else sys.stdout.buffer)
+        return
+    f = open(output, 'w') if output is not None else sys.stdout
+    np.savetxt(f, np.column_stack([records[n] for n in TILE_RECORD.names]), fmt='%d', delimiter=' ')
+    if output is not None:
+        f.close()
+
+def build(args, store:TileStore):
+    files = list(args.tile_files)
+    if args.file_list is not None:
+        with open(args.file_list, 'r') as f:
+            files.extend(line.strip() for line in f if line.strip())
+    if args.tiledir is not None:
+        tiledir_files = glob.glob(os.path.join(args.tiledir, 'tile_*.tile'))
+        present = {parse_tile_name(path)[0] for path in tiledir_files}
+        for tile_id in [t for t in store.tiles if t not in present]:
+            store.remove_tile(tile_id)
+        if len(files) == 0:
+            files = tiledir_files # without explicit tiles all tiles of directory are added
+
+    start_time = time.perf_counter()
+    cnt_records = 0
+    for path in sorted(set(files)):
+        cnt_records += store.add_tile(path, args.format)
+    store.save()
+    print(f'INFO:\t{args.store}\t{len(set(files))} tiles added\t{cnt_records} records\t{len(store.tiles)} tiles in store\t'
+          f'{time.perf_counter() - start_time:.2f} sec')
+
+def query(args, store:TileStore):
+    start_time = time.perf_counter()
+    if args.tile is not None:
+        records = np.array(store.query_tile(args.tile))
+        if args.bbox is not None:
+            xmin, xmax, ymin, ymax = args.bbox
+            records = records[(records['x'] >= xmin) & (records['x'] <= xmax) & (records['y'] >= ymin) & (records['y'] <= ymax)]
+        if args.rid is not None:
+            records = records[np.isin(records['rid'], args.rid)]
+    elif args.bbox is not None:
+        records = store.query_bbox(*args.bbox, rids=args.rid)
+    else:
+        records = np.concatenate([store.query_rid(rid) for rid in args.rid])
+    write_records(records, args.output, args.format)
+    print(f'INFO:\t{len(records)} records\t{time.perf_counter() - start_time:.2f} sec', file=sys.stderr)
+
+if __name__ == '__main__':
+    parser = define_input_args()
+    args = parser.parse_args()
+
+    if args.action == 'query':
+        if not os.path.isdir(args.store):
+            parser.error(f'Tile store "{args.store}" not found')
+        if args.bbox is None and args.rid is None and args.tile is None:
+            parser.error('query requires --bbox, --rid or --tile')
+        store = TileStore(args.store)
+        if args.tile is not None and args.tile not in store.tiles:
+            print(f'ERROR:\tTile < {args.tile} > not in tile store')
+            sys.exit(1)
+        query(args, store)
+    else:
+        if len(args.tile_files) == 0 and args.tiledir is None and args.file_list is None:
+            parser.error('build requires tile files, --tiledir or --file-list')
+        build(args, TileStore(args.store, args.block_size))
+    sys.exit(0)